@@ -0,0 +1,94 @@
+"""
+Per-request auth overhead of get_current_user with and without the verified
+token cache.
+
+Tokens are RS256 JWTs signed with a locally generated key and verified with
+google.auth.jwt, the same signature check firebase_admin performs, so no
+network or Firebase project is needed. Certificate fetches, which the real
+verifier adds on a cold key cache, are not included.
+
+    python -m benchmarks.bench_auth --requests 2000 --tokens 20
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from fastapi.security import HTTPAuthorizationCredentials
+from google.auth import crypt, jwt
+
+from services.yolo import auth
+
+AUDIENCE = "bench-project"
+
+
+def _key_and_cert():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "bench")])
+    now = datetime.utcnow()
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(1)
+        .not_valid_before(now - timedelta(minutes=1))
+        .not_valid_after(now + timedelta(hours=1))
+        .sign(key, hashes.SHA256())
+    )
+    pem_key = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    return pem_key, cert.public_bytes(serialization.Encoding.PEM)
+
+
+def _run(tokens, n: int) -> float:
+    start = time.perf_counter()
+    for i in range(n):
+        creds = HTTPAuthorizationCredentials(scheme="Bearer", credentials=tokens[i % len(tokens)])
+        auth.get_current_user(creds)
+    return time.perf_counter() - start
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=2000)
+    ap.add_argument("--tokens", type=int, default=20, help="distinct users sending requests")
+    args = ap.parse_args()
+
+    pem_key, pem_cert = _key_and_cert()
+    signer = crypt.RSASigner.from_string(pem_key, key_id="bench")
+    now = int(time.time())
+    tokens = [
+        jwt.encode(signer, {"aud": AUDIENCE, "sub": f"user{i}", "uid": f"user{i}", "iat": now, "exp": now + 3600}).decode()
+        for i in range(args.tokens)
+    ]
+    certs = {"bench": pem_cert}
+
+    auth.set_verifier(lambda token: jwt.decode(token, certs=certs, audience=AUDIENCE))
+    cache_size = auth.token_cache.max_entries
+
+    auth.token_cache.max_entries = 0
+    before = _run(tokens, args.requests)
+
+    auth.token_cache.max_entries = cache_size
+    auth.token_cache.clear()
+    after = _run(tokens, args.requests)
+    auth.set_verifier(None)
+
+    print(json.dumps({
+        "requests": args.requests,
+        "distinct_tokens": args.tokens,
+        "before_us_per_request": round(before / args.requests * 1e6, 1),
+        "after_us_per_request": round(after / args.requests * 1e6, 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Compare inference backends: latency, throughput and detection agreement.
+
+Runs every backend over docs/examples/apple.jpg plus a synthetic image set
+and reports agreement with the PyTorch backend (same label, IoU >= 0.5).
+
+    python -m benchmarks.bench_backends --backends torch onnx onnx-int8 --synthetic 16
+"""
+import argparse
+import io
+import json
+import statistics
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+from PIL import Image
+
+from services.yolo.model import YoloService
+
+
+def synthetic_images(n: int, seed: int = 0) -> List[bytes]:
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(n):
+        h, w = rng.integers(360, 1080, size=2)
+        arr = rng.integers(0, 255, size=(h, w, 3), dtype=np.uint8)
+        for _ in range(rng.integers(1, 6)):
+            y0, x0 = rng.integers(0, h // 2), rng.integers(0, w // 2)
+            arr[y0:y0 + h // 3, x0:x0 + w // 3] = rng.integers(0, 255, size=3)
+        buf = io.BytesIO()
+        Image.fromarray(arr).save(buf, format="JPEG", quality=90)
+        images.append(buf.getvalue())
+    return images
+
+
+def _iou(a, b) -> float:
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def agreement(reference: Dict, candidate: Dict, threshold: float = 0.5) -> float:
+    ref, cand = reference["detections"], list(candidate["detections"])
+    if not ref and not cand:
+        return 1.0
+    matched = 0
+    for r in ref:
+        for i, c in enumerate(cand):
+            if c["label"] == r["label"] and _iou(r["box"], c["box"]) >= threshold:
+                matched += 1
+                del cand[i]
+                break
+    return matched / max(len(ref), len(candidate["detections"]))
+
+
+def run_backend(backend: str, images: List[bytes], batch: int) -> Dict:
+    svc = YoloService(backend=backend)
+    svc.predict(images[0])  # warm-up
+
+    latencies, outputs = [], []
+    for data in images:
+        start = time.perf_counter()
+        outputs.append(svc.predict(data))
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(0, len(images), batch):
+        svc.predict_batch(images[i:i + batch])
+    elapsed = time.perf_counter() - start
+
+    ordered = sorted(latencies)
+    return {
+        "backend": backend,
+        "latency_p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "latency_p95_ms": round(ordered[int(0.95 * (len(ordered) - 1))] * 1000, 2),
+        "throughput_images_per_sec": round(len(images) / elapsed, 2),
+        "outputs": outputs,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    ap.add_argument("--synthetic", type=int, default=16)
+    ap.add_argument("--batch", type=int, default=8)
+    args = ap.parse_args()
+
+    images = [Path("docs/examples/apple.jpg").read_bytes()] + synthetic_images(args.synthetic)
+    runs = [run_backend(b, images, args.batch) for b in args.backends]
+
+    reference = runs[0]["outputs"]
+    for run in runs:
+        scores = [agreement(r, c) for r, c in zip(reference, run.pop("outputs"))]
+        run["agreement_vs_" + args.backends[0]] = round(statistics.mean(scores), 4)
+        run["apple_agreement"] = round(scores[0], 4)
+    print(json.dumps(runs, indent=2))
+
+
+if __name__ == "__main__":
+    main()
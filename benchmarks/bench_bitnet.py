@@ -0,0 +1,130 @@
+"""
+BitNet worker throughput on a local message stream: the original settings
+(prefetch 1, one message at a time) versus the batched consumer.
+
+Post-processing is simulated with a fixed cost per call plus a cost per
+message, the shape of a batched LLM forward pass.
+
+    python -m benchmarks.bench_bitnet --messages 500 --call-ms 20 --item-ms 2
+"""
+import argparse
+import json
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+
+from services.bitnet.worker import BatchConsumer, fake_bitnet_postprocess
+
+
+class LocalBroker:
+    """
+    In-process stand-in for a RabbitMQ connection and channel with the
+    prefetch, ack, nack and callback semantics the consumer relies on.
+    """
+
+    def __init__(self, bodies):
+        self.ready = deque((body, False) for body in bodies)
+        self.unacked = {}
+        self.acked = 0
+        self.next_tag = 1
+        self.prefetch = 1
+        self.callback = None
+        self.callbacks = deque()
+        self.wakeup = threading.Condition()
+
+    def basic_qos(self, prefetch_count):
+        self.prefetch = prefetch_count
+
+    def basic_consume(self, queue, on_message_callback):
+        self.callback = on_message_callback
+
+    def basic_ack(self, delivery_tag, multiple=False):
+        tags = [t for t in self.unacked if t <= delivery_tag] if multiple else [delivery_tag]
+        for tag in tags:
+            del self.unacked[tag]
+        self.acked += len(tags)
+
+    def basic_nack(self, delivery_tag, multiple=False, requeue=True):
+        body = self.unacked.pop(delivery_tag)
+        if requeue:
+            self.ready.append((body, True))
+
+    def add_callback_threadsafe(self, callback):
+        with self.wakeup:
+            self.callbacks.append(callback)
+            self.wakeup.notify()
+
+    def process_data_events(self, time_limit=0):
+        deadline = time.monotonic() + (time_limit or 0)
+        while True:
+            did_work = False
+            while self.callbacks:
+                self.callbacks.popleft()()
+                did_work = True
+            while self.ready and len(self.unacked) < self.prefetch:
+                body, redelivered = self.ready.popleft()
+                tag, self.next_tag = self.next_tag, self.next_tag + 1
+                self.unacked[tag] = body
+                self.callback(self, SimpleNamespace(delivery_tag=tag, redelivered=redelivered), None, body)
+                did_work = True
+            remaining = deadline - time.monotonic()
+            if did_work or remaining <= 0:
+                return
+            with self.wakeup:
+                if not self.callbacks:
+                    self.wakeup.wait(remaining)
+
+
+def _run(n: int, call_s: float, item_s: float, **settings) -> float:
+    bodies = [json.dumps({"detections": [{"label": "apple"}, {"label": "banana"}], "meta": {}}).encode()] * n
+    broker = LocalBroker(bodies)
+
+    def process(messages):
+        time.sleep(call_s + item_s * len(messages))
+        return [fake_bitnet_postprocess(m) for m in messages]
+
+    consumer = BatchConsumer(broker, broker, process=process, on_result=lambda m, r: None, **settings)
+    done = threading.Thread(target=lambda: _stop_when(broker, consumer, n))
+    start = time.perf_counter()
+    done.start()
+    consumer.run()
+    done.join()
+    return time.perf_counter() - start
+
+
+def _stop_when(broker: LocalBroker, consumer: BatchConsumer, n: int) -> None:
+    while broker.acked < n:
+        time.sleep(0.001)
+    consumer.stop()
+    broker.add_callback_threadsafe(lambda: None)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--messages", type=int, default=500)
+    ap.add_argument("--call-ms", type=float, default=20.0)
+    ap.add_argument("--item-ms", type=float, default=2.0)
+    ap.add_argument("--prefetch", type=int, default=64)
+    ap.add_argument("--batch-size", type=int, default=16)
+    ap.add_argument("--workers", type=int, default=4)
+    args = ap.parse_args()
+
+    call_s, item_s = args.call_ms / 1000.0, args.item_ms / 1000.0
+    before = _run(args.messages, call_s, item_s, prefetch=1, batch_size=1, workers=1, max_wait=0)
+    after = _run(
+        args.messages, call_s, item_s,
+        prefetch=args.prefetch, batch_size=args.batch_size, workers=args.workers, max_wait=0.05,
+    )
+    print(json.dumps({
+        "messages": args.messages,
+        "before_messages_per_sec": round(args.messages / before, 1),
+        "after_messages_per_sec": round(args.messages / after, 1),
+        "prefetch": args.prefetch,
+        "batch_size": args.batch_size,
+        "workers": args.workers,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Offline backfill throughput: one CLI launch per image (`--image`, which
+starts Python and loads the model every time) versus batch mode over a
+directory, with decoding prefetched alongside batched inference.
+
+The per-launch path is slow, so it runs on fewer images; both results are
+reported as images per second.
+
+    python -m benchmarks.bench_cli --images 128 --launches 4 --batch-size 16
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+EXAMPLE_IMAGE = "docs/examples/apple.jpg"
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--images", type=int, default=128)
+    ap.add_argument("--launches", type=int, default=4, help="images run one process launch each")
+    ap.add_argument("--batch-size", type=int, default=16)
+    ap.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = os.path.join(tmp, "images")
+        os.makedirs(folder)
+        for i in range(args.images):
+            shutil.copyfile(EXAMPLE_IMAGE, os.path.join(folder, f"{i:06d}.jpg"))
+
+        start = time.perf_counter()
+        for i in range(args.launches):
+            subprocess.run(
+                [sys.executable, "-m", "services.yolo.cli", "--image", os.path.join(folder, f"{i:06d}.jpg")],
+                check=True, capture_output=True,
+            )
+        before = time.perf_counter() - start
+
+        output = os.path.join(tmp, "out.ndjson")
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-m", "services.yolo.cli", folder, "--output", output,
+             "--batch-size", str(args.batch_size), "--workers", str(args.workers)],
+            check=True, capture_output=True,
+        )
+        after = time.perf_counter() - start
+        with open(output) as f:
+            written = sum(1 for _ in f)
+
+    print(json.dumps({
+        "batch_size": args.batch_size,
+        "workers": args.workers,
+        "before_images": args.launches,
+        "before_images_per_sec": round(args.launches / before, 2),
+        "after_images": written,
+        "after_images_per_sec": round(written / after, 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Prediction logging throughput: the previous connect-insert-commit-close per
+call versus the persistent WAL connection with batched write-behind.
+
+    python -m benchmarks.bench_db --rows 5000 --threads 8
+"""
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from services.yolo import db
+
+
+def _legacy_log(path: str, errors: list, filename: str, label: str, confidence: float) -> None:
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute(
+            "INSERT INTO predictions (filename, label, confidence, created_at) VALUES (?, ?, ?, ?)",
+            (filename, label, confidence, datetime.utcnow().isoformat()),
+        )
+        conn.commit()
+    except sqlite3.OperationalError:
+        # Lock contention on the rollback journal surfaces as "database is locked".
+        errors.append(filename)
+    finally:
+        conn.close()
+
+
+def _run(rows: int, threads: int, log) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(lambda i: log(f"img{i}.jpg", "apple", 0.9), range(rows)))
+    return time.perf_counter() - start
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=2000)
+    ap.add_argument("--threads", type=int, default=8)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy.db")
+        conn = sqlite3.connect(legacy_path)
+        conn.execute(
+            "CREATE TABLE predictions (id INTEGER PRIMARY KEY AUTOINCREMENT, filename TEXT NOT NULL, "
+            "label TEXT NOT NULL, confidence REAL NOT NULL, created_at TEXT NOT NULL)"
+        )
+        conn.close()
+        legacy_errors: list = []
+        legacy = _run(args.rows, args.threads, lambda *a: _legacy_log(legacy_path, legacy_errors, *a))
+
+        db.DB_PATH = os.path.join(tmp, "write_behind.db")
+        db.init_db()
+        start = time.perf_counter()
+        _run(args.rows, args.threads, db.log_prediction)
+        db.flush()
+        write_behind = time.perf_counter() - start
+        db.close_db()
+
+    print(json.dumps({
+        "rows": args.rows,
+        "threads": args.threads,
+        "before_inserts_per_sec": round(args.rows / legacy, 1),
+        "before_failed_inserts": len(legacy_errors),
+        "after_inserts_per_sec": round(args.rows / write_behind, 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Firestore write cost on the request path: the previous synchronous
+doc_ref.set() per output versus the buffered BatchWriter.
+
+A stand-in backend charges one round-trip per write call, which is what a
+single set() and a batched commit of up to 500 documents both cost.
+
+    python -m benchmarks.bench_firestore --docs 2000 --rtt-ms 20 --threads 16
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from services.yolo.storage import BatchWriter, MemoryBackend
+
+
+class RoundTripBackend(MemoryBackend):
+    def __init__(self, rtt: float):
+        super().__init__()
+        self.rtt = rtt
+
+    def write(self, docs):
+        time.sleep(self.rtt)
+        super().write(docs)
+
+
+def _measure(n: int, threads: int, save) -> dict:
+    latencies = []
+
+    def one(i):
+        start = time.perf_counter()
+        save({"filename": f"img{i}.jpg", "label": "apple", "confidence": 0.9})
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(one, range(n)))
+    return {"elapsed": time.perf_counter() - start, "latencies": sorted(latencies)}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--docs", type=int, default=2000)
+    ap.add_argument("--rtt-ms", type=float, default=20.0)
+    ap.add_argument("--threads", type=int, default=16)
+    args = ap.parse_args()
+    rtt = args.rtt_ms / 1000.0
+
+    sync_backend = RoundTripBackend(rtt)
+    before = _measure(
+        args.docs, args.threads,
+        lambda payload: sync_backend.write([(sync_backend.new_id(), payload)]),
+    )
+
+    batched_backend = RoundTripBackend(rtt)
+    writer = BatchWriter(batched_backend)
+    after = _measure(args.docs, args.threads, lambda payload: writer.submit([payload]))
+    start = time.perf_counter()
+    writer.close()
+    after["elapsed"] += time.perf_counter() - start
+
+    def p50_ms(r):
+        return round(r["latencies"][len(r["latencies"]) // 2] * 1000, 3)
+
+    print(json.dumps({
+        "docs": args.docs,
+        "rtt_ms": args.rtt_ms,
+        "before_request_p50_ms": p50_ms(before),
+        "after_request_p50_ms": p50_ms(after),
+        "before_docs_per_sec": round(args.docs / before["elapsed"], 1),
+        "after_docs_per_sec": round(args.docs / after["elapsed"], 1),
+        "before_write_calls": sync_backend.batches,
+        "after_write_calls": batched_backend.batches,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
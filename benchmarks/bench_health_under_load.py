@@ -0,0 +1,103 @@
+"""
+Load test: /health latency while /predict is saturated.
+
+Runs the FastAPI app in-process with a dummy model whose predict() blocks
+for a fixed time, floods /predict with concurrent uploads and samples
+/health latency before and during the flood.
+
+    python -m benchmarks.bench_health_under_load --concurrency 64 --inference-ms 50
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+from services.yolo import api
+from services.yolo.auth import get_current_user
+
+
+class SlowYoloService:
+    def __init__(self, inference_ms: float):
+        self.delay = inference_ms / 1000.0
+
+    def predict(self, data: bytes, conf=0.25, iou=0.45, imgsz=640):
+        time.sleep(self.delay)
+        return {"detections": [], "meta": {"imgsz": imgsz, "conf": conf, "iou": iou}}
+
+
+def _percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _summary(samples):
+    return {
+        "n": len(samples),
+        "p50_ms": round(statistics.median(samples) * 1000, 3),
+        "p99_ms": round(_percentile(samples, 0.99) * 1000, 3),
+        "max_ms": round(max(samples) * 1000, 3),
+    }
+
+
+async def _sample_health(client, n, interval):
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        resp = await client.get("/health")
+        resp.raise_for_status()
+        samples.append(time.perf_counter() - start)
+        await asyncio.sleep(interval)
+    return samples
+
+
+async def _flood(client, stop, counts):
+    files = {"file": ("bench.jpg", b"\xff\xd8bench", "image/jpeg")}
+    while not stop.is_set():
+        resp = await client.post("/predict", files=files)
+        counts[resp.status_code] = counts.get(resp.status_code, 0) + 1
+        if resp.status_code == 503:
+            # Back off like a well-behaved client instead of spinning.
+            await asyncio.sleep(0.05)
+
+
+async def run(concurrency: int, inference_ms: float, samples: int) -> dict:
+    api.app.dependency_overrides[get_current_user] = lambda: {"uid": "bench"}
+    api.svc = SlowYoloService(inference_ms)
+    # Keep the benchmark self-contained: no broker round-trips.
+    api.publish_yolo_output = lambda payload: None
+
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        idle = await _sample_health(client, samples, 0.005)
+
+        stop = asyncio.Event()
+        counts: dict = {}
+        flooders = [asyncio.create_task(_flood(client, stop, counts)) for _ in range(concurrency)]
+        await asyncio.sleep(0.2)
+        loaded = await _sample_health(client, samples, 0.005)
+        stop.set()
+        await asyncio.gather(*flooders)
+
+    return {
+        "concurrency": concurrency,
+        "inference_ms": inference_ms,
+        "health_idle": _summary(idle),
+        "health_under_load": _summary(loaded),
+        "predict_status_counts": counts,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--concurrency", type=int, default=64)
+    ap.add_argument("--inference-ms", type=float, default=50.0)
+    ap.add_argument("--samples", type=int, default=200)
+    args = ap.parse_args()
+    print(json.dumps(asyncio.run(run(args.concurrency, args.inference_ms, args.samples)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Hot-path cost of the instrumentation: the previous per-request inference
+print versus timing every stage of a request with StageTimer, plus the cost
+of rendering /metrics once the stages have series.
+
+The print goes to os.devnull, so terminal and log shipping costs, which a
+real deployment pays on top, are not included.
+
+    python -m benchmarks.bench_metrics --requests 100000
+"""
+import argparse
+import contextlib
+import json
+import os
+import time
+
+from services.yolo import metrics
+from services.yolo.metrics import StageTimer
+
+# Stages a /predict request passes through in the API process.
+STAGES = ("upload_read", "decode", "inference", "postprocess", "sqlite_write", "firestore_write", "rabbitmq_publish")
+
+
+def _legacy(n: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        t0 = time.time()
+        duration = time.time() - t0
+        print(f"[Monitor] YOLO inference time: {duration:.4f} seconds")
+    return time.perf_counter() - start
+
+
+def _staged(stages: StageTimer, n: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        for stage in STAGES:
+            with stages.time(stage):
+                pass
+    return time.perf_counter() - start
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=100_000)
+    args = ap.parse_args()
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        before = _legacy(args.requests)
+    stages = StageTimer("bench")
+    after = _staged(stages, args.requests)
+
+    start = time.perf_counter()
+    for _ in range(100):
+        metrics.render()
+    render_ms = (time.perf_counter() - start) / 100 * 1000
+
+    print(json.dumps({
+        "requests": args.requests,
+        "stages_per_request": len(STAGES),
+        "before_us_per_request": round(before / args.requests * 1e6, 2),
+        "after_us_per_request": round(after / args.requests * 1e6, 2),
+        "render_ms": round(render_ms, 3),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+/predict with the transactional outbox off and on, through the real app.
+
+Both runs drive the FastAPI app in-process (as `bench_pipeline --target api`
+does) with a dummy model, SQLite in a temporary directory, a Firestore
+stand-in that charges --firestore-rtt-ms per batched write and a RabbitMQ
+stand-in that charges --mq-rtt-ms per round-trip. The broker refuses
+connections for the first --outage-s seconds of each run.
+
+    off   the default path: the row and recipe go to the SQLite write-behind
+          queue, the document to the Firestore batch writer and the message
+          to the buffered publisher, all in memory until flushed
+    on    YOLO_OUTBOX=1: the row, recipe, document and message are committed
+          to SQLite before the response, and OutboxDispatcher delivers them
+
+Reports /predict latency, how long after the last response every side
+effect had been delivered, and how many documents and messages arrived
+(including duplicate messages).
+
+    python -m benchmarks.bench_outbox --requests 500 --concurrency 16 --outage-s 1
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from collections import Counter as Tally
+from typing import Any, Dict, List
+from unittest.mock import patch
+
+import httpx
+import numpy as np
+import pika
+
+from benchmarks.bench_firestore import RoundTripBackend
+from benchmarks.bench_mq import StandInChannel, StandInConnection
+from benchmarks.bench_pipeline import DummyYoloService
+from services.yolo import api, db, mq, storage
+from services.yolo.auth import get_current_user
+from services.yolo.batching import BatchingYoloService
+from services.yolo.outbox import OutboxDispatcher
+
+
+class RecordingChannel(StandInChannel):
+    """
+    Broker stand-in that remembers which correlation ids it received.
+    """
+
+    def __init__(self, rtt: float, stats: dict):
+        super().__init__(rtt, stats)
+
+    def basic_publish(self, exchange, routing_key, body, properties=None):
+        super().basic_publish(exchange, routing_key, body, properties)
+        self.stats["ids"][json.loads(body)["correlation_id"]] += 1
+
+
+class RecordingConnection(StandInConnection):
+    def __init__(self, params, rtt: float, stats: dict, down_until: float):
+        if time.monotonic() < down_until:
+            raise pika.exceptions.AMQPConnectionError("broker unavailable")
+        super().__init__(params, rtt, stats)
+
+    def channel(self):
+        time.sleep(self.rtt)
+        return RecordingChannel(self.rtt, self.stats)
+
+
+async def _requests(n: int, concurrency: int) -> List[float]:
+    latencies: List[float] = []
+    pending = iter(range(n))
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        async def worker() -> None:
+            for i in pending:
+                # Distinct bytes, so no request is a result cache hit.
+                files = {"file": (f"img{i}.jpg", f"image {i}".encode(), "image/jpeg")}
+                start = time.perf_counter()
+                resp = await client.post("/predict", files=files)
+                resp.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+
+def _scenario(outbox: bool, args: argparse.Namespace, tmp: str) -> Dict[str, Any]:
+    name = "on" if outbox else "off"
+    db.DB_PATH = os.path.join(tmp, f"{name}.db")
+    db.init_db()
+    backend = RoundTripBackend(args.firestore_rtt_ms / 1000.0)
+    storage.set_backend(backend)
+    os.environ["YOLO_MQ_SPILL_PATH"] = os.path.join(tmp, f"{name}-spill.ndjson")
+    api.result_cache.clear()
+    api.OUTBOX = outbox
+
+    stats: Dict[str, Any] = {"connections": 0, "delivered": 0, "ids": Tally()}
+    rtt = args.mq_rtt_ms / 1000.0
+    down_until = time.monotonic() + args.outage_s
+    broker = patch("services.yolo.mq.pika.BlockingConnection",
+                   side_effect=lambda params: RecordingConnection(params, rtt, stats, down_until))
+    broker.start()
+    if outbox:
+        api.outbox_dispatcher = OutboxDispatcher(poll_interval=0.05, base_backoff=0.1, max_backoff=1.0).start()
+    try:
+        latencies = asyncio.run(_requests(args.requests, args.concurrency))
+        start = time.perf_counter()
+        if outbox:
+            while db.outbox_stats()[0] and time.perf_counter() - start < args.settle_timeout:
+                time.sleep(0.01)
+            api.outbox_dispatcher.stop()
+            api.outbox_dispatcher = None
+        # Waiting for the outage to end gives the buffered publisher the
+        # same chance as the dispatcher to replay what it spilled.
+        time.sleep(max(0.0, down_until - time.monotonic()))
+        storage.close_storage()
+        mq.close_publisher()
+        db.close_db()
+        settled = time.perf_counter() - start
+    finally:
+        broker.stop()
+
+    ms = np.array(latencies) * 1000
+    ids = stats["ids"]
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+        "settled_s": round(settled, 2),
+        "firestore_docs": len(backend.docs),
+        "messages_unique": len(ids),
+        "messages_duplicated": sum(c - 1 for c in ids.values()),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=500)
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--dummy-ms", type=float, default=5.0, help="forward-pass cost of the dummy model")
+    ap.add_argument("--firestore-rtt-ms", type=float, default=20.0)
+    ap.add_argument("--mq-rtt-ms", type=float, default=0.5)
+    ap.add_argument("--outage-s", type=float, default=1.0, help="broker refuses connections this long")
+    ap.add_argument("--settle-timeout", type=float, default=30.0)
+    args = ap.parse_args()
+
+    api.svc = BatchingYoloService.from_env(DummyYoloService(args.dummy_ms))
+    api.app.dependency_overrides[get_current_user] = lambda: {"uid": "bench"}
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for outbox in (False, True):
+            results["on" if outbox else "off"] = _scenario(outbox, args, tmp)
+    api.app.dependency_overrides.clear()
+    api.svc.close()
+
+    print(json.dumps({
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "firestore_rtt_ms": args.firestore_rtt_ms,
+        "mq_rtt_ms": args.mq_rtt_ms,
+        "outage_s": args.outage_s,
+        **results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
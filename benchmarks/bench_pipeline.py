@@ -0,0 +1,328 @@
+"""
+Replay a request log against the YOLO pipeline and report latency
+percentiles and throughput as JSON, optionally checked against a stored
+baseline.
+
+Targets:
+
+    model   YoloService.predict on each /predict image, without the API
+    api     the FastAPI app in-process with a dummy model; SQLite in a
+            temporary directory, outputs kept in memory, nothing published
+    e2e     the FastAPI app in-process with the real model, SQLite, a
+            Firestore stand-in and the RabbitMQ publisher talking to a
+            stand-in broker; both stand-ins charge a round-trip per call
+
+With --url the log is replayed over HTTP against a running server instead.
+
+The log is JSON lines, one request each:
+
+    {"method": "POST", "path": "/predict", "file": "docs/examples/apple.jpg", "seed": 3}
+    {"method": "GET", "path": "/predictions", "params": {"limit": 50}}
+
+A `seed` perturbs the image's pixels so each upload is distinct and not a
+result cache hit. --record writes a log of that shape.
+
+    python -m benchmarks.bench_pipeline --record benchmarks/requests.jsonl --requests 200
+    python -m benchmarks.bench_pipeline --target api --concurrency 16
+    python -m benchmarks.bench_pipeline --target api --baseline benchmarks/baselines/api.json
+    python -m benchmarks.bench_pipeline --url http://localhost:8000 --token "$TOKEN"
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from unittest.mock import patch
+
+import httpx
+import numpy as np
+from PIL import Image
+
+DEFAULT_LOG = "benchmarks/requests.jsonl"
+EXAMPLE_IMAGE = "docs/examples/apple.jpg"
+
+# Request mix for --record, by relative weight.
+RECORD_MIX = [
+    (8, {"method": "POST", "path": "/predict", "file": EXAMPLE_IMAGE}),
+    (1, {"method": "GET", "path": "/predictions", "params": {"limit": 50}}),
+    (1, {"method": "GET", "path": "/health"}),
+]
+
+# (path, status, seconds); status 0 means the request raised.
+Sample = Tuple[str, int, float]
+
+
+def record_log(path: str, n: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    weights = [w for w, _ in RECORD_MIX]
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(n):
+            entry = dict(rng.choices([e for _, e in RECORD_MIX], weights)[0])
+            if "file" in entry:
+                entry["seed"] = i
+            f.write(json.dumps(entry) + "\n")
+
+
+def load_log(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+_images: Dict[Tuple[str, Optional[int]], bytes] = {}
+
+
+def image_bytes(entry: Dict[str, Any]) -> bytes:
+    key = (entry["file"], entry.get("seed"))
+    data = _images.get(key)
+    if data is None:
+        with open(entry["file"], "rb") as f:
+            data = f.read()
+        if entry.get("seed") is not None:
+            pixels = np.asarray(Image.open(io.BytesIO(data)).convert("RGB"), dtype=np.int16)
+            noise = np.random.default_rng(entry["seed"]).integers(-3, 4, pixels.shape)
+            out = io.BytesIO()
+            Image.fromarray(np.clip(pixels + noise, 0, 255).astype(np.uint8)).save(out, "JPEG", quality=90)
+            data = out.getvalue()
+        _images[key] = data
+    return data
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summarize(samples: List[Sample], elapsed: float) -> Dict[str, Any]:
+    latencies = sorted(s for _, _, s in samples)
+    statuses: Dict[str, int] = {}
+    for _, status, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    if not latencies:
+        return {"n": 0}
+    return {
+        "n": len(samples),
+        "rps": round(len(samples) / elapsed, 1),
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3),
+        "errors": sum(1 for _, status, _ in samples if status == 0 or status >= 500),
+        "status": statuses,
+    }
+
+
+def report(samples: List[Sample], elapsed: float) -> Dict[str, Any]:
+    paths = sorted({p for p, _, _ in samples})
+    return {
+        **summarize(samples, elapsed),
+        "by_path": {p: summarize([s for s in samples if s[0] == p], elapsed) for p in paths},
+    }
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> Dict[str, Any]:
+    """
+    Relative change of the headline numbers against a baseline run, and the
+    ones that moved the wrong way by more than `tolerance`.
+    """
+    changes, regressions = {}, []
+    for key, higher_is_worse in (("p50_ms", True), ("p95_ms", True), ("p99_ms", True), ("rps", False)):
+        if not baseline.get(key) or key not in result:
+            continue
+        change = (result[key] - baseline[key]) / baseline[key]
+        changes[key] = {"baseline": baseline[key], "current": result[key], "change": round(change, 3)}
+        if (change if higher_is_worse else -change) > tolerance:
+            regressions.append(key)
+    return {"tolerance": tolerance, "changes": changes, "regressions": regressions}
+
+
+# -- replay --------------------------------------------------------------------
+
+async def replay_http(client: httpx.AsyncClient, log: List[Dict[str, Any]], concurrency: int) -> List[Sample]:
+    samples: List[Sample] = []
+    entries = iter(log)
+
+    async def worker() -> None:
+        for entry in entries:
+            kwargs: Dict[str, Any] = {"params": entry.get("params")}
+            if "file" in entry:
+                kwargs["files"] = {"file": (os.path.basename(entry["file"]), image_bytes(entry), "image/jpeg")}
+            start = time.perf_counter()
+            try:
+                resp = await client.request(entry.get("method", "GET"), entry["path"], **kwargs)
+                await resp.aread()
+                status = resp.status_code
+            except httpx.HTTPError:
+                status = 0
+            samples.append((entry["path"], status, time.perf_counter() - start))
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples
+
+
+def replay_model(svc: Any, log: List[Dict[str, Any]], concurrency: int) -> List[Sample]:
+    def one(entry: Dict[str, Any]) -> Sample:
+        data = image_bytes(entry)
+        start = time.perf_counter()
+        try:
+            svc.predict(data)
+            status = 200
+        except Exception:
+            status = 0
+        return ("model", status, time.perf_counter() - start)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(one, log))
+
+
+class DummyYoloService:
+    """
+    Stands in for the model with a fixed cost per forward pass.
+    """
+
+    def __init__(self, inference_ms: float):
+        self.delay = inference_ms / 1000.0
+
+    def predict_batch(self, images: List[bytes], conf=0.25, iou=0.45, imgsz=640) -> List[Dict[str, Any]]:
+        time.sleep(self.delay)
+        detection = {"label": "apple", "confidence": 0.9, "box": [1.0, 2.0, 3.0, 4.0]}
+        return [{"detections": [detection], "meta": {"imgsz": imgsz, "conf": conf, "iou": iou}} for _ in images]
+
+    def predict(self, image_bytes: bytes, conf=0.25, iou=0.45, imgsz=640) -> Dict[str, Any]:
+        return self.predict_batch([image_bytes], conf=conf, iou=iou, imgsz=imgsz)[0]
+
+
+def _timed(run, log: List[Dict[str, Any]], warmup: int) -> Tuple[List[Sample], float]:
+    # Prepare uploads up front so client-side encoding is not measured.
+    for entry in log:
+        if "file" in entry:
+            image_bytes(entry)
+    if warmup:
+        run(log[:warmup])
+    start = time.perf_counter()
+    samples = run(log)
+    return samples, time.perf_counter() - start
+
+
+def _replay_with_client(entries: List[Dict[str, Any]], concurrency: int, **client_args: Any) -> List[Sample]:
+    async def replay() -> List[Sample]:
+        async with httpx.AsyncClient(timeout=60, **client_args) as client:
+            return await replay_http(client, entries, concurrency)
+
+    return asyncio.run(replay())
+
+
+def run_target(args: argparse.Namespace, log: List[Dict[str, Any]]) -> Tuple[List[Sample], float]:
+    if args.url:
+        headers = {"Authorization": f"Bearer {args.token}"} if args.token else None
+        return _timed(
+            lambda entries: _replay_with_client(entries, args.concurrency, base_url=args.url, headers=headers),
+            log, args.warmup,
+        )
+
+    if args.target == "model":
+        from services.yolo.model import YoloService
+
+        svc = YoloService(backend=os.getenv("YOLO_BACKEND", "torch"))
+        images = [e for e in log if "file" in e]
+        return _timed(lambda entries: replay_model(svc, entries, args.concurrency), images, args.warmup)
+
+    from benchmarks.bench_firestore import RoundTripBackend
+    from benchmarks.bench_mq import StandInConnection
+    from services.yolo import api, db, mq, storage
+    from services.yolo.auth import get_current_user
+    from services.yolo.batching import BatchingYoloService
+
+    tmp = tempfile.mkdtemp(prefix="bench-pipeline-")
+    db.DB_PATH = os.path.join(tmp, "predictions.db")
+    db.init_db()
+    api.app.dependency_overrides[get_current_user] = lambda: {"uid": "bench"}
+
+    if args.target == "api":
+        api.svc = BatchingYoloService.from_env(DummyYoloService(args.dummy_ms))
+        storage.set_backend(storage.MemoryBackend())
+        api.publish_yolo_output = lambda payload: None
+        api.publish_yolo_outputs = lambda payloads: None
+        broker = None
+    else:
+        api.svc = api.build_service()
+        storage.set_backend(RoundTripBackend(args.firestore_rtt_ms / 1000.0))
+        os.environ["YOLO_MQ_SPILL_PATH"] = os.path.join(tmp, "spill.ndjson")
+        stats = {"connections": 0, "delivered": 0}
+        rtt = args.mq_rtt_ms / 1000.0
+        broker = patch("services.yolo.mq.pika.BlockingConnection",
+                       side_effect=lambda params: StandInConnection(params, rtt, stats))
+        broker.start()
+
+    def run(entries):
+        transport = httpx.ASGITransport(app=api.app)
+        return _replay_with_client(entries, args.concurrency, transport=transport, base_url="http://bench")
+
+    try:
+        samples, elapsed = _timed(run, log, args.warmup)
+        # Background writes are part of the pipeline's throughput.
+        start = time.perf_counter()
+        storage.close_storage()
+        mq.close_publisher()
+        db.close_db()
+        elapsed += time.perf_counter() - start
+    finally:
+        if broker is not None:
+            broker.stop()
+        api.app.dependency_overrides.clear()
+    return samples, elapsed
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Replay a request log against the YOLO pipeline.")
+    ap.add_argument("--log", default=DEFAULT_LOG)
+    ap.add_argument("--record", metavar="PATH", help="write a synthetic request log and exit")
+    ap.add_argument("--requests", type=int, default=200, help="requests to write with --record")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--target", choices=("model", "api", "e2e"), default="api")
+    ap.add_argument("--url", help="replay over HTTP against a running server")
+    ap.add_argument("--token", help="Firebase ID token for --url")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--warmup", type=int, default=5, help="requests replayed first and not measured")
+    ap.add_argument("--dummy-ms", type=float, default=20.0, help="forward-pass cost of the api target's model")
+    ap.add_argument("--firestore-rtt-ms", type=float, default=20.0)
+    ap.add_argument("--mq-rtt-ms", type=float, default=0.5)
+    ap.add_argument("--baseline", help="baseline result JSON to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    ap.add_argument("--save-baseline", metavar="PATH", help="write this run's result as a baseline")
+    args = ap.parse_args()
+
+    if args.record:
+        record_log(args.record, args.requests, args.seed)
+        print(f"Wrote {args.requests} requests to {args.record}.")
+        return
+
+    log = load_log(args.log)
+    samples, elapsed = run_target(args, log)
+    result = {
+        "target": "http" if args.url else args.target,
+        "log": args.log,
+        "concurrency": args.concurrency,
+        **report(samples, elapsed),
+    }
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.save_baseline) or ".", exist_ok=True)
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+            f.write("\n")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            result["baseline"] = compare(result, json.load(f), args.tolerance)
+
+    print(json.dumps(result, indent=2))
+    if args.baseline and result["baseline"]["regressions"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
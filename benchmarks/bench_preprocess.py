@@ -0,0 +1,79 @@
+"""
+Per-stage timings for a single /predict inference: decode, resize,
+inference and post-processing. Also times the previous full-resolution
+decode for comparison.
+
+    python -m benchmarks.bench_preprocess --width 4032 --height 3024 --repeat 20
+"""
+import argparse
+import io
+import json
+import statistics
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from services.yolo.model import YoloService
+from services.yolo.preprocess import decode, letterbox, target_shape
+
+
+def _phone_photo(width: int, height: int) -> bytes:
+    rng = np.random.default_rng(0)
+    small = rng.integers(0, 255, size=(height // 16, width // 16, 3), dtype=np.uint8)
+    img = Image.fromarray(small).resize((width, height), Image.BILINEAR)
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=92)
+    return buf.getvalue()
+
+
+def _ms(samples):
+    return round(statistics.median(samples) * 1000, 3)
+
+
+def profile(svc: YoloService, data: bytes, imgsz: int, repeat: int) -> dict:
+    stages = {"decode_full_res": [], "decode": [], "resize": [], "inference": [], "postprocess": []}
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        np.array(Image.open(io.BytesIO(data)).convert("RGB"))
+        stages["decode_full_res"].append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        img, width, height = decode(data, imgsz)
+        t1 = time.perf_counter()
+        canvas = target_shape(width, height, imgsz)[2:]
+        arr, lb = letterbox(img, width, height, imgsz, canvas)
+        t2 = time.perf_counter()
+        results = svc.model.predict(source=[arr], imgsz=imgsz, conf=0.25, iou=0.45, device="cpu", verbose=False)
+        t3 = time.perf_counter()
+        svc._format(results[0], lb, 0.25, 0.45, imgsz)
+        t4 = time.perf_counter()
+
+        stages["decode"].append(t1 - t0)
+        stages["resize"].append(t2 - t1)
+        stages["inference"].append(t3 - t2)
+        stages["postprocess"].append(t4 - t3)
+    return {name + "_ms": _ms(samples) for name, samples in stages.items()}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--width", type=int, default=4032)
+    ap.add_argument("--height", type=int, default=3024)
+    ap.add_argument("--imgsz", type=int, default=640)
+    ap.add_argument("--repeat", type=int, default=10)
+    args = ap.parse_args()
+
+    svc = YoloService()
+    inputs = {
+        "apple.jpg": Path("docs/examples/apple.jpg").read_bytes(),
+        f"synthetic_{args.width}x{args.height}.jpg": _phone_photo(args.width, args.height),
+    }
+    svc.predict(inputs["apple.jpg"])  # warm-up
+    report = {name: profile(svc, data, args.imgsz, args.repeat) for name, data in inputs.items()}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
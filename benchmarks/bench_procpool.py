@@ -0,0 +1,52 @@
+"""
+Throughput of the process-pool inference backend versus worker count.
+
+    python -m benchmarks.bench_procpool --workers 1 2 4 8 --threads 1 --requests 200
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from services.yolo.batching import BatchingYoloService
+from services.yolo.procpool import ProcessPoolYoloService
+
+
+def run(workers: int, threads: int, requests: int, image: bytes, batch: int) -> dict:
+    pool = ProcessPoolYoloService(workers=workers, torch_threads=threads)
+    svc = BatchingYoloService(pool, max_batch_size=batch, max_wait_ms=10, max_queue=requests)
+    try:
+        svc.predict(image)  # warm-up
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers * batch * 2) as clients:
+            list(clients.map(lambda _: svc.predict(image), range(requests)))
+        elapsed = time.perf_counter() - start
+    finally:
+        svc.close()
+        pool.close()
+    return {
+        "workers": workers,
+        "torch_threads": threads,
+        "requests": requests,
+        "seconds": round(elapsed, 3),
+        "images_per_sec": round(requests / elapsed, 2),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    ap.add_argument("--threads", type=int, default=1)
+    ap.add_argument("--requests", type=int, default=100)
+    ap.add_argument("--batch", type=int, default=4)
+    ap.add_argument("--image", default="docs/examples/apple.jpg")
+    args = ap.parse_args()
+
+    image = Path(args.image).read_bytes()
+    results = [run(n, args.threads, args.requests, image, args.batch) for n in args.workers]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Load-adaptive quality under a traffic spike: requests arrive at a fixed
+rate above what the model can serve at full resolution, through the same
+micro-batching front the API uses.
+
+"before" always runs at the first (full) size; "after" lets a
+QualityController step down through the configured sizes as the queue
+grows. Reports latency percentiles, the share of requests answered within
+the SLO, and how many ran at each size.
+
+    python -m benchmarks.bench_quality --rps 30 --seconds 8 --levels 640,480,320
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from services.yolo.batching import BatchingYoloService
+from services.yolo.executors import run_inference
+from services.yolo.loader import warm_up
+from services.yolo.model import YoloService
+from services.yolo.quality import QualityController, parse_levels
+
+EXAMPLE_IMAGE = "docs/examples/apple.jpg"
+
+
+async def _spike(svc: BatchingYoloService, quality: QualityController, image: bytes,
+                 rps: float, seconds: float, slo: float) -> Dict[str, Any]:
+    latencies: List[float] = []
+    sizes: Dict[str, int] = {}
+
+    async def one() -> None:
+        imgsz = quality.select()
+        start = time.perf_counter()
+        await run_inference(svc, image, imgsz=imgsz)
+        elapsed = time.perf_counter() - start
+        quality.observe(elapsed)
+        latencies.append(elapsed)
+        sizes[str(imgsz)] = sizes.get(str(imgsz), 0) + 1
+
+    start = time.perf_counter()
+    tasks = []
+    for i in range(int(rps * seconds)):
+        await asyncio.sleep(max(0.0, start + i / rps - time.perf_counter()))
+        tasks.append(asyncio.ensure_future(one()))
+    await asyncio.gather(*tasks)
+
+    ms = np.array(latencies) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 1),
+        "p95_ms": round(float(np.percentile(ms, 95)), 1),
+        "p99_ms": round(float(np.percentile(ms, 99)), 1),
+        "within_slo": round(float((ms <= slo * 1000).mean()), 3),
+        "imgsz": sizes,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rps", type=float, default=30.0)
+    ap.add_argument("--seconds", type=float, default=8.0)
+    ap.add_argument("--levels", default="640,480,320")
+    ap.add_argument("--slo-ms", type=float, default=500.0)
+    ap.add_argument("--max-queue", type=int, default=8)
+    ap.add_argument("--cooldown", type=float, default=0.5)
+    ap.add_argument("--recover", type=float, default=5.0)
+    args = ap.parse_args()
+
+    levels = parse_levels(args.levels)
+    with open(EXAMPLE_IMAGE, "rb") as f:
+        image = f.read()
+    svc = BatchingYoloService(YoloService(), max_batch_size=8, max_wait_ms=10, max_queue=100_000)
+    for size in levels:
+        warm_up(svc, 1, size)
+
+    results = {}
+    for name, sizes in (("before", levels[:1]), ("after", levels)):
+        quality = QualityController(
+            levels=sizes, max_queue=args.max_queue, max_latency_ms=args.slo_ms,
+            cooldown_s=args.cooldown, recover_s=args.recover, depth=lambda: svc.queue_depth,
+        )
+        results[name] = asyncio.run(_spike(svc, quality, image, args.rps, args.seconds, args.slo_ms / 1000))
+    svc.close()
+
+    print(json.dumps({
+        "rps": args.rps,
+        "requests": int(args.rps * args.seconds),
+        "levels": levels,
+        "slo_ms": args.slo_ms,
+        **results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Simulated fairness test for the inference scheduler: a model with a fixed
+number of slots and a fixed service time, a few light users sending
+requests at a low rate, and one heavy user sending at twice the model's
+capacity.
+
+    idle     light users only
+    before   light users plus the heavy user, first come first served
+             (one FIFO queue, bounded at --max-queue like the batch queue)
+    after    the same traffic through FairScheduler
+
+Reports light users' latency percentiles and what happened to the heavy
+user's requests. No model or network is involved; only queueing is.
+
+    python -m benchmarks.bench_scheduler --slots 4 --service-ms 20 --seconds 5
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from services.yolo.executors import Overloaded
+from services.yolo.scheduler import FairScheduler
+
+
+class FifoQueue:
+    """
+    First come, first served admission with a bounded wait queue.
+    """
+
+    def __init__(self, slots: int, max_queue: int):
+        self.semaphore = asyncio.Semaphore(slots)
+        self.max_queue = max_queue
+        self.waiting = 0
+
+    async def run(self, user, priority, fn, cost=1):
+        if self.waiting >= self.max_queue:
+            raise Overloaded("Inference queue is full")
+        self.waiting += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            return await fn()
+        finally:
+            self.semaphore.release()
+
+
+async def _traffic(admission: Any, service: float, seconds: float,
+                   light_users: int, light_rps: float, heavy_rps: float, seed: int) -> Dict[str, Any]:
+    latencies: Dict[str, List[float]] = {"light": [], "heavy": []}
+    rejected = {"light": 0, "heavy": 0}
+
+    async def model() -> None:
+        await asyncio.sleep(service)
+
+    async def request(user: str, kind: str) -> None:
+        start = time.perf_counter()
+        try:
+            await admission.run(user, "interactive", model)
+        except Overloaded:
+            rejected[kind] += 1
+            return
+        latencies[kind].append(time.perf_counter() - start)
+
+    async def user_loop(user: str, kind: str, rps: float) -> None:
+        # Seeded per user, so each user sends the same requests in every scenario.
+        rng = random.Random(f"{seed}-{user}")
+        tasks = []
+        deadline = time.perf_counter() + seconds
+        while True:
+            await asyncio.sleep(rng.expovariate(rps))
+            if time.perf_counter() >= deadline:
+                break
+            tasks.append(asyncio.ensure_future(request(user, kind)))
+        await asyncio.gather(*tasks)
+
+    loops = [user_loop(f"light-{i}", "light", light_rps) for i in range(light_users)]
+    if heavy_rps:
+        loops.append(user_loop("heavy", "heavy", heavy_rps))
+    await asyncio.gather(*loops)
+
+    def summary(values: List[float]) -> Dict[str, float]:
+        if not values:
+            return {}
+        ms = np.array(values) * 1000
+        return {f"p{q}_ms": round(float(np.percentile(ms, q)), 1) for q in (50, 95, 99)}
+
+    return {
+        "light": {"served": len(latencies["light"]), "rejected": rejected["light"], **summary(latencies["light"])},
+        "heavy": {"served": len(latencies["heavy"]), "rejected": rejected["heavy"], **summary(latencies["heavy"])},
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--slots", type=int, default=4, help="requests the model serves at once")
+    ap.add_argument("--service-ms", type=float, default=20.0, help="time per request")
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--light-users", type=int, default=8)
+    ap.add_argument("--light-rps", type=float, default=5.0, help="per light user")
+    ap.add_argument("--heavy-factor", type=float, default=2.0, help="heavy user's rate as a multiple of capacity")
+    ap.add_argument("--max-queue", type=int, default=256)
+    args = ap.parse_args()
+
+    service = args.service_ms / 1000
+    capacity = args.slots / service
+    heavy_rps = capacity * args.heavy_factor
+    common = dict(service=service, seconds=args.seconds,
+                  light_users=args.light_users, light_rps=args.light_rps, seed=1)
+
+    def fifo() -> FifoQueue:
+        return FifoQueue(args.slots, args.max_queue)
+
+    def fair() -> FairScheduler:
+        return FairScheduler(concurrency=args.slots, max_queue=args.max_queue, max_per_user=args.max_queue // 4)
+
+    async def scenario(make, heavy: float) -> Dict[str, Any]:
+        # Queues bind to the running loop, so build them inside it.
+        return await _traffic(make(), heavy_rps=heavy, **common)
+
+    print(json.dumps({
+        "capacity_rps": round(capacity, 1),
+        "light_rps_total": args.light_users * args.light_rps,
+        "heavy_rps": round(heavy_rps, 1),
+        "idle": asyncio.run(scenario(fifo, 0.0)),
+        "before": asyncio.run(scenario(fifo, heavy_rps)),
+        "after": asyncio.run(scenario(fair, heavy_rps)),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Startup profile of the YOLO API: what importing the app costs, what is
+deferred to the background model loader, and what warm-up saves the first
+request.
+
+Each measurement runs in a fresh interpreter. "before" is the previous
+behaviour (model built while the app is imported, no warm-up); "after"
+imports the app, which can serve /health straight away, then loads and
+warms the model as the startup hook does.
+
+    python -m benchmarks.bench_startup --warmup-runs 2
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+# Runs in the child interpreter; prints one JSON object.
+CHILD = r"""
+import json, sys, time
+start = time.perf_counter()
+from services.yolo import api
+imported = time.perf_counter() - start
+deferred = [m for m in ("torch", "ultralytics") if m not in sys.modules]
+
+from services.yolo.loader import synthetic_image, warm_up
+start = time.perf_counter()
+svc = api.build_service()
+loaded = time.perf_counter() - start
+warmup = warm_up(svc, {runs}, api.IMGSZ) if {runs} else 0.0
+
+image = synthetic_image(api.IMGSZ, seed=99)
+start = time.perf_counter()
+svc.predict(image)
+first = time.perf_counter() - start
+start = time.perf_counter()
+svc.predict(image)
+second = time.perf_counter() - start
+svc.close()
+print(json.dumps({{"import_s": imported, "deferred": deferred, "load_s": loaded,
+                  "warmup_s": warmup, "first_request_ms": first * 1000, "steady_request_ms": second * 1000}}))
+"""
+
+
+def _child(runs: int) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD.format(runs=runs)], capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def import_profile(top: int) -> list:
+    """
+    Slowest modules imported with the app, by cumulative time (-X importtime).
+    """
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import services.yolo.api"],
+        capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        rows.append((int(cumulative), name))
+    rows.sort(reverse=True)
+    return [{"module": name, "cumulative_ms": round(us / 1000, 1)} for us, name in rows[:top]]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--warmup-runs", type=int, default=2)
+    ap.add_argument("--top", type=int, default=10)
+    args = ap.parse_args()
+
+    before = _child(0)
+    after = _child(args.warmup_runs)
+    print(json.dumps({
+        "warmup_runs": args.warmup_runs,
+        "deferred_imports": after["deferred"],
+        # Previously /health was only reachable once the model had loaded.
+        "before_seconds_to_health": round(before["import_s"] + before["load_s"], 3),
+        "after_seconds_to_health": round(after["import_s"], 3),
+        "after_seconds_to_ready": round(after["import_s"] + after["load_s"] + after["warmup_s"], 3),
+        "before_first_request_ms": round(before["first_request_ms"], 1),
+        "after_first_request_ms": round(after["first_request_ms"], 1),
+        "steady_request_ms": round(after["steady_request_ms"], 1),
+        "import_profile": import_profile(args.top),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Sustained frame rate of /stream on one core: a simulated camera sends
+frames at a fixed rate to the real model running with one torch thread.
+
+The clip alternates still and moving segments (an object sliding across
+a noisy background), like a fixed camera. "before" infers every frame in
+arrival order, so a model slower than the camera builds a backlog; "after"
+is run_stream, which skips frames that arrive while inference is busy and
+near-duplicates of the last analysed frame.
+
+Both report frames handled per second of wall time (the camera rate it
+keeps up with), frames actually inferred, and the latency from a frame's
+arrival to its result.
+
+    python -m benchmarks.bench_stream --fps 60 --seconds 5
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from PIL import Image
+
+EXAMPLE_IMAGE = "docs/examples/apple.jpg"
+
+
+def make_clip(frames: int, width: int = 640, height: int = 480, seed: int = 0) -> List[bytes]:
+    """
+    JPEG frames: still for the first and last third, moving in between.
+    """
+    rng = np.random.default_rng(seed)
+    obj = Image.open(EXAMPLE_IMAGE).convert("RGB")
+    obj.thumbnail((height // 2, height // 2))
+    background = np.full((height, width, 3), 90, dtype=np.uint8)
+    clip = []
+    for i in range(frames):
+        moving = frames // 3 <= i < 2 * frames // 3
+        x = 20 + (i - frames // 3) * 6 if moving else (20 if i < frames // 3 else 20 + (frames // 3) * 6)
+        canvas = Image.fromarray(background)
+        canvas.paste(obj, (min(x, width - obj.width), height // 4))
+        pixels = np.asarray(canvas, dtype=np.int16) + rng.integers(-3, 4, (height, width, 3))
+        out = io.BytesIO()
+        Image.fromarray(pixels.clip(0, 255).astype(np.uint8)).save(out, "JPEG", quality=85)
+        clip.append(out.getvalue())
+    return clip
+
+
+class CameraSocket:
+    """
+    Accepted WebSocket whose frames become available at `fps`.
+    """
+
+    def __init__(self, clip: List[bytes], fps: float):
+        self.clip = clip
+        self.fps = fps
+        self.arrivals: Dict[int, float] = {}
+        self.sent = 0
+        self._next = 0
+        self._start = time.perf_counter()
+
+    async def receive(self) -> Dict[str, Any]:
+        if self._next >= len(self.clip):
+            return {"type": "websocket.disconnect", "code": 1000}
+        due = self._start + self._next / self.fps
+        await asyncio.sleep(max(0.0, due - time.perf_counter()))
+        frame = self.clip[self._next]
+        self.arrivals[id(frame)] = due
+        self._next += 1
+        return {"type": "websocket.receive", "bytes": frame}
+
+    async def send_text(self, text: str) -> None:
+        self.sent += 1
+
+    async def close(self, code: int = 1000, reason: str = None) -> None:
+        pass
+
+
+def _percentile(values: List[float], q: float) -> float:
+    return round(float(np.percentile(values, q)) * 1000, 1) if values else 0.0
+
+
+async def _run(svc: Any, clip: List[bytes], fps: float, skip: bool) -> Dict[str, Any]:
+    from services.yolo.stream import FrameFilter, run_stream
+
+    socket = CameraSocket(clip, fps)
+    latencies: List[float] = []
+
+    async def infer(frame: bytes) -> Dict[str, Any]:
+        result = await run_in_threadpool(svc.predict, frame)
+        latencies.append(time.perf_counter() - socket.arrivals[id(frame)])
+        return result
+
+    start = time.perf_counter()
+    if skip:
+        await run_stream(socket, infer, FrameFilter())
+    else:
+        while True:
+            message = await socket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            await infer(message["bytes"])
+            await socket.send_text("")
+    elapsed = time.perf_counter() - start
+    return {
+        "seconds": round(elapsed, 2),
+        "handled_fps": round(len(clip) / elapsed, 1),
+        "inferred": len(latencies),
+        "latency_p50_ms": _percentile(latencies, 50),
+        "latency_p95_ms": _percentile(latencies, 95),
+        "messages": socket.sent,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--fps", type=float, default=60.0, help="camera frame rate")
+    ap.add_argument("--seconds", type=float, default=5.0, help="clip length")
+    args = ap.parse_args()
+
+    # One core: the figure is per-core throughput.
+    os.environ["OMP_NUM_THREADS"] = "1"
+    from services.yolo.loader import warm_up
+    from services.yolo.model import YoloService
+
+    svc = YoloService()
+    warm_up(svc, 2, 640)
+    clip = make_clip(int(args.fps * args.seconds))
+
+    before = asyncio.run(_run(svc, clip, args.fps, skip=False))
+    after = asyncio.run(_run(svc, clip, args.fps, skip=True))
+    print(json.dumps({
+        "camera_fps": args.fps,
+        "frames": len(clip),
+        "torch_threads": 1,
+        "before": before,
+        "after": after,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
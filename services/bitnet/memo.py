@@ -0,0 +1,169 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from services.yolo.metrics import Counter, Gauge
+
+MEMO_HITS = Counter("bitnet_recipe_memo_hits_total", "Recipe memo hits.", labelnames=("tier",))
+MEMO_MISSES = Counter("bitnet_recipe_memo_misses_total", "Recipes generated because no memoized result existed.")
+MEMO_COALESCED = Counter(
+    "bitnet_recipe_memo_coalesced_total",
+    "Requests that waited for an identical in-flight generation instead of running their own.",
+)
+MEMO_ENTRIES = Gauge("bitnet_recipe_memo_entries", "Recipes held in the in-process memo.")
+
+
+def normalize_labels(labels: Iterable[str]) -> Tuple[str, ...]:
+    """
+    Canonical ingredient set: trimmed, lower-cased, de-duplicated and sorted.
+    """
+    return tuple(sorted({label.strip().lower() for label in labels if label and label.strip()}))
+
+
+def recipe_key(labels: Tuple[str, ...], version: str) -> str:
+    return json.dumps([version, list(labels)], separators=(",", ":"))
+
+
+class RecipeMemo:
+    """
+    Memoizes generated recipes by ingredient set and generator version.
+
+    The in-process tier is an LRU of up to `max_entries` recipes, each kept
+    for `ttl` seconds. An optional SQLite tier at `disk_path` is shared by
+    every worker replica that mounts it. Concurrent requests for the same key
+    are coalesced so only one generation runs. Values are stored
+    JSON-encoded, so callers always get their own copy.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600.0, disk_path: Optional[str] = None):
+        self.max_entries = max(0, int(max_entries))
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._disk: Optional[sqlite3.Connection] = None
+        self._disk_lock = threading.Lock()
+        self._disk_writes = 0
+        if disk_path:
+            self._open_disk(disk_path)
+        MEMO_ENTRIES.set_function(lambda: len(self._entries))
+
+    @classmethod
+    def from_env(cls) -> "RecipeMemo":
+        return cls(
+            max_entries=int(os.getenv("BITNET_MEMO_MAX_ENTRIES", "1024")),
+            ttl=float(os.getenv("BITNET_MEMO_TTL_S", "3600")),
+            disk_path=os.getenv("BITNET_MEMO_PATH") or None,
+        )
+
+    def _open_disk(self, path: str) -> None:
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Replicas write to the same file, so wait for each other's locks.
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS recipes (
+                key        TEXT PRIMARY KEY,
+                value      TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+            """
+        )
+        conn.commit()
+        self._disk = conn
+
+    def get_or_generate(self, key: str, generate: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        blob = self._get_memory(key)
+        if blob is not None:
+            MEMO_HITS.labels(tier="memory").inc()
+            return json.loads(blob)
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            MEMO_COALESCED.inc()
+            return json.loads(future.result())
+
+        try:
+            # Another leader may have finished between the lookup and now.
+            tier, blob = "memory", self._get_memory(key)
+            if blob is None:
+                tier, blob = "disk", self._get_disk(key)
+            if blob is not None:
+                MEMO_HITS.labels(tier=tier).inc()
+            else:
+                MEMO_MISSES.inc()
+                blob = json.dumps(generate(), separators=(",", ":"))
+                self._put_disk(key, blob)
+            self._put_memory(key, blob)
+            future.set_result(blob)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+        return json.loads(blob)
+
+    def _get_memory(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, blob = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return blob
+
+    def _put_memory(self, key: str, blob: str) -> None:
+        if self.max_entries == 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, blob)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _get_disk(self, key: str) -> Optional[str]:
+        if self._disk is None:
+            return None
+        with self._disk_lock:
+            row = self._disk.execute(
+                "SELECT value FROM recipes WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row is not None else None
+
+    def _put_disk(self, key: str, blob: str) -> None:
+        if self._disk is None:
+            return
+        now = time.time()
+        with self._disk_lock:
+            self._disk.execute(
+                "INSERT OR REPLACE INTO recipes (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, blob, now + self.ttl),
+            )
+            self._disk_writes += 1
+            if self._disk_writes % 100 == 0:
+                self._disk.execute("DELETE FROM recipes WHERE expires_at <= ?", (now,))
+            self._disk.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        if self._disk is not None:
+            with self._disk_lock:
+                self._disk.execute("DELETE FROM recipes")
+                self._disk.commit()
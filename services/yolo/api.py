@@ -1,13 +1,39 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends
-from fastapi.responses import JSONResponse
-from services.yolo.db import init_db, log_prediction, list_predictions
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Header, Query, Request, WebSocket
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from services.yolo.db import (
+    init_db, close_db, log_prediction, log_predictions, query_predictions, count_predictions,
+    create_recipe, create_recipes, commit, prediction_statement, recipe_statement, Statement,
+)
 from services.yolo.model import YoloService
-from services.yolo.storage import init_firebase, save_output, list_outputs, update_output, delete_output
+from services.yolo.storage import (
+    init_firebase, close_storage, save_output, save_outputs, iter_outputs, update_output, delete_output,
+    new_output_id,
+)
 from datetime import datetime
-from typing import Any, Dict
-from services.yolo.mq import publish_yolo_output
-from services.yolo.auth import get_current_user
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from services.yolo.mq import close_publisher, publish_yolo_output, publish_yolo_outputs
+from services.yolo.auth import get_current_user, get_websocket_user
+from services.yolo.batching import BatchingYoloService
+from services.yolo.encoding import encode_json, render, to_columnar
+from services.yolo.ingest import iter_uploads, take
+from services.yolo.cache import ResultCache, cache_key, model_fingerprint
+from services.yolo.procpool import ProcessPoolYoloService
+from services.yolo.executors import Overloaded, inference_executor, run_inference, run_inference_batch, run_io
+from services.yolo.recipes import ResultConsumer, wait_for_recipe
+from services.yolo.loader import ModelLoader
+from services.yolo.outbox import OutboxDispatcher, firestore_effect, rabbitmq_effect
+from services.yolo.quality import QualityController
+from services.yolo.scheduler import FairScheduler, RateLimited
+from services.yolo.stream import FrameFilter, run_stream
+from services.yolo.timing import stages
+from services.yolo import metrics
+from time import perf_counter
+import asyncio
+import math
+import os
 import time
+import uuid
 
 app = FastAPI(
     title="YOLO11n Inference API",
@@ -15,86 +41,643 @@ app = FastAPI(
     description="Stage 3 FastAPI YOLO inference service"
 )
 
-svc = YoloService()
+HTTP_IN_FLIGHT = metrics.Gauge("yolo_http_requests_in_flight", "HTTP requests currently being handled.")
+HTTP_REQUESTS = metrics.Counter(
+    "yolo_http_requests_total", "HTTP requests handled.", labelnames=("route", "status"),
+)
+HTTP_SECONDS = metrics.Histogram(
+    "yolo_http_request_seconds",
+    "Time to handle an HTTP request, including streaming its body.",
+    labelnames=("route",),
+)
+
+_route_paths: Dict[Any, str] = {}
+
+def _route_path(endpoint: Any) -> str:
+    if not _route_paths:
+        _route_paths.update((getattr(r, "endpoint", None), r.path) for r in app.routes)
+    return _route_paths.get(endpoint, "other")
+
+class RequestMetrics:
+    """
+    ASGI middleware that tracks requests in flight and counts and times
+    requests by route template, so path parameters do not add series.
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_with_status(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = _route_path(scope.get("endpoint"))
+            HTTP_SECONDS.labels(route=route).observe(perf_counter() - start)
+            HTTP_REQUESTS.labels(route=route, status=str(status)).inc()
+
+app.add_middleware(RequestMetrics)
+
+def build_service():
+    """
+    Build the inference service: in-process by default, or a pool of worker
+    processes when YOLO_WORKERS is set. Either way requests are micro-batched.
+    """
+    if int(os.getenv("YOLO_WORKERS", "0")) > 0:
+        return BatchingYoloService.from_env(ProcessPoolYoloService.from_env())
+    return BatchingYoloService.from_env(YoloService(backend=os.getenv("YOLO_BACKEND", "torch")))
+
+# Built in the background at startup (see on_startup), so importing the app
+# does not load torch or the weights.
+svc: Any = None
+model_loader: Optional[ModelLoader] = None
+result_cache = ResultCache.from_env()
+
+# Inference settings for /predict; part of the result cache key.
+CONF, IOU, IMGSZ = 0.25, 0.45, 640
+
+# Orders inference across users and priority classes (YOLO_SCHEDULER_*).
+scheduler = FairScheduler.from_env()
+
+def _inference_queue_depth() -> int:
+    depth = getattr(svc, "queue_depth", None)
+    return scheduler.queued + (inference_executor.pending if depth is None else depth)
+
+# Picks the input size per request, stepping down under load (YOLO_QUALITY_*).
+quality = QualityController.from_env(depth=_inference_queue_depth)
+
+result_consumer: Optional[ResultConsumer] = None
+
+# With YOLO_OUTBOX=1, predictions are committed to SQLite together with their
+# Firestore and RabbitMQ side effects, which a background dispatcher delivers.
+OUTBOX = os.getenv("YOLO_OUTBOX", "0") != "0"
+outbox_dispatcher: Optional[OutboxDispatcher] = None
+
+def _set_service(service: Any) -> None:
+    global svc
+    svc = service
 
 @app.on_event("startup")
 def on_startup() -> None:
+    global result_consumer, model_loader, outbox_dispatcher
+    _check_batch_settings()
     init_db()
     init_firebase()
+    if OUTBOX:
+        outbox_dispatcher = OutboxDispatcher.from_env().start()
+    if svc is None:
+        model_loader = ModelLoader(
+            build_service, _set_service,
+            warmup_runs=int(os.getenv("YOLO_WARMUP_RUNS", "2")),
+            imgsz=IMGSZ, conf=CONF, iou=IOU,
+            extra_sizes=quality.levels,
+        ).start()
+    if os.getenv("YOLO_RECIPE_RESULTS", "1") != "0":
+        result_consumer = ResultConsumer().start()
+
+@app.on_event("shutdown")
+def on_shutdown() -> None:
+    if result_consumer is not None:
+        result_consumer.stop()
+    if outbox_dispatcher is not None:
+        outbox_dispatcher.stop()
+    close_db()
+    close_storage()
+    close_publisher()
+    close = getattr(svc, "close", None)
+    if close is not None:
+        close()
+    inner_close = getattr(getattr(svc, "service", None), "close", None)
+    if inner_close is not None:
+        inner_close()
 
 @app.get("/health")
 def health():
+    """
+    Liveness: the process is up and serving requests.
+    """
     return {"status": "ok"}
 
+@app.get("/ready")
+def ready():
+    """
+    Readiness: the model is loaded and warmed up, so the replica can take
+    traffic. Returns 503 with the loader's state until then.
+    """
+    if model_loader is not None and not model_loader.ready:
+        body = {"status": model_loader.state}
+        if model_loader.error:
+            body["error"] = model_loader.error
+        return JSONResponse(body, status_code=503)
+    if svc is None:
+        return JSONResponse({"status": "loading"}, status_code=503)
+    return {"status": "ready"}
+
+def _require_service() -> None:
+    if svc is None:
+        raise HTTPException(503, "Model is loading", headers={"Retry-After": "5"})
+
+def _admit(user: Dict[str, Any]) -> None:
+    try:
+        scheduler.admit(user.get("uid"))
+    except RateLimited as e:
+        raise HTTPException(429, "Rate limit exceeded", headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))})
+
+@app.get("/metrics")
+def get_metrics():
+    """
+    Expose service metrics in the Prometheus text format.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+def _recipe_message(result: Dict[str, Any], recipe_id: str, timings: Dict[str, float]) -> Dict[str, Any]:
+    """
+    The message BitNet receives: the YOLO output plus the id its recipe is
+    stored under and the timestamps of the stages so far.
+    """
+    return {**result, "correlation_id": recipe_id, "timings": {**timings, "published": time.time()}}
+
+async def _publish(result: Dict[str, Any], recipe_id: str, timings: Dict[str, float]) -> None:
+    try:
+        await run_io("rabbitmq", publish_yolo_output, _recipe_message(result, recipe_id, timings))
+    except Overloaded:
+        raise
+    except Exception as e:
+        print(f"[Stage6] Warning: failed to publish to RabbitMQ: {e}")
+
+def _outcome_statements(filename: str, result: Dict[str, Any], recipe_id: str, user_id: Optional[str],
+                        timings: Dict[str, float], created_at: str,
+                        store_output: bool = True) -> Tuple[List[Statement], Optional[str]]:
+    """
+    Everything one prediction writes, as statements for a single SQLite
+    transaction: its row and recipe, plus outbox entries for the Firestore
+    document (unless `store_output` is False) and the RabbitMQ message.
+    Returns them with the document id.
+    """
+    statements = [recipe_statement(recipe_id, user_id, created_at)]
+    firebase_id = None
+    if result.get("detections"):
+        top = result["detections"][0]
+        label = top.get("label", "unknown")
+        confidence = float(top.get("confidence", 0.0))
+        statements.append(prediction_statement(filename, label, confidence, user_id, created_at))
+        firebase_id = new_output_id() if store_output else None
+        if firebase_id is not None:
+            statements.append(firestore_effect(firebase_id, {
+                "filename": filename,
+                "label": label,
+                "confidence": confidence,
+                "created_at": created_at,
+                "raw_result": result,
+            }))
+    statements.append(rabbitmq_effect(recipe_id, _recipe_message(result, recipe_id, timings)))
+    return statements, firebase_id
+
+async def _commit_outcomes(statements: List[Statement]) -> None:
+    await run_io("sqlite", commit, statements)
+    if outbox_dispatcher is not None:
+        outbox_dispatcher.notify()
+
+def _respond(body: Dict[str, Any], layout: str, accept: Optional[str]):
+    if layout == "columnar":
+        body = to_columnar(body, getattr(svc, "class_names", None))
+    return render(body, accept)
+
 @app.post("/predict")
 async def predict(
     file: UploadFile = File(...),
     user: Dict[str, Any] = Depends(get_current_user),
+    layout: str = Query("rows", alias="format", pattern="^(rows|columnar)$"),
+    accept: Optional[str] = Header(None),
 ):
+    """
+    Run YOLO on an uploaded image.
+
+    `?format=columnar` returns parallel label/score/class-id/box arrays instead
+    of one object per detection; `Accept: application/msgpack` returns msgpack.
+    Under load the image may run at a reduced input size; `meta.imgsz` and
+    `meta.quality_level` (0 is full quality) report what was used.
+    """
     if file.content_type not in ("image/jpeg", "image/png", "image/jpg"):
         raise HTTPException(400, "Unsupported file type")
+    _require_service()
+    _admit(user)
 
-    data = await file.read()
+    timings = {"received": time.time()}
+    recipe_id = uuid.uuid4().hex
+    with stages.time("upload_read"):
+        data = await file.read()
 
-    start = time.time()
-    result = svc.predict(data)
-    duration = time.time() - start
-    print(f"[Monitor] YOLO inference time: {duration:.4f} seconds")
+    imgsz = quality.select()
+    key = None
+    if result_cache.enabled:
+        model = model_fingerprint(getattr(svc, "weights", None), getattr(svc, "backend", "torch"))
+        key = await run_io("cache", cache_key, data, CONF, IOU, imgsz, model)
+        cached = await run_io("cache", result_cache.get, key)
+        if cached is not None:
+            # Same image and settings as an earlier upload: reuse its result
+            # instead of running inference and writing the Firestore document
+            # again. The prediction is still logged for this user.
+            timings["inferred"] = time.time()
+            result = cached["result"]
+            if OUTBOX:
+                statements, _ = _outcome_statements(
+                    file.filename or "uploaded", result, recipe_id, user.get("uid"), timings,
+                    datetime.utcnow().isoformat(), store_output=False,
+                )
+                writes = [_commit_outcomes(statements)]
+            else:
+                writes = [
+                    run_io("sqlite", create_recipe, recipe_id, user.get("uid")),
+                    _publish(result, recipe_id, timings),
+                ]
+                if result.get("detections"):
+                    top = result["detections"][0]
+                    writes.append(run_io(
+                        "sqlite", log_prediction, filename=file.filename or "uploaded",
+                        label=top.get("label", "unknown"), confidence=float(top.get("confidence", 0.0)),
+                        user_id=user.get("uid"),
+                    ))
+            try:
+                await asyncio.gather(*writes)
+            except Overloaded:
+                raise HTTPException(503, "Storage queue is full", headers={"Retry-After": "1"})
+            response_body = dict(result)
+            response_body["recipe_id"] = recipe_id
+            # The stored document belongs to whoever uploaded the image first.
+            if cached.get("firebase_id") is not None and cached.get("user_id") == user.get("uid"):
+                response_body["firebase_id"] = cached["firebase_id"]
+            response_body["cached"] = True
+            return _respond(response_body, layout, accept)
 
-    firebase_id = None
-
-    if result.get("detections"):
-        top = result["detections"][0]
-        filename = file.filename or "uploaded"
-        label = top.get("label", "unknown")
-        confidence = float(top.get("confidence", 0.0))
-        created_at = datetime.utcnow().isoformat()
+    try:
+        started = perf_counter()
+        result = await scheduler.run(
+            user.get("uid"), "interactive",
+            lambda: run_inference(svc, data, conf=CONF, iou=IOU, imgsz=imgsz),
+        )
+    except Overloaded:
+        raise HTTPException(503, "Inference queue is full", headers={"Retry-After": "1"})
+    quality.observe(perf_counter() - started)
+    result.setdefault("meta", {})["quality_level"] = quality.levels.index(imgsz)
+    timings["inferred"] = time.time()
 
-        log_prediction(
-            filename=filename,
-            label=label,
-            confidence=confidence,
+    firebase_id = None
+    if OUTBOX:
+        # Rows and side effects commit together; the dispatcher delivers the
+        # Firestore document and the message.
+        statements, firebase_id = _outcome_statements(
+            file.filename or "uploaded", result, recipe_id, user.get("uid"), timings,
+            datetime.utcnow().isoformat(),
         )
+        try:
+            await _commit_outcomes(statements)
+        except Overloaded:
+            raise HTTPException(503, "Storage queue is full", headers={"Retry-After": "1"})
+    else:
+        writes = []
+        if result.get("detections"):
+            top = result["detections"][0]
+            filename = file.filename or "uploaded"
+            label = top.get("label", "unknown")
+            confidence = float(top.get("confidence", 0.0))
+            created_at = datetime.utcnow().isoformat()
 
-        firebase_payload = {
-            "filename": filename,
-            "label": label,
-            "confidence": confidence,
-            "created_at": created_at,
-            "raw_result": result,
-        }
-        firebase_id = save_output(firebase_payload)
+            firebase_payload = {
+                "filename": filename,
+                "label": label,
+                "confidence": confidence,
+                "created_at": created_at,
+                "raw_result": result,
+            }
+            writes = [
+                run_io("sqlite", log_prediction, filename=filename, label=label,
+                       confidence=confidence, user_id=user.get("uid")),
+                run_io("firestore", save_output, firebase_payload),
+            ]
 
-    try:
-        publish_yolo_output(result)
-    except Exception as e:
-        print(f"[Stage6] Warning: failed to publish to RabbitMQ: {e}")
+        # The three stores are independent, so write to them concurrently.
+        try:
+            outcomes = await asyncio.gather(
+                *writes,
+                _publish(result, recipe_id, timings),
+                run_io("sqlite", create_recipe, recipe_id, user.get("uid")),
+            )
+        except Overloaded:
+            raise HTTPException(503, "Storage queue is full", headers={"Retry-After": "1"})
+        if writes:
+            firebase_id = outcomes[1]
 
     response_body = dict(result)
+    response_body["recipe_id"] = recipe_id
     if firebase_id is not None:
         response_body["firebase_id"] = firebase_id
 
-    return JSONResponse(content=response_body)
+    if key is not None:
+        await run_io("cache", result_cache.put, key, {
+            "result": result, "firebase_id": firebase_id, "user_id": user.get("uid"),
+        })
+
+    return _respond(response_body, layout, accept)
+
+BATCH_CHUNK = int(os.getenv("YOLO_BATCH_MAX_SIZE", "8"))
+# How long a /predict/batch chunk keeps retrying for inference queue room
+# before its remaining images are reported as failed.
+BATCH_RETRY_S = float(os.getenv("YOLO_BATCH_RETRY_S", "30"))
+
+def _check_batch_settings() -> None:
+    max_queue = int(os.getenv("YOLO_BATCH_MAX_QUEUE", "256"))
+    if BATCH_CHUNK > max_queue:
+        raise ValueError(
+            f"YOLO_BATCH_MAX_SIZE ({BATCH_CHUNK}) must not exceed YOLO_BATCH_MAX_QUEUE ({max_queue})"
+        )
+
+async def _infer_chunk(images: List[bytes], user_id: Optional[str],
+                       is_disconnected: Callable[[], Awaitable[bool]]) -> Optional[List[Any]]:
+    """
+    Run a chunk in the scheduler's batch class. The client is already
+    streaming, so a full queue is waited out: images not yet accepted are
+    retried in smaller groups for up to BATCH_RETRY_S, then fail with
+    Overloaded. Returns None if the client disconnects while waiting.
+    """
+    results: List[Any] = [None] * len(images)
+    pending = list(range(len(images)))
+    size = len(pending)
+    deadline = time.monotonic() + BATCH_RETRY_S
+    while pending:
+        group = pending[:size]
+        imgsz = quality.select()
+        try:
+            outputs = await scheduler.run(
+                user_id, "batch",
+                lambda: run_inference_batch(svc, [images[i] for i in group], conf=CONF, iou=IOU, imgsz=imgsz),
+                cost=len(group),
+            )
+        except Overloaded as e:
+            if time.monotonic() >= deadline:
+                for i in pending:
+                    results[i] = e
+                break
+            if await is_disconnected():
+                return None
+            size = max(1, size // 2)
+            await asyncio.sleep(0.1)
+            continue
+        for i, result in zip(group, outputs):
+            if not isinstance(result, Exception):
+                result.setdefault("meta", {})["quality_level"] = quality.levels.index(imgsz)
+            results[i] = result
+        pending = pending[len(group):]
+    return results
+
+async def _stream_batch(uploads: List[UploadFile], user_id: Optional[str],
+                        is_disconnected: Callable[[], Awaitable[bool]]) -> AsyncIterator[bytes]:
+    items = iter_uploads((f.filename or "uploaded", f.content_type, f.file) for f in uploads)
+    while True:
+        with stages.time("upload_read"):
+            chunk = await run_in_threadpool(take, items, BATCH_CHUNK)
+        if not chunk:
+            break
+
+        received = time.time()
+        images = [data for _, data in chunk if not isinstance(data, Exception)]
+        inferred = await _infer_chunk(images, user_id, is_disconnected) if images else []
+        if inferred is None:
+            print(f"[Batch] Client disconnected; stopping batch for {user_id}.")
+            return
+        outputs = iter(inferred)
+        timings = {"received": received, "inferred": time.time()}
+        lines, rows, payloads, published = [], [], [], []
+        statements: List[Statement] = []
+        created_at = datetime.utcnow().isoformat()
+        for filename, data in chunk:
+            result = data if isinstance(data, Exception) else next(outputs)
+            if isinstance(result, Exception):
+                lines.append({"filename": filename, "error": str(result)})
+                continue
+            recipe_id = uuid.uuid4().hex
+            line = {"filename": filename, **result, "recipe_id": recipe_id}
+            lines.append(line)
+            if OUTBOX:
+                outcome, firebase_id = _outcome_statements(filename, result, recipe_id, user_id, timings, created_at)
+                statements.extend(outcome)
+                if firebase_id is not None:
+                    line["firebase_id"] = firebase_id
+                continue
+            published.append(_recipe_message(result, recipe_id, timings))
+            if result.get("detections"):
+                top = result["detections"][0]
+                row = {
+                    "filename": filename,
+                    "label": top.get("label", "unknown"),
+                    "confidence": float(top.get("confidence", 0.0)),
+                }
+                rows.append({**row, "user_id": user_id})
+                payloads.append(({**row, "created_at": created_at, "raw_result": result}, line))
+
+        try:
+            if OUTBOX:
+                if statements:
+                    await _commit_outcomes(statements)
+            else:
+                firebase_ids, _, _, _ = await asyncio.gather(
+                    run_io("firestore", save_outputs, [p for p, _ in payloads]),
+                    run_io("sqlite", log_predictions, rows),
+                    run_io("rabbitmq", publish_yolo_outputs, published),
+                    run_io("sqlite", create_recipes, [m["correlation_id"] for m in published], user_id),
+                )
+                for (_, line), firebase_id in zip(payloads, firebase_ids):
+                    if firebase_id is not None:
+                        line["firebase_id"] = firebase_id
+        except Overloaded:
+            # The chunk's outcomes were not stored, so its recipe ids would
+            # never resolve; report each image as failed and keep streaming.
+            print(f"[Batch] Storage queue full; failing a chunk of {len(lines)} for {user_id}.")
+            lines = [line if "error" in line else {"filename": line["filename"], "error": "Storage queue is full"}
+                     for line in lines]
+
+        yield b"".join(encode_json(line) + b"\n" for line in lines)
+
+@app.post("/predict/batch")
+async def predict_batch(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    user: Dict[str, Any] = Depends(get_current_user),
+):
+    """
+    Run YOLO on many images in one request.
+
+    Accepts several image parts and/or zip/tar archives of images. Results are
+    streamed back as NDJSON, one line per image, as each batch completes.
+    Database, Firestore and RabbitMQ writes are issued in bulk per batch.
+    Inference runs in the scheduler's batch class, behind interactive requests.
+    """
+    _require_service()
+    _admit(user)
+    return StreamingResponse(_stream_batch(files, user.get("uid"), request.is_disconnected), media_type="application/x-ndjson")
+
+STREAM_DIFF_THRESHOLD = float(os.getenv("YOLO_STREAM_DIFF_THRESHOLD", "4"))
+STREAM_MAX_FRAME_BYTES = int(float(os.getenv("YOLO_STREAM_MAX_FRAME_MB", "8")) * (1 << 20))
+
+@app.websocket("/stream")
+async def stream(
+    websocket: WebSocket,
+    user: Dict[str, Any] = Depends(get_websocket_user),
+):
+    """
+    Run YOLO on a live sequence of frames.
+
+    The client sends each frame (JPEG/PNG) as a binary message. Frames that
+    arrive while inference is busy are skipped in favour of the newest, and
+    near-duplicates of the last analysed frame are not inferred. A JSON
+    message is sent whenever the set of detected labels changes. Results are
+    not stored or published.
+    """
+    await websocket.accept()
+    if svc is None:
+        await websocket.close(code=1013, reason="Model is loading")
+        return
+    try:
+        scheduler.admit(user.get("uid"))
+    except RateLimited:
+        await websocket.close(code=1013, reason="Rate limit exceeded")
+        return
+    stats = await run_stream(
+        websocket,
+        lambda frame: scheduler.run(
+            user.get("uid"), "interactive",
+            lambda: run_inference(svc, frame, conf=CONF, iou=IOU, imgsz=quality.select()),
+        ),
+        FrameFilter(threshold=STREAM_DIFF_THRESHOLD),
+        max_frame_bytes=STREAM_MAX_FRAME_BYTES,
+    )
+    print(f"[Stream] {user.get('uid')} disconnected: {stats}")
 
 @app.get("/predictions")
 def get_predictions(
-    limit: int = 50,
+    limit: int = Query(50, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    label: Optional[str] = None,
+    user_id: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
     user: Dict[str, Any] = Depends(get_current_user),
 ):
     """
-    Return the most recent logged predictions.
+    Return logged predictions, newest first.
+
+    Filter by `label`, `user_id` and an ISO time range (`since` inclusive,
+    `until` exclusive). When more rows exist, the `X-Next-Cursor` response
+    header holds the `cursor` value for the next page.
     """
-    return list_predictions(limit=limit)
+    try:
+        rows, next_cursor = query_predictions(
+            limit=limit, cursor=cursor, label=label, user_id=user_id, since=since, until=until,
+        )
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return JSONResponse(rows, headers=headers)
+
+@app.get("/predictions/counts")
+def get_prediction_counts(
+    bucket: str = Query("hour", pattern="^(hour|day)$"),
+    label: Optional[str] = None,
+    user_id: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    user: Dict[str, Any] = Depends(get_current_user),
+):
+    """
+    Count logged predictions per label per hour or day.
+    """
+    return count_predictions(bucket=bucket, label=label, user_id=user_id, since=since, until=until)
+
+RECIPE_MAX_WAIT = float(os.getenv("YOLO_RECIPE_MAX_WAIT", "30"))
+SSE_KEEPALIVE = 15.0
+
+async def _recipe_for(recipe_id: str, user: Dict[str, Any], wait: float) -> Optional[Dict[str, Any]]:
+    record = await wait_for_recipe(recipe_id, wait)
+    # Recipes are private to the user who uploaded the image; one without a
+    # recorded owner is not shown to anybody.
+    if record is not None and (record.get("user_id") is None or record["user_id"] != user.get("uid")):
+        return None
+    return record
+
+@app.get("/recipes/{recipe_id}")
+async def get_recipe(
+    recipe_id: str,
+    wait: float = Query(0, ge=0),
+    user: Dict[str, Any] = Depends(get_current_user),
+):
+    """
+    Return the BitNet recipe for a `/predict` call's `recipe_id`.
+
+    With `?wait=N` the request is held for up to N seconds (capped at
+    YOLO_RECIPE_MAX_WAIT) until the recipe is ready. A recipe that is still
+    being generated is returned with status 202.
+    """
+    record = await _recipe_for(recipe_id, user, min(wait, RECIPE_MAX_WAIT))
+    if record is None:
+        raise HTTPException(404, "Recipe not found")
+    return JSONResponse(record, status_code=200 if record["status"] == "done" else 202)
+
+async def _recipe_events(recipe_id: str, user: Dict[str, Any]) -> AsyncIterator[bytes]:
+    while True:
+        record = await _recipe_for(recipe_id, user, SSE_KEEPALIVE)
+        if record is None:
+            yield b"event: error\ndata: " + encode_json({"detail": "Recipe not found"}) + b"\n\n"
+            return
+        if record["status"] == "done":
+            yield b"event: recipe\ndata: " + encode_json(record) + b"\n\n"
+            return
+        yield b": keepalive\n\n"
+
+@app.get("/recipes/{recipe_id}/events")
+async def recipe_events(
+    recipe_id: str,
+    user: Dict[str, Any] = Depends(get_current_user),
+):
+    """
+    Server-sent events stream that emits a single `recipe` event once the
+    recipe is ready, with keep-alive comments while it is pending.
+    """
+    return StreamingResponse(
+        _recipe_events(recipe_id, user),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
 
 @app.get("/firebase/predictions")
 def get_firebase_predictions(
-    limit: int = 50,
+    limit: int = Query(50, ge=1, le=500),
+    start_after: Optional[str] = None,
+    fields: Optional[str] = None,
     user: Dict[str, Any] = Depends(get_current_user),
 ):
     """
-    List model outputs stored in Firebase.
+    List model outputs stored in Firebase, newest first, as NDJSON.
+
+    Pass the `id` of the last document as `start_after` to get the next page.
+    `fields` is a comma-separated projection, e.g. `filename,label,created_at`,
+    so list views need not fetch `raw_result`.
     """
-    return list_outputs(limit=limit)
+    projection = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    docs = iter_outputs(limit=limit, start_after=start_after, fields=projection)
+    return StreamingResponse((encode_json(doc) + b"\n" for doc in docs), media_type="application/x-ndjson")
 
 
 @app.put("/firebase/predictions/{doc_id}")
@@ -109,7 +692,10 @@ def update_firebase_prediction(
     """
     if not updates:
         raise HTTPException(400, "No updates provided")
-    update_output(doc_id, updates)
+    try:
+        update_output(doc_id, updates)
+    except KeyError:
+        raise HTTPException(404, "Prediction not found")
     return {"status": "updated", "id": doc_id}
 
 
@@ -1,11 +1,102 @@
-from typing import Dict, Any
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, WebSocket, WebSocketException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from firebase_admin import auth as firebase_auth
 
+from services.yolo.metrics import Counter
+
 security = HTTPBearer(auto_error=False)
 
+AUTH_CACHE_HITS = Counter("yolo_auth_cache_hits_total", "ID tokens accepted from the verification cache.")
+AUTH_CACHE_MISSES = Counter("yolo_auth_cache_misses_total", "ID tokens that had to be verified.")
+
+Verifier = Callable[[str], Dict[str, Any]]
+
+
+class TokenCache:
+    """
+    LRU cache of verified ID token claims, keyed by a hash of the token.
+
+    An entry is only served until the token's `exp` claim, so a cached token
+    is never accepted after it would have failed verification for expiry.
+    Failed verifications are not cached.
+    """
+
+    def __init__(self, max_entries: int = 10_000):
+        self.max_entries = max(0, int(max_entries))
+        self._entries: "OrderedDict[bytes, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        key = self.key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, claims = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        return dict(claims)
+
+    def put(self, token: str, claims: Dict[str, Any]) -> None:
+        exp = claims.get("exp")
+        if self.max_entries == 0 or not isinstance(exp, (int, float)):
+            return
+        with self._lock:
+            key = self.key(token)
+            self._entries[key] = (float(exp), dict(claims))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(max_entries=int(os.getenv("YOLO_AUTH_CACHE_SIZE", "10000")))
+
+# None means firebase_admin's verify_id_token.
+_verifier: Optional[Verifier] = None
+
+
+def set_verifier(verifier: Optional[Verifier]) -> None:
+    """
+    Replace the function that verifies ID tokens, e.g. with one that checks
+    locally signed tokens in tests and benchmarks. None restores Firebase.
+    Clears the cache.
+    """
+    global _verifier
+    _verifier = verifier
+    token_cache.clear()
+
+
+def verify_token(token: str) -> Dict[str, Any]:
+    """
+    Return the decoded claims for an ID token, verifying it only if it is not
+    already cached. Raises whatever the verifier raises for a bad token.
+    """
+    claims = token_cache.get(token)
+    if claims is not None:
+        AUTH_CACHE_HITS.inc()
+        return claims
+    AUTH_CACHE_MISSES.inc()
+    claims = (_verifier or firebase_auth.verify_id_token)(token)
+    token_cache.put(token, claims)
+    return claims
+
 
 def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
@@ -27,7 +118,7 @@ def get_current_user(
     token = credentials.credentials
 
     try:
-        decoded = firebase_auth.verify_id_token(token)
+        decoded = verify_token(token)
     except Exception:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -36,3 +127,27 @@ def get_current_user(
         )
 
     return decoded
+
+
+def get_websocket_user(
+    websocket: WebSocket,
+    token: Optional[str] = Query(None),
+) -> Dict[str, Any]:
+    """
+    Dependency that verifies a Firebase ID token for a WebSocket, from the
+    `token` query parameter (browsers cannot set headers on a WebSocket) or
+    the Authorization header.
+
+    On failure, closes the handshake with 1008 (policy violation).
+    """
+    if token is None:
+        scheme, _, value = websocket.headers.get("authorization", "").partition(" ")
+        if scheme.lower() == "bearer" and value:
+            token = value
+    if not token:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="Missing token")
+
+    try:
+        return verify_token(token)
+    except Exception:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="Invalid or expired token")
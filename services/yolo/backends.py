@@ -0,0 +1,114 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from typing import Any, Callable, Dict, Optional
+
+EXPORT_DIR = os.getenv("YOLO_EXPORT_DIR", "data/exports")
+
+
+def weights_digest(path: str) -> str:
+    """
+    Short SHA-256 of a weights file, used to key exported artifacts.
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()[:16]
+
+
+def _resolve_weights(weights: str) -> str:
+    # Let ultralytics fetch the weights if they are not on disk yet.
+    if not os.path.isfile(weights):
+        from ultralytics import YOLO
+
+        weights = YOLO(weights).ckpt_path
+    return weights
+
+
+def export_onnx(weights: str, imgsz: int = 640, export_dir: Optional[str] = None) -> str:
+    """
+    Export weights to ONNX once and return the cached artifact path.
+
+    Artifacts are keyed by the weights hash and imgsz, so changing either
+    triggers a fresh export. The export runs in a scratch directory and is
+    moved into place atomically, so concurrent workers never see a partial file.
+    """
+    export_dir = export_dir or EXPORT_DIR
+    weights = _resolve_weights(weights)
+    stem = os.path.splitext(os.path.basename(weights))[0]
+    target = os.path.join(export_dir, f"{stem}-{weights_digest(weights)}-{imgsz}.onnx")
+    if os.path.isfile(target):
+        return target
+
+    import onnx
+    from ultralytics import YOLO
+
+    os.makedirs(export_dir, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=export_dir) as tmp:
+        scratch = os.path.join(tmp, os.path.basename(weights))
+        shutil.copyfile(weights, scratch)
+        exported = YOLO(scratch).export(format="onnx", imgsz=imgsz, dynamic=True, simplify=False, verbose=False)
+        # Newer torch exporters write weights to a side file; fold them back
+        # into a single self-contained model.
+        partial = os.path.join(tmp, "model.onnx")
+        onnx.save(onnx.load(exported), partial, save_as_external_data=False)
+        os.replace(partial, target)
+    print(f"[Backend] Exported {weights} to {target}.")
+    return target
+
+
+def quantize_int8(onnx_path: str) -> str:
+    """
+    Post-training dynamic INT8 quantization of an exported ONNX model.
+    The quantized model is cached next to its source.
+    """
+    target = onnx_path[: -len(".onnx")] + "-int8.onnx"
+    if os.path.isfile(target):
+        return target
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    partial = target + ".partial"
+    quantize_dynamic(onnx_path, partial, weight_type=QuantType.QUInt8)
+    os.replace(partial, target)
+    print(f"[Backend] Quantized {onnx_path} to {target}.")
+    return target
+
+
+def _load_torch(weights: str, imgsz: int) -> Any:
+    from ultralytics import YOLO
+
+    return YOLO(weights)
+
+
+def _load_onnx(weights: str, imgsz: int) -> Any:
+    from ultralytics import YOLO
+
+    return YOLO(export_onnx(weights, imgsz), task="detect")
+
+
+def _load_onnx_int8(weights: str, imgsz: int) -> Any:
+    from ultralytics import YOLO
+
+    return YOLO(quantize_int8(export_onnx(weights, imgsz)), task="detect")
+
+
+# Each loader returns an ultralytics-compatible model, so YoloService keeps
+# the same pre- and post-processing (and output schema) whatever the backend.
+BACKENDS: Dict[str, Callable[[str, int], Any]] = {
+    "torch": _load_torch,
+    "onnx": _load_onnx,
+    "onnx-int8": _load_onnx_int8,
+}
+
+
+def register_backend(name: str, loader: Callable[[str, int], Any]) -> None:
+    BACKENDS[name] = loader
+
+
+def load_model(weights: str, backend: str = "torch", imgsz: int = 640) -> Any:
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}'. Choose from: {', '.join(sorted(BACKENDS))}")
+    return BACKENDS[backend](weights, imgsz)
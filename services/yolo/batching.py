@@ -0,0 +1,240 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.yolo.executors import Overloaded
+from services.yolo.metrics import Counter, Gauge, Histogram
+
+BATCH_SIZE = Histogram(
+    "yolo_batch_size",
+    "Number of images per batched forward pass.",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+BATCH_WAIT = Histogram(
+    "yolo_batch_wait_seconds",
+    "Time a request spent queued before its batch started.",
+)
+BATCH_QUEUE_DEPTH = Gauge("yolo_batch_queue_depth", "Requests waiting for a batch slot.")
+BATCH_MAX_SIZE = Gauge("yolo_batch_max_size", "Configured maximum batch size.")
+BATCH_MAX_WAIT = Gauge("yolo_batch_max_wait_seconds", "Configured batch collection window.")
+BATCH_REJECTED = Counter("yolo_batch_rejected_total", "Requests rejected because the batch queue was full.")
+
+
+class QueueFull(Overloaded):
+    """
+    Raised when the batch queue is at capacity and cannot accept more requests.
+    """
+
+
+class _Request:
+    __slots__ = ("image_bytes", "params", "future", "enqueued_at")
+
+    def __init__(self, image_bytes: bytes, params: Tuple[float, float, int]):
+        self.image_bytes = image_bytes
+        self.params = params
+        self.future: Future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class BatchingYoloService:
+    """
+    Micro-batching front for a YoloService.
+
+    Concurrent predict() calls are queued and grouped into batches of up to
+    `max_batch_size` images, waiting at most `max_wait_ms` for a batch to fill.
+    Each batch runs as one `predict_batch` call on the wrapped service and the
+    per-image results are handed back to the callers.
+    """
+
+    def __init__(
+        self,
+        service: Any,
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10.0,
+        max_queue: int = 256,
+    ):
+        self.service = service
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.max_queue = max(1, int(max_queue))
+        self._queue: "queue.Queue[Optional[_Request]]" = queue.Queue(maxsize=self.max_queue)
+        self._pending: Optional[_Request] = None
+
+        BATCH_MAX_SIZE.set(self.max_batch_size)
+        BATCH_MAX_WAIT.set(self.max_wait)
+        BATCH_QUEUE_DEPTH.set_function(self._queue.qsize)
+
+        self._thread = threading.Thread(target=self._run, name="yolo-batcher", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_env(cls, service: Any) -> "BatchingYoloService":
+        return cls(
+            service,
+            max_batch_size=int(os.getenv("YOLO_BATCH_MAX_SIZE", "8")),
+            max_wait_ms=float(os.getenv("YOLO_BATCH_MAX_WAIT_MS", "10")),
+            max_queue=int(os.getenv("YOLO_BATCH_MAX_QUEUE", "256")),
+        )
+
+    def __getattr__(self, name: str) -> Any:
+        # Expose the wrapped service's attributes (class_names, model, ...).
+        return getattr(self.service, name)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, image_bytes: bytes, conf=0.25, iou=0.45, imgsz=640) -> Future:
+        """
+        Queue an image for inference and return a Future for its result.
+        Raises QueueFull if the queue is at capacity.
+        """
+        req = _Request(image_bytes, (conf, iou, imgsz))
+        try:
+            self._queue.put_nowait(req)
+        except queue.Full:
+            BATCH_REJECTED.inc()
+            raise QueueFull("Inference queue is full")
+        return req.future
+
+    def submit_many(self, images: List[bytes], conf=0.25, iou=0.45, imgsz=640) -> List[Future]:
+        """
+        Queue several images at once, all or nothing. Raises QueueFull without
+        leaving any of them queued if they do not all fit.
+        """
+        reqs = [_Request(b, (conf, iou, imgsz)) for b in images]
+        if self._queue.maxsize - self._queue.qsize() < len(reqs):
+            BATCH_REJECTED.inc(len(reqs))
+            raise QueueFull("Inference queue is full")
+        queued = []
+        try:
+            for req in reqs:
+                self._queue.put_nowait(req)
+                queued.append(req)
+        except queue.Full:
+            # A concurrent submit took the room; withdraw what was queued.
+            for req in queued:
+                req.future.cancel()
+            BATCH_REJECTED.inc(len(reqs))
+            raise QueueFull("Inference queue is full")
+        return [req.future for req in reqs]
+
+    def predict(self, image_bytes: bytes, conf=0.25, iou=0.45, imgsz=640) -> Dict[str, Any]:
+        return self.submit(image_bytes, conf=conf, iou=iou, imgsz=imgsz).result()
+
+    def predict_batch(self, images: List[bytes], conf=0.25, iou=0.45, imgsz=640) -> List[Dict[str, Any]]:
+        # Go through the queue so the wrapped model is only ever driven by the
+        # batching thread.
+        futures = self.submit_many(images, conf=conf, iou=iou, imgsz=imgsz)
+        return [f.result() for f in futures]
+
+    def close(self) -> None:
+        """
+        Stop the batching thread after the queued requests have been served.
+        """
+        self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self, first: _Request) -> Tuple[List[_Request], bool]:
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                req = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if req is None:
+                return batch, True
+            if req.params != first.params:
+                # Different inference settings cannot share a forward pass;
+                # start the next batch with this request.
+                self._pending = req
+                break
+            batch.append(req)
+        return batch, False
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping or self._pending is not None:
+            if self._pending is not None:
+                first, self._pending = self._pending, None
+            else:
+                first = self._queue.get()
+                if first is None:
+                    break
+            batch, stop = self._collect(first)
+            stopping = stopping or stop
+            self._execute(batch)
+
+    def _execute(self, batch: List[_Request]) -> None:
+        # Requests withdrawn by submit_many are skipped.
+        batch = [req for req in batch if req.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        started = time.monotonic()
+        for req in batch:
+            BATCH_WAIT.observe(started - req.enqueued_at)
+        BATCH_SIZE.observe(len(batch))
+
+        conf, iou, imgsz = batch[0].params
+        submit_batch = getattr(self.service, "submit_batch", None)
+        if submit_batch is not None:
+            self._dispatch(submit_batch, batch)
+            return
+
+        predict_batch = getattr(self.service, "predict_batch", None)
+        if predict_batch is not None and len(batch) > 1:
+            try:
+                results = predict_batch([r.image_bytes for r in batch], conf=conf, iou=iou, imgsz=imgsz)
+            except Exception:
+                # One bad image should not fail its neighbours; fall back to
+                # running the batch one image at a time.
+                results = None
+            if results is not None:
+                for req, result in zip(batch, results):
+                    req.future.set_result(result)
+                return
+
+        for req in batch:
+            try:
+                req.future.set_result(self.service.predict(req.image_bytes, conf=conf, iou=iou, imgsz=imgsz))
+            except Exception as e:
+                req.future.set_exception(e)
+
+    def _dispatch(self, submit_batch, batch: List[_Request]) -> None:
+        """
+        Hand a batch to a service that runs batches asynchronously (such as a
+        worker pool), so the next batch can be collected while this one runs.
+        When every worker is busy, submit_batch blocks this thread until one
+        frees up; requests meanwhile wait in the queue, which rejects new ones
+        once full.
+        """
+        conf, iou, imgsz = batch[0].params
+
+        def _done(future: Future) -> None:
+            error = future.exception()
+            if error is None:
+                for req, result in zip(batch, future.result()):
+                    req.future.set_result(result)
+            elif len(batch) > 1:
+                # Retry one image at a time to isolate the bad one. This runs on
+                # the service's completion thread, which must not block waiting
+                # for capacity, so hand the retries to a separate thread.
+                threading.Thread(
+                    target=lambda: [self._dispatch(submit_batch, [req]) for req in batch],
+                    daemon=True,
+                ).start()
+            else:
+                batch[0].future.set_exception(error)
+
+        try:
+            future = submit_batch([r.image_bytes for r in batch], conf=conf, iou=iou, imgsz=imgsz)
+        except Exception as e:
+            for req in batch:
+                req.future.set_exception(e)
+            return
+        future.add_done_callback(_done)
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+from services.yolo.backends import weights_digest
+from services.yolo.metrics import Counter, Gauge
+
+CACHE_HITS = Counter("yolo_cache_hits_total", "Result cache hits.", labelnames=("tier",))
+CACHE_MISSES = Counter("yolo_cache_misses_total", "Result cache misses.")
+CACHE_EVICTIONS = Counter("yolo_cache_evictions_total", "Result cache evictions.", labelnames=("tier",))
+CACHE_BYTES = Gauge("yolo_cache_memory_bytes", "Bytes held by the in-process result cache.")
+
+
+@lru_cache(maxsize=None)
+def model_fingerprint(weights: Optional[str], backend: str) -> str:
+    """
+    Identify the model behind a result, so a weights change never serves
+    stale cache entries.
+    """
+    if weights and os.path.isfile(weights):
+        return f"{weights_digest(weights)}:{backend}"
+    return f"{weights}:{backend}"
+
+
+def cache_key(image_bytes: bytes, conf: float, iou: float, imgsz: int, model: str) -> str:
+    h = hashlib.sha256(image_bytes)
+    h.update(f"|{conf}|{iou}|{imgsz}|{model}".encode("utf-8"))
+    return h.hexdigest()
+
+
+class ResultCache:
+    """
+    Content-addressed cache of inference results.
+
+    An in-process LRU tier is bounded by the encoded size of its entries.
+    An optional SQLite tier at `disk_path` keeps results across restarts and
+    is bounded by entry count. Entries are stored JSON-encoded, so every
+    get() returns a fresh copy that callers may modify.
+    """
+
+    def __init__(self, max_bytes: int = 64 << 20, disk_path: Optional[str] = None, disk_max_entries: int = 100_000):
+        self.max_bytes = max(0, int(max_bytes))
+        self.disk_max_entries = max(1, int(disk_max_entries))
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._disk: Optional[sqlite3.Connection] = None
+        self._disk_lock = threading.Lock()
+        if disk_path:
+            self._open_disk(disk_path)
+        CACHE_BYTES.set_function(lambda: self._bytes)
+
+    @classmethod
+    def from_env(cls) -> "ResultCache":
+        return cls(
+            max_bytes=int(float(os.getenv("YOLO_CACHE_MAX_MB", "64")) * (1 << 20)),
+            disk_path=os.getenv("YOLO_CACHE_PATH") or None,
+            disk_max_entries=int(os.getenv("YOLO_CACHE_DISK_MAX_ENTRIES", "100000")),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 or self._disk is not None
+
+    def _open_disk(self, path: str) -> None:
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                key   TEXT PRIMARY KEY,
+                value BLOB NOT NULL
+            )
+            """
+        )
+        conn.commit()
+        self._disk = conn
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            blob = self._entries.get(key)
+            if blob is not None:
+                self._entries.move_to_end(key)
+        if blob is not None:
+            CACHE_HITS.labels(tier="memory").inc()
+            return json.loads(blob)
+
+        if self._disk is not None:
+            with self._disk_lock:
+                row = self._disk.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                CACHE_HITS.labels(tier="disk").inc()
+                self._remember(key, bytes(row[0]))
+                return json.loads(row[0])
+
+        CACHE_MISSES.inc()
+        return None
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        blob = json.dumps(value, separators=(",", ":")).encode("utf-8")
+        self._remember(key, blob)
+        if self._disk is not None:
+            with self._disk_lock:
+                self._disk.execute("INSERT OR REPLACE INTO results (key, value) VALUES (?, ?)", (key, blob))
+                # Rowids grow with every write, so this drops the oldest entries
+                # with an index range scan instead of counting the table.
+                cur = self._disk.execute(
+                    "DELETE FROM results WHERE rowid <= (SELECT MAX(rowid) FROM results) - ?",
+                    (self.disk_max_entries,),
+                )
+                self._disk.commit()
+            if cur.rowcount > 0:
+                CACHE_EVICTIONS.labels(tier="disk").inc(cur.rowcount)
+
+    def _remember(self, key: str, blob: bytes) -> None:
+        if len(blob) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = blob
+            self._bytes += len(blob)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                CACHE_EVICTIONS.labels(tier="memory").inc()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self._disk is not None:
+            with self._disk_lock:
+                self._disk.execute("DELETE FROM results")
+                self._disk.commit()
@@ -1,15 +1,226 @@
 import argparse
+import glob
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from services.yolo.encoding import encode_json, to_columnar
 from services.yolo.model import YoloService
+from services.yolo.preprocess import Letterbox, decode, letterbox_batch
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+# (paths decoded, their arrays, their letterboxes, (path, error) for the rest)
+Loaded = Tuple[List[str], List[np.ndarray], List[Letterbox], List[Tuple[str, str]]]
+
+
+def expand_inputs(inputs: Iterable[str], manifest: Optional[str] = None) -> List[str]:
+    """
+    Image paths from files, directories (searched recursively) and glob
+    patterns, plus a manifest of one path per line. Sorted and de-duplicated.
+    """
+    sources = list(inputs)
+    if manifest:
+        with open(manifest, encoding="utf-8") as f:
+            sources.extend(line.strip() for line in f if line.strip())
+
+    paths: Set[str] = set()
+    for source in sources:
+        if os.path.isdir(source):
+            for root, _, files in os.walk(source):
+                paths.update(
+                    os.path.join(root, name) for name in files
+                    if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+                )
+        elif glob.has_magic(source):
+            paths.update(p for p in glob.glob(source, recursive=True) if os.path.isfile(p))
+        else:
+            paths.add(source)
+    return sorted(paths)
+
+
+def load_batch(paths: Sequence[str], imgsz: int) -> Loaded:
+    """
+    Read, decode and letterbox a batch of files. A file that cannot be read
+    or decoded is reported instead of failing the batch.
+    """
+    ok, decoded, failed = [], [], []
+    for path in paths:
+        try:
+            with open(path, "rb") as f:
+                decoded.append(decode(f.read(), imgsz))
+            ok.append(path)
+        except Exception as e:
+            failed.append((path, str(e)))
+    if not decoded:
+        return ok, [], [], failed
+    arrays, boxes = letterbox_batch(decoded, imgsz)
+    # The arrays are this thread's scratch buffers, which its next batch reuses.
+    return ok, [a.copy() for a in arrays], boxes, failed
+
+
+def prefetch_batches(paths: Sequence[str], batch_size: int, imgsz: int,
+                     workers: int, depth: int) -> Iterator[Loaded]:
+    """
+    Yield loaded batches in order while up to `depth` later batches are
+    decoded on `workers` threads, so decoding overlaps with inference and
+    memory stays bounded.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="decode") as pool:
+        pending: deque = deque()
+        for i in range(0, len(paths), batch_size):
+            pending.append(pool.submit(load_batch, paths[i:i + batch_size], imgsz))
+            if len(pending) >= max(1, depth):
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class Checkpoint:
+    """
+    Append-only record of finished paths, used to skip them on a rerun.
+
+    Results are written and synced before their paths are recorded, so a
+    crash can repeat the last batch in the output but never lose one.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: Set[str] = set()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.done.update(line.rstrip("\n") for line in f if line.strip())
+
+    def record(self, paths: Iterable[str]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(p + "\n" for p in paths)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def _ndjson_lines(rows: List[Dict[str, Any]], class_names: Optional[Dict[int, str]] = None) -> bytes:
+    return b"".join(encode_json(row) + b"\n" for row in rows)
+
+
+def _columnar_lines(rows: List[Dict[str, Any]], class_names: Optional[Dict[int, str]] = None) -> bytes:
+    # One line per batch with parallel per-image arrays, like a Parquet row group.
+    columns = [to_columnar(row, class_names) for row in rows]
+    group = {
+        "paths": [c["path"] for c in columns],
+        "labels": [c["labels"] for c in columns],
+        "scores": [c["scores"] for c in columns],
+        "class_ids": [c["class_ids"] for c in columns],
+        "boxes": [c["boxes"] for c in columns],
+        "errors": [c.get("error") for c in columns],
+    }
+    return encode_json(group) + b"\n"
+
+
+FORMATS = {"ndjson": _ndjson_lines, "columnar": _columnar_lines}
+
+
+def run_batch(
+    service: Any,
+    paths: Sequence[str],
+    out: IO[bytes],
+    checkpoint: Checkpoint,
+    fmt: str = "ndjson",
+    batch_size: int = 16,
+    workers: int = 4,
+    prefetch: int = 8,
+    imgsz: int = 640,
+    conf: float = 0.25,
+    iou: float = 0.45,
+    report_every: float = 5.0,
+) -> Dict[str, Any]:
+    """
+    Run every path not yet in `checkpoint` through `service`, appending
+    results to `out` batch by batch. Only paths that succeeded are
+    checkpointed. Returns a summary of the run.
+    """
+    todo = [p for p in paths if p not in checkpoint.done]
+    encode = FORMATS[fmt]
+    done = failed = 0
+    start = last_report = time.perf_counter()
+
+    for ok, arrays, boxes, errors in prefetch_batches(todo, batch_size, imgsz, workers, prefetch):
+        results = service.predict_prepared(arrays, boxes, conf=conf, iou=iou, imgsz=imgsz) if arrays else []
+        rows = [{"path": p, **r} for p, r in zip(ok, results)]
+        rows.extend({"path": p, "error": e, "detections": []} for p, e in errors)
+        out.write(encode(rows, getattr(service, "class_names", None)))
+        out.flush()
+        os.fsync(out.fileno())
+        # Failed paths stay out of the checkpoint so a rerun retries them.
+        checkpoint.record(ok)
+
+        done += len(rows)
+        failed += len(errors)
+        now = time.perf_counter()
+        if now - last_report >= report_every:
+            print(f"[CLI] {done}/{len(todo)} images, {done / (now - start):.1f} images/s", file=sys.stderr)
+            last_report = now
+
+    elapsed = time.perf_counter() - start
+    summary = {
+        "images": done,
+        "failed": failed,
+        "skipped": len(paths) - len(todo),
+        "seconds": round(elapsed, 3),
+        "images_per_sec": round(done / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+    print(f"[CLI] Done: {summary}", file=sys.stderr)
+    return summary
+
 
 def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--image", required=True)
+    ap = argparse.ArgumentParser(description="Run YOLO on one image, or on many in batch mode.")
+    ap.add_argument("--image", help="run a single image and print its result")
+    ap.add_argument("inputs", nargs="*", help="image files, directories or glob patterns (batch mode)")
+    ap.add_argument("--manifest", help="file listing one image path per line")
+    ap.add_argument("--output", help="results file; appended to when resuming")
+    ap.add_argument("--format", choices=sorted(FORMATS), default="ndjson")
+    ap.add_argument("--checkpoint", help="finished-paths file (default: <output>.checkpoint)")
+    ap.add_argument("--batch-size", type=int, default=16)
+    ap.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2), help="decode threads")
+    ap.add_argument("--prefetch", type=int, default=None, help="batches decoded ahead (default: 2 x workers)")
+    ap.add_argument("--weights", default="yolo11n.pt")
+    ap.add_argument("--backend", default=os.getenv("YOLO_BACKEND", "torch"))
+    ap.add_argument("--imgsz", type=int, default=640)
+    ap.add_argument("--conf", type=float, default=0.25)
+    ap.add_argument("--iou", type=float, default=0.45)
     args = ap.parse_args()
 
-    data = Path(args.image).read_bytes()
-    svc = YoloService()
-    print(svc.predict(data))
+    if args.image:
+        data = Path(args.image).read_bytes()
+        svc = YoloService(args.weights, backend=args.backend, imgsz=args.imgsz)
+        print(svc.predict(data, conf=args.conf, iou=args.iou, imgsz=args.imgsz))
+        return
+
+    if not args.inputs and not args.manifest:
+        ap.error("give --image, or image paths/--manifest for batch mode")
+    if not args.output:
+        ap.error("batch mode needs --output")
+
+    paths = expand_inputs(args.inputs, args.manifest)
+    checkpoint = Checkpoint(args.checkpoint or args.output + ".checkpoint")
+    svc = YoloService(args.weights, backend=args.backend, imgsz=args.imgsz)
+    with open(args.output, "ab") as out:
+        run_batch(
+            svc, paths, out, checkpoint,
+            fmt=args.format,
+            batch_size=max(1, args.batch_size),
+            workers=args.workers,
+            prefetch=args.prefetch or 2 * args.workers,
+            imgsz=args.imgsz,
+            conf=args.conf,
+            iou=args.iou,
+        )
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,62 +1,590 @@
+import atexit
+import base64
+import json
 import os
+import queue
 import sqlite3
+import threading
+import time
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from services.yolo.metrics import Gauge
+from services.yolo.timing import stages
 
 DB_PATH = "data/predictions.db"
 
+# Write-behind tuning: queued inserts are committed together at least every
+# FLUSH_INTERVAL seconds, in transactions of up to MAX_BATCH statements.
+FLUSH_INTERVAL = float(os.getenv("YOLO_DB_FLUSH_MS", "50")) / 1000.0
+MAX_BATCH = int(os.getenv("YOLO_DB_MAX_BATCH", "500"))
+MAX_QUEUE = int(os.getenv("YOLO_DB_MAX_QUEUE", "10000"))
+# A caller waiting on commit() holds its batch open for at most this long.
+COMMIT_WAIT = float(os.getenv("YOLO_DB_COMMIT_WAIT_MS", "2")) / 1000.0
 
-def _get_connection() -> sqlite3.Connection:
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
+INSERT_PREDICTION = """
+    INSERT INTO predictions (filename, label, confidence, created_at, user_id)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+# If the result got here first, the pending row only fills in the owner.
+INSERT_RECIPE = """
+    INSERT INTO recipes (id, user_id, status, created_at)
+    VALUES (?, ?, 'pending', ?)
+    ON CONFLICT (id) DO UPDATE SET user_id = excluded.user_id
+"""
+
+# Upsert, so a result is kept even if it arrives before its pending row.
+COMPLETE_RECIPE = """
+    INSERT INTO recipes (id, status, result, timings, created_at, completed_at)
+    VALUES (?, 'done', ?, ?, ?, ?)
+    ON CONFLICT (id) DO UPDATE SET
+        status = 'done',
+        result = excluded.result,
+        timings = excluded.timings,
+        completed_at = excluded.completed_at
+"""
+
+# Side effects committed with the rows that caused them; the key makes a
+# repeated insert (and a repeated delivery downstream) harmless.
+INSERT_OUTBOX = """
+    INSERT OR IGNORE INTO outbox (key, sink, target, payload, attempts, next_attempt_at, created_at)
+    VALUES (?, ?, ?, ?, 0, ?, ?)
+"""
+
+# Rollup buckets are hourly: the first 13 characters of an ISO timestamp.
+BUCKET_FORMATS = {"hour": 13, "day": 10}
+
+Statement = Tuple[str, Sequence[Any]]
+
+SQLITE_QUEUE_DEPTH = Gauge("yolo_sqlite_queue_depth", "Write units waiting for the SQLite writer.")
+
+class _DurableUnit(list):
+    """
+    Statements whose submitter waits for them to be committed.
+    """
+
+    def __init__(self, statements: List[Statement]):
+        super().__init__(statements)
+        self.done = threading.Event()
+        self.error: Optional[Exception] = None
+
+
+_readers = threading.local()
+_writer: Optional["_WriteBehind"] = None
+_writer_lock = threading.Lock()
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
     conn.row_factory = sqlite3.Row
+    # WAL lets readers run while the writer commits; NORMAL sync is durable
+    # across application crashes and skips an fsync per commit.
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
     return conn
 
 
+def _get_connection() -> sqlite3.Connection:
+    """
+    Long-lived read connection for the calling thread.
+    """
+    conn = getattr(_readers, "conn", None)
+    if conn is None or _readers.path != DB_PATH:
+        if conn is not None:
+            conn.close()
+        conn = _readers.conn = _connect(DB_PATH)
+        _readers.path = DB_PATH
+    return conn
+
+
+class _WriteBehind:
+    """
+    Background writer that owns the write connection and commits queued
+    statements in batched transactions.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=MAX_QUEUE)
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+        self._thread.start()
+        SQLITE_QUEUE_DEPTH.set_function(self._queue.qsize)
+
+    def submit(self, statements: List[Statement]) -> None:
+        """
+        Queue statements to be committed together in one transaction.
+        Blocks if the queue is full.
+        """
+        with self._pending_lock:
+            self._pending += 1
+        self._queue.put(statements)
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """
+        Wait until everything queued so far has been committed.
+        """
+        if self._pending == 0:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self) -> None:
+        conn = _connect(self.path)
+        running = True
+        while running:
+            item = self._queue.get()
+            units, waiters = [], []
+            deadline = time.monotonic() + FLUSH_INTERVAL
+            while True:
+                if item is None:
+                    running = False
+                    break
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                    break
+                units.append(item)
+                if isinstance(item, _DurableUnit):
+                    # Someone is waiting on this commit; close the batch soon.
+                    deadline = min(deadline, time.monotonic() + COMMIT_WAIT)
+                if sum(len(u) for u in units) >= MAX_BATCH:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if units:
+                self._commit(conn, units)
+            for waiter in waiters:
+                waiter.set()
+        conn.close()
+
+    def _commit(self, conn: sqlite3.Connection, units: List[List[Statement]]) -> None:
+        try:
+            with stages.time("sqlite_write"):
+                self._execute(conn, units)
+        except sqlite3.Error as e:
+            print(f"[SQLite] Warning: batch of {len(units)} writes failed ({e}); retrying individually.")
+            for unit in units:
+                try:
+                    self._execute(conn, [unit])
+                except sqlite3.Error as e:
+                    if isinstance(unit, _DurableUnit):
+                        unit.error = e
+                    else:
+                        print(f"[SQLite] Warning: dropping write that failed: {e}")
+        finally:
+            with self._pending_lock:
+                self._pending -= len(units)
+            for unit in units:
+                if isinstance(unit, _DurableUnit):
+                    unit.done.set()
+
+    @staticmethod
+    def _execute(conn: sqlite3.Connection, units: List[List[Statement]]) -> None:
+        conn.execute("BEGIN")
+        try:
+            for unit in units:
+                for sql, params in unit:
+                    conn.execute(sql, params)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+def _get_writer() -> _WriteBehind:
+    global _writer
+    with _writer_lock:
+        if _writer is None or _writer.path != DB_PATH:
+            if _writer is not None:
+                _writer.close()
+            _writer = _WriteBehind(DB_PATH)
+        return _writer
+
+
+def commit(statements: List[Statement], timeout: Optional[float] = 30.0) -> None:
+    """
+    Commit statements in one transaction and wait until they are on disk.
+    Raises the SQLite error if the transaction failed, or TimeoutError.
+    Concurrent callers share a transaction (group commit).
+    """
+    unit = _DurableUnit(statements)
+    _get_writer().submit(unit)
+    if not unit.done.wait(timeout):
+        raise TimeoutError("SQLite commit timed out")
+    if unit.error is not None:
+        raise unit.error
+
+
+def flush() -> None:
+    """
+    Block until all queued prediction writes are committed.
+    """
+    if _writer is not None:
+        _writer.flush()
+
+
+def close_db() -> None:
+    """
+    Flush queued writes and stop the background writer. Called on shutdown.
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.close()
+            _writer = None
+
+
+atexit.register(close_db)
+
+
 def init_db() -> None:
     conn = _get_connection()
-    cur = conn.cursor()
-    cur.execute(
+    conn.execute(
         """
         CREATE TABLE IF NOT EXISTS predictions (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             filename   TEXT NOT NULL,
             label      TEXT NOT NULL,
             confidence REAL NOT NULL,
-            created_at TEXT NOT NULL
+            created_at TEXT NOT NULL,
+            user_id    TEXT
         )
         """
     )
-    conn.commit()
-    conn.close()
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(predictions)")}
+    if "user_id" not in columns:
+        conn.execute("ALTER TABLE predictions ADD COLUMN user_id TEXT")
 
+    # Indexes end in created_at so filtered pages come back in time order
+    # straight from the index; the implicit rowid breaks ties.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_predictions_created_at ON predictions (created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_predictions_label_created_at ON predictions (label, created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_predictions_user_created_at ON predictions (user_id, created_at)")
 
-def log_prediction(filename: str, label: str, confidence: float) -> None:
-    conn = _get_connection()
-    cur = conn.cursor()
-    cur.execute(
+    # Hourly counts per label and user, kept up to date by a trigger so
+    # aggregate queries never scan the predictions table.
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS prediction_counts (
+            bucket  TEXT NOT NULL,
+            label   TEXT NOT NULL,
+            user_id TEXT NOT NULL DEFAULT '',
+            count   INTEGER NOT NULL,
+            PRIMARY KEY (bucket, label, user_id)
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS predictions_rollup AFTER INSERT ON predictions
+        BEGIN
+            INSERT INTO prediction_counts (bucket, label, user_id, count)
+            VALUES (substr(NEW.created_at, 1, 13), NEW.label, COALESCE(NEW.user_id, ''), 1)
+            ON CONFLICT (bucket, label, user_id) DO UPDATE SET count = count + 1;
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS recipes (
+            id           TEXT PRIMARY KEY,
+            user_id      TEXT,
+            status       TEXT NOT NULL,
+            result       TEXT,
+            timings      TEXT,
+            created_at   TEXT NOT NULL,
+            completed_at TEXT
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS outbox (
+            id              INTEGER PRIMARY KEY AUTOINCREMENT,
+            key             TEXT NOT NULL UNIQUE,
+            sink            TEXT NOT NULL,
+            target          TEXT NOT NULL,
+            payload         TEXT NOT NULL,
+            attempts        INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            last_error      TEXT,
+            created_at      TEXT NOT NULL
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_next_attempt ON outbox (next_attempt_at)")
+    if conn.execute("SELECT 1 FROM prediction_counts LIMIT 1").fetchone() is None:
+        # First run against an existing database: backfill the rollup once.
+        conn.execute(
+            """
+            INSERT INTO prediction_counts (bucket, label, user_id, count)
+            SELECT substr(created_at, 1, 13), label, COALESCE(user_id, ''), COUNT(*)
+            FROM predictions
+            GROUP BY 1, 2, 3
+            """
+        )
+    _get_writer()
+
+
+def log_prediction(filename: str, label: str, confidence: float, user_id: Optional[str] = None) -> None:
+    """
+    Queue a prediction for the background writer; it is committed within
+    FLUSH_INTERVAL. Use flush() to wait for it.
+    """
+    _get_writer().submit([
+        (INSERT_PREDICTION, (filename, label, float(confidence), datetime.utcnow().isoformat(), user_id)),
+    ])
+
+
+def log_predictions(rows: List[Dict[str, Any]]) -> None:
+    """
+    Queue several predictions to be committed in one transaction.
+    Each row needs `filename`, `label` and `confidence`, and may have `user_id`.
+    """
+    if not rows:
+        return
+    created_at = datetime.utcnow().isoformat()
+    _get_writer().submit([
+        (INSERT_PREDICTION, (r["filename"], r["label"], float(r["confidence"]), created_at, r.get("user_id")))
+        for r in rows
+    ])
+
+
+def encode_cursor(created_at: str, row_id: int) -> str:
+    raw = json.dumps([created_at, row_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """
+    Inverse of encode_cursor(). Raises ValueError for a malformed cursor.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return str(created_at), int(row_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+def _filters(label: Optional[str], user_id: Optional[str], since: Optional[str],
+             until: Optional[str], column: str = "created_at") -> Tuple[List[str], List[Any]]:
+    clauses: List[str] = []
+    params: List[Any] = []
+    if label is not None:
+        clauses.append("label = ?")
+        params.append(label)
+    if user_id is not None:
+        clauses.append("user_id = ?")
+        params.append(user_id)
+    if since is not None:
+        clauses.append(f"{column} >= ?")
+        params.append(since)
+    if until is not None:
+        clauses.append(f"{column} < ?")
+        params.append(until)
+    return clauses, params
+
+
+def _page_query(limit: int, cursor: Optional[str], label: Optional[str], user_id: Optional[str],
+                since: Optional[str], until: Optional[str]) -> Tuple[str, List[Any]]:
+    clauses, params = _filters(label, user_id, since, until)
+    if cursor is not None:
+        # A row-value comparison is what lets SQLite turn the cursor into a
+        # range on a created_at index; the equivalent OR form scans.
+        clauses.append("(created_at, id) < (?, ?)")
+        params.extend(decode_cursor(cursor))
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    sql = f"""
+        SELECT id, filename, label, confidence, created_at, user_id
+        FROM predictions
+        {where}
+        ORDER BY created_at DESC, id DESC
+        LIMIT ?
         """
-        INSERT INTO predictions (filename, label, confidence, created_at)
-        VALUES (?, ?, ?, ?)
+    return sql, [*params, limit]
+
+
+def query_predictions(
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    label: Optional[str] = None,
+    user_id: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Return one page of predictions, newest first, and the cursor for the next
+    page (None on the last page).
+
+    Pages are keyset-paginated on (created_at, id), so fetching a deep page
+    costs an index seek rather than skipping every earlier row. `since` and
+    `until` are ISO timestamps (or prefixes such as "2024-05-01"); `until`
+    is exclusive.
+    """
+    flush()
+    sql, params = _page_query(limit + 1, cursor, label, user_id, since, until)
+    rows = [dict(row) for row in _get_connection().execute(sql, params).fetchall()]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+    return rows, next_cursor
+
+
+def list_predictions(limit: int = 50, **filters: Any) -> List[Dict[str, Any]]:
+    # Read-your-writes: query_predictions() flushes queued predictions first.
+    rows, _ = query_predictions(limit=limit, **filters)
+    return rows
+
+
+def count_predictions(
+    bucket: str = "hour",
+    label: Optional[str] = None,
+    user_id: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Prediction counts per label per time bucket ("hour" or "day"), read from
+    the rollup table. Buckets are compared at hour granularity, so `since`
+    and `until` are truncated to the hour.
+    """
+    if bucket not in BUCKET_FORMATS:
+        raise ValueError(f"Unknown bucket {bucket!r}; expected one of {sorted(BUCKET_FORMATS)}")
+    flush()
+    clauses, params = _filters(
+        label,
+        user_id,
+        since[:13] if since else None,
+        until[:13] if until else None,
+        column="bucket",
+    )
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    cur = _get_connection().execute(
+        f"""
+        SELECT substr(bucket, 1, ?) AS bucket, label, SUM(count) AS count
+        FROM prediction_counts
+        {where}
+        GROUP BY 1, 2
+        ORDER BY 1, 2
         """,
-        (filename, label, float(confidence), datetime.utcnow().isoformat()),
+        (BUCKET_FORMATS[bucket], *params),
     )
-    conn.commit()
-    conn.close()
+    return [dict(row) for row in cur.fetchall()]
 
 
-def list_predictions(limit: int = 50) -> List[Dict[str, Any]]:
-    conn = _get_connection()
-    cur = conn.cursor()
-    cur.execute(
+def prediction_statement(filename: str, label: str, confidence: float,
+                         user_id: Optional[str], created_at: str) -> Statement:
+    return INSERT_PREDICTION, (filename, label, float(confidence), created_at, user_id)
+
+
+def recipe_statement(recipe_id: str, user_id: Optional[str], created_at: str) -> Statement:
+    return INSERT_RECIPE, (recipe_id, user_id, created_at)
+
+
+def outbox_statement(key: str, sink: str, target: str, payload: Dict[str, Any]) -> Statement:
+    return INSERT_OUTBOX, (key, sink, target, json.dumps(payload), time.time(), datetime.utcnow().isoformat())
+
+
+def due_outbox(limit: int, now: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Outbox entries whose next attempt is due, oldest first.
+    """
+    cur = _get_connection().execute(
         """
-        SELECT id, filename, label, confidence, created_at
-        FROM predictions
-        ORDER BY id DESC
+        SELECT id, key, sink, target, payload, attempts
+        FROM outbox
+        WHERE next_attempt_at <= ?
+        ORDER BY id
         LIMIT ?
         """,
-        (limit,),
+        (time.time() if now is None else now, limit),
     )
-    rows = cur.fetchall()
-    conn.close()
-    return [dict(row) for row in rows]
\ No newline at end of file
+    rows = [dict(row) for row in cur.fetchall()]
+    for row in rows:
+        row["payload"] = json.loads(row["payload"])
+    return rows
+
+
+def outbox_stats() -> Tuple[int, Optional[str]]:
+    """
+    Number of undelivered outbox entries and the creation time of the oldest.
+    """
+    row = _get_connection().execute("SELECT COUNT(*), MIN(created_at) FROM outbox").fetchone()
+    return row[0], row[1]
+
+
+def ack_outbox(ids: Sequence[int]) -> None:
+    """
+    Delete delivered outbox entries.
+    """
+    if ids:
+        commit([("DELETE FROM outbox WHERE id = ?", (i,)) for i in ids])
+
+
+def retry_outbox(entries: Sequence[Tuple[int, float]], error: str) -> None:
+    """
+    Record a failed delivery: bump attempts and set each entry's next
+    attempt time, given as (id, next_attempt_at) pairs.
+    """
+    if entries:
+        commit([
+            ("UPDATE outbox SET attempts = attempts + 1, next_attempt_at = ?, last_error = ? WHERE id = ?",
+             (next_at, error[:500], i))
+            for i, next_at in entries
+        ])
+
+
+def create_recipes(recipe_ids: List[str], user_id: Optional[str] = None) -> None:
+    """
+    Queue pending recipe records for predictions whose outputs were published.
+    """
+    if not recipe_ids:
+        return
+    created_at = datetime.utcnow().isoformat()
+    _get_writer().submit([(INSERT_RECIPE, (recipe_id, user_id, created_at)) for recipe_id in recipe_ids])
+
+
+def create_recipe(recipe_id: str, user_id: Optional[str] = None) -> None:
+    create_recipes([recipe_id], user_id)
+
+
+def complete_recipe(recipe_id: str, result: Dict[str, Any], timings: Dict[str, float]) -> None:
+    """
+    Queue a finished recipe and its per-stage timestamps.
+    """
+    now = datetime.utcnow().isoformat()
+    _get_writer().submit([
+        (COMPLETE_RECIPE, (recipe_id, json.dumps(result), json.dumps(timings), now, now)),
+    ])
+
+
+def get_recipe(recipe_id: str) -> Optional[Dict[str, Any]]:
+    flush()
+    row = _get_connection().execute(
+        """
+        SELECT id, user_id, status, result, timings, created_at, completed_at
+        FROM recipes
+        WHERE id = ?
+        """,
+        (recipe_id,),
+    ).fetchone()
+    if row is None:
+        return None
+    record = dict(row)
+    record["result"] = json.loads(record["result"]) if record["result"] else None
+    record["timings"] = json.loads(record["timings"]) if record["timings"] else None
+    return record
@@ -0,0 +1,52 @@
+import json
+from typing import Any, Dict, Optional
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # optional: fall back to the stdlib encoder
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional: msgpack responses are unavailable without it
+    msgpack = None
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+def to_columnar(result: Dict[str, Any], class_names: Optional[Dict[int, str]] = None) -> Dict[str, Any]:
+    """
+    Convert a predict() result into parallel arrays.
+
+    {"labels": [...], "scores": [...], "class_ids": [...], "boxes": [[x1, y1, x2, y2], ...]}
+    plus the untouched `meta` and any other top-level fields. Class ids are
+    looked up from the model's `class_names` (None where a label is unknown);
+    row-format detections do not carry them.
+    """
+    dets = result.get("detections", [])
+    ids = {name: i for i, name in (class_names or {}).items()}
+    out = {k: v for k, v in result.items() if k != "detections"}
+    out["labels"] = [d["label"] for d in dets]
+    out["scores"] = [d["confidence"] for d in dets]
+    out["class_ids"] = [ids.get(d["label"]) for d in dets]
+    out["boxes"] = [d["box"] for d in dets]
+    return out
+
+
+def encode_json(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, separators=(",", ":")).encode("utf-8")
+
+
+def render(content: Any, accept: Optional[str] = None) -> Response:
+    """
+    Encode a response body in the format the client asked for: msgpack when
+    the Accept header names it (and msgpack is installed), JSON otherwise.
+    """
+    accept = (accept or "").lower()
+    if msgpack is not None and any(t in accept for t in MSGPACK_TYPES):
+        return Response(msgpack.packb(content, use_bin_type=True), media_type="application/msgpack")
+    return Response(encode_json(content), media_type="application/json")
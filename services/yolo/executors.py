@@ -0,0 +1,160 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+from services.yolo.metrics import Counter, Gauge
+
+EXECUTOR_PENDING = Gauge(
+    "yolo_executor_pending",
+    "Tasks queued or running on an executor.",
+    labelnames=("executor",),
+)
+EXECUTOR_REJECTED = Counter(
+    "yolo_executor_rejected_total",
+    "Tasks rejected because an executor was at capacity.",
+    labelnames=("executor",),
+)
+
+
+class Overloaded(RuntimeError):
+    """
+    Raised when work cannot be accepted because a queue is at capacity.
+    """
+
+
+class BoundedExecutor:
+    """
+    Thread pool that refuses new work instead of queueing without limit.
+
+    At most `max_pending` tasks may be queued or running at once; submit()
+    raises Overloaded beyond that so callers can shed load early.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_pending: int):
+        self.name = name
+        self.max_pending = max(1, int(max_pending))
+        self._pool = ThreadPoolExecutor(max_workers=max(1, int(max_workers)), thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._pending = 0
+        self._lock = threading.Lock()
+        EXECUTOR_PENDING.labels(executor=name).set_function(lambda: self._pending)
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        if not self._slots.acquire(blocking=False):
+            EXECUTOR_REJECTED.labels(executor=self.name).inc()
+            raise Overloaded(f"{self.name} executor is at capacity")
+        with self._lock:
+            self._pending += 1
+        try:
+            future = self._pool.submit(fn, *args, **kwargs)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+        return future
+
+    def _release(self) -> None:
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
+
+
+# CPU-bound inference gets its own small pool so it cannot starve I/O.
+inference_executor = BoundedExecutor(
+    "inference",
+    max_workers=int(os.getenv("YOLO_INFERENCE_WORKERS", "1")),
+    max_pending=int(os.getenv("YOLO_INFERENCE_QUEUE", "32")),
+)
+
+# One pool per external store, so a slow Firestore cannot hold up SQLite
+# writes or RabbitMQ publishes. "cache" covers result-cache lookups, which
+# hash the upload and may hit the on-disk tier.
+io_executors: Dict[str, BoundedExecutor] = {
+    sink: BoundedExecutor(
+        sink,
+        max_workers=int(os.getenv("YOLO_IO_WORKERS", "4")),
+        max_pending=int(os.getenv("YOLO_IO_QUEUE", "256")),
+    )
+    for sink in ("sqlite", "firestore", "rabbitmq", "cache")
+}
+
+
+async def run_inference(service: Any, image_bytes: bytes, **kwargs: Any) -> Dict[str, Any]:
+    """
+    Run service.predict off the event loop.
+
+    Services that queue work themselves (e.g. BatchingYoloService) are used
+    through their own submit(); anything else goes through the bounded
+    inference executor.
+    """
+    submit = getattr(service, "submit", None)
+    if submit is not None:
+        future = submit(image_bytes, **kwargs)
+    else:
+        future = inference_executor.submit(service.predict, image_bytes, **kwargs)
+    return await asyncio.wrap_future(future)
+
+
+async def run_inference_batch(service: Any, images: List[bytes], **kwargs: Any) -> List[Any]:
+    """
+    Run a batch of images off the event loop.
+
+    Returns one entry per image: its result, or the exception raised for it.
+    Queueing services get every image submitted at once so they can form a
+    single batch; otherwise the whole batch runs as one predict_batch call.
+    Submission is all or nothing: if the queue cannot take every image,
+    Overloaded is raised and none of them run.
+    """
+    submit_many = getattr(service, "submit_many", None)
+    submit = getattr(service, "submit", None)
+    if submit_many is not None:
+        futures = submit_many(images, **kwargs)
+    elif submit is not None:
+        futures = []
+        try:
+            for image in images:
+                futures.append(submit(image, **kwargs))
+        except Overloaded:
+            for future in futures:
+                future.cancel()
+            raise
+    if submit_many is not None or submit is not None:
+        waiting = [asyncio.wrap_future(future) for future in futures]
+        return list(await asyncio.gather(*waiting, return_exceptions=True))
+
+    predict_batch = getattr(service, "predict_batch", None)
+    if predict_batch is not None:
+        try:
+            return await asyncio.wrap_future(inference_executor.submit(predict_batch, images, **kwargs))
+        except Overloaded:
+            raise
+        except Exception:
+            pass  # retry one by one so a bad image only fails itself
+
+    def _each() -> List[Any]:
+        out: List[Any] = []
+        for image in images:
+            try:
+                out.append(service.predict(image, **kwargs))
+            except Exception as e:
+                out.append(e)
+        return out
+
+    return await asyncio.wrap_future(inference_executor.submit(_each))
+
+
+async def run_io(sink: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    Run a blocking storage or messaging call on the executor for `sink`.
+    """
+    return await asyncio.wrap_future(io_executors[sink].submit(fn, *args, **kwargs))
+
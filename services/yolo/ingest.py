@@ -0,0 +1,104 @@
+import itertools
+import os
+import tarfile
+import zipfile
+from typing import IO, Iterable, Iterator, List, Tuple, Union
+
+IMAGE_TYPES = ("image/jpeg", "image/png", "image/jpg")
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png")
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+
+Item = Tuple[str, Union[bytes, Exception]]
+
+# Uploaded images and archive members are read into memory, so cap each
+# image and the upload as a whole; a few kilobytes of zip can expand to
+# gigabytes.
+MAX_MEMBER_BYTES = int(float(os.getenv("YOLO_ARCHIVE_MAX_MEMBER_MB", "8")) * (1 << 20))
+MAX_ARCHIVE_BYTES = int(float(os.getenv("YOLO_ARCHIVE_MAX_TOTAL_MB", "512")) * (1 << 20))
+
+
+def _is_image_name(name: str) -> bool:
+    return name.lower().endswith(IMAGE_SUFFIXES)
+
+
+def _read_member(stream: IO[bytes], declared: int, max_member: int) -> Union[bytes, Exception]:
+    # The declared size can lie, so the read itself is bounded too.
+    too_large = ValueError(f"Image exceeds {max_member / (1 << 20):g} MB")
+    if declared > max_member:
+        return too_large
+    data = stream.read(max_member + 1)
+    return too_large if len(data) > max_member else data
+
+
+def iter_archive(name: str, fileobj: IO[bytes], max_member: int = MAX_MEMBER_BYTES,
+                 max_total: int = MAX_ARCHIVE_BYTES) -> Iterator[Item]:
+    """
+    Yield (member name, bytes) for every image in a zip or tar archive,
+    reading one member at a time. Members over `max_member` bytes yield an
+    error instead; after `max_total` bytes of images the rest of the
+    archive is skipped with an error for the archive itself.
+    """
+    remaining = max_total
+    too_much = ValueError(f"Archive exceeds {max_total / (1 << 20):g} MB of images")
+    try:
+        fileobj.seek(0)
+        if zipfile.is_zipfile(fileobj):
+            fileobj.seek(0)
+            with zipfile.ZipFile(fileobj) as zf:
+                for info in zf.infolist():
+                    if not info.is_dir() and _is_image_name(info.filename):
+                        if remaining <= 0:
+                            yield name, too_much
+                            return
+                        with zf.open(info) as stream:
+                            data = _read_member(stream, info.file_size, max_member)
+                        if isinstance(data, bytes):
+                            remaining -= len(data)
+                        yield info.filename, data
+            return
+
+        fileobj.seek(0)
+        # "r|*" reads the tar as a stream (any compression) without seeking.
+        with tarfile.open(fileobj=fileobj, mode="r|*") as tf:
+            for member in tf:
+                if member.isfile() and _is_image_name(member.name):
+                    if remaining <= 0:
+                        yield name, too_much
+                        return
+                    data = _read_member(tf.extractfile(member), member.size, max_member)
+                    if isinstance(data, bytes):
+                        remaining -= len(data)
+                    yield member.name, data
+    except (zipfile.BadZipFile, tarfile.TarError, OSError) as e:
+        yield name, ValueError(f"Unreadable archive: {e}")
+
+
+def iter_uploads(uploads: Iterable[Tuple[str, str, IO[bytes]]], max_member: int = MAX_MEMBER_BYTES,
+                 max_total: int = MAX_ARCHIVE_BYTES) -> Iterator[Item]:
+    """
+    Flatten (filename, content type, file) uploads into (name, image bytes)
+    items, expanding archives. Unsupported parts, and images over
+    `max_member` bytes, yield an exception instead of bytes so they can be
+    reported per item. After `max_total` bytes of images across the whole
+    upload, the remaining parts are reported as errors without being read.
+    """
+    remaining = max_total
+    for filename, content_type, fileobj in uploads:
+        if remaining <= 0:
+            yield filename, ValueError(f"Upload exceeds {max_total / (1 << 20):g} MB of images")
+            continue
+        if content_type in IMAGE_TYPES:
+            fileobj.seek(0)
+            items: Iterable[Item] = [(filename, _read_member(fileobj, 0, max_member))]
+        elif filename.lower().endswith(ARCHIVE_SUFFIXES):
+            items = iter_archive(filename, fileobj, max_member, remaining)
+        else:
+            items = [(filename, ValueError("Unsupported file type"))]
+        for name, data in items:
+            if isinstance(data, bytes):
+                remaining -= len(data)
+            yield name, data
+
+
+def take(items: Iterator[Item], n: int) -> List[Item]:
+    return list(itertools.islice(items, n))
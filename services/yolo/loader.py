@@ -0,0 +1,118 @@
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, Sequence
+
+import numpy as np
+from PIL import Image
+
+from services.yolo.metrics import Gauge
+
+MODEL_READY = Gauge("yolo_model_ready", "1 once the model is loaded and warmed up, else 0.")
+MODEL_LOAD_SECONDS = Gauge("yolo_model_load_seconds", "Time taken to load the model at startup.")
+MODEL_WARMUP_SECONDS = Gauge("yolo_model_warmup_seconds", "Time taken by the startup warm-up pass.")
+
+
+def synthetic_image(imgsz: int, seed: int = 0) -> bytes:
+    """
+    JPEG of random pixels at imgsz x imgsz, so warm-up exercises decode,
+    letterboxing and inference at the served input size.
+    """
+    pixels = np.random.default_rng(seed).integers(0, 256, (imgsz, imgsz, 3), dtype=np.uint8)
+    out = io.BytesIO()
+    Image.fromarray(pixels).save(out, "JPEG", quality=90)
+    return out.getvalue()
+
+
+def warm_up(service: Any, runs: int, imgsz: int, conf: float = 0.25, iou: float = 0.45) -> float:
+    """
+    Run `runs` forward passes of synthetic images, each as large a batch as
+    the service forms, and return the seconds taken. This moves one-off
+    costs (kernel selection, allocator growth, lazy initialisation) out of
+    the first real requests. Passes are submitted together, so a process
+    pool spreads them over its idle workers.
+    """
+    batch = max(1, int(getattr(service, "max_batch_size", 1)))
+    images = [synthetic_image(imgsz, seed=i) for i in range(batch)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, runs)) as pool:
+        passes = [pool.submit(service.predict_batch, images, conf=conf, iou=iou, imgsz=imgsz) for _ in range(runs)]
+        for future in passes:
+            future.result()
+    return time.perf_counter() - start
+
+
+class ModelLoader:
+    """
+    Builds the inference service and warms it up on a background thread,
+    so the process can answer liveness checks while the model loads.
+
+    `on_loaded` receives the service as soon as it is built. `state` moves
+    through loading, warming and ready, or to failed with `error` set.
+    `extra_sizes` are other input sizes the service may be asked for (see
+    QualityController); each gets one warm-up pass.
+    """
+
+    def __init__(
+        self,
+        build: Callable[[], Any],
+        on_loaded: Callable[[Any], None],
+        warmup_runs: int = 2,
+        imgsz: int = 640,
+        conf: float = 0.25,
+        iou: float = 0.45,
+        extra_sizes: Sequence[int] = (),
+    ):
+        self.build = build
+        self.on_loaded = on_loaded
+        self.warmup_runs = max(0, int(warmup_runs))
+        self.imgsz = imgsz
+        self.conf = conf
+        self.iou = iou
+        self.extra_sizes = [s for s in extra_sizes if s != imgsz]
+        self.state = "loading"
+        self.error: Optional[str] = None
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="model-loader", daemon=True)
+        MODEL_READY.set(0)
+
+    def start(self) -> "ModelLoader":
+        self._thread.start()
+        return self
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until loading has finished, successfully or not. Returns ready.
+        """
+        self._done.wait(timeout)
+        return self.ready
+
+    def _run(self) -> None:
+        try:
+            start = time.perf_counter()
+            service = self.build()
+            MODEL_LOAD_SECONDS.set(time.perf_counter() - start)
+            self.on_loaded(service)
+            print(f"[Startup] Model loaded in {time.perf_counter() - start:.2f}s.")
+
+            if self.warmup_runs:
+                self.state = "warming"
+                seconds = warm_up(service, self.warmup_runs, self.imgsz, self.conf, self.iou)
+                for size in self.extra_sizes:
+                    seconds += warm_up(service, 1, size, self.conf, self.iou)
+                MODEL_WARMUP_SECONDS.set(seconds)
+                extra = "".join(f", 1 at imgsz={s}" for s in self.extra_sizes)
+                print(f"[Startup] Warm-up ({self.warmup_runs} runs at imgsz={self.imgsz}{extra}) took {seconds:.2f}s.")
+            self.state = "ready"
+            MODEL_READY.set(1)
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            print(f"[Startup] Error: model failed to load: {e}")
+        finally:
+            self._done.set()
@@ -0,0 +1,295 @@
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+from time import perf_counter
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005) + DEFAULT_BUCKETS
+
+_registry: List["_Metric"] = []
+_registry_lock = threading.Lock()
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], "_Metric"] = {}
+        with _registry_lock:
+            _registry.append(self)
+
+    def labels(self, *values: str, **kwargs: str) -> "_Metric":
+        if kwargs:
+            values = tuple(kwargs[n] for n in self.labelnames)
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = self._new_child()
+                    self._children[key] = child
+        return child
+
+    def _new_child(self) -> "_Metric":
+        child = object.__new__(type(self))
+        child._init_child(self)
+        return child
+
+    def _init_child(self, parent: "_Metric") -> None:
+        self.name = parent.name
+        self.labelnames = ()
+        self._lock = threading.Lock()
+        self._children = {}
+
+    def _series(self) -> List[Tuple["_Metric", Tuple[str, ...]]]:
+        if self.labelnames:
+            return [(child, key) for key, child in sorted(self._children.items())]
+        return [(self, ())]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for child, key in self._series():
+            lines.extend(child._samples(self.labelnames, key))
+        return lines
+
+    def _samples(self, names: Sequence[str], values: Sequence[str]) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._value = 0.0
+
+    def _init_child(self, parent: _Metric) -> None:
+        super()._init_child(parent)
+        self._value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def _samples(self, names, values):
+        return [f"{self.name}{_format_labels(names, values)} {_format_value(self._value)}"]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._value = 0.0
+        self._function: Optional[Callable[[], float]] = None
+
+    def _init_child(self, parent: _Metric) -> None:
+        super()._init_child(parent)
+        self._value = 0.0
+        self._function = None
+
+    def set(self, value: float) -> None:
+        self._value = float(value)
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value -= amount
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """
+        Read the gauge from a callback at render time instead of a stored value.
+        """
+        self._function = function
+
+    @property
+    def value(self) -> float:
+        if self._function is not None:
+            return float(self._function())
+        return self._value
+
+    def _samples(self, names, values):
+        return [f"{self.name}{_format_labels(names, values)} {_format_value(self.value)}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+        self._reset()
+
+    def _init_child(self, parent: _Metric) -> None:
+        super()._init_child(parent)
+        self.buckets = parent.buckets
+        self._reset()
+
+    def _reset(self) -> None:
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+
+    def observe(self, value: float) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+            self._count += 1
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def sum(self) -> float:
+        return self._sum
+
+    def _samples(self, names, values):
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.buckets + (float("inf"),), self._counts):
+            cumulative += n
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{self.name}_bucket{_format_labels(names, values, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(names, values)} {_format_value(self._sum)}")
+        lines.append(f"{self.name}_count{_format_labels(names, values)} {self._count}")
+        return lines
+
+
+class _StageContext:
+    __slots__ = ("_timer", "_stage", "_start")
+
+    def __init__(self, timer: "StageTimer", stage: str):
+        self._timer = timer
+        self._stage = stage
+
+    def __enter__(self) -> "_StageContext":
+        self._start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self._timer.record(self._stage, perf_counter() - self._start, exc_type is not None)
+        return False
+
+
+Record = Tuple[str, float, bool]
+
+
+class StageTimer:
+    """
+    Latency histogram and error counter for the named stages of a service:
+    `<prefix>_stage_seconds{stage}` and `<prefix>_stage_errors_total{stage}`.
+
+    `with stages.time("decode"): ...` times a block on the monotonic clock;
+    a block that raises is counted as an error as well as timed. When
+    `buffer` is a list, records are appended to it instead, so a worker
+    process can drain() them and its parent replay() them.
+    """
+
+    def __init__(self, prefix: str, buckets: Sequence[float] = STAGE_BUCKETS):
+        self.seconds = Histogram(
+            f"{prefix}_stage_seconds", "Time spent in each processing stage.",
+            labelnames=("stage",), buckets=buckets,
+        )
+        self.errors = Counter(
+            f"{prefix}_stage_errors_total", "Failures in each processing stage.", labelnames=("stage",),
+        )
+        self.buffer: Optional[List[Record]] = None
+        self._stages: Dict[str, Tuple[Histogram, Counter]] = {}
+
+    def time(self, stage: str) -> _StageContext:
+        return _StageContext(self, stage)
+
+    def record(self, stage: str, seconds: float, failed: bool = False) -> None:
+        if self.buffer is not None:
+            self.buffer.append((stage, seconds, failed))
+            return
+        children = self._stages.get(stage)
+        if children is None:
+            children = self._stages[stage] = (self.seconds.labels(stage), self.errors.labels(stage))
+        children[0].observe(seconds)
+        if failed:
+            children[1].inc()
+
+    def drain(self) -> List[Record]:
+        """
+        Take the buffered records, leaving buffering on.
+        """
+        records = self.buffer or []
+        if self.buffer is not None:
+            self.buffer = []
+        return records
+
+    def replay(self, records: Sequence[Record]) -> None:
+        for stage, seconds, failed in records:
+            self.record(stage, seconds, failed)
+
+
+def render() -> str:
+    """
+    Render every registered metric in the Prometheus text exposition format.
+    """
+    with _registry_lock:
+        metrics = list(_registry)
+    lines: List[str] = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+def serve(port: int, addr: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """
+    Serve render() over HTTP from a daemon thread, for processes without an
+    API of their own (e.g. the BitNet worker).
+    """
+    server = ThreadingHTTPServer((addr, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
@@ -1,33 +1,77 @@
-import io, os, numpy as np, torch
-from PIL import Image
-from ultralytics import YOLO
+import os, numpy as np
+from typing import Any, Dict, List
+from services.yolo.backends import load_model
+from services.yolo.preprocess import Letterbox, prepare_batch, unletterbox
+from services.yolo.timing import stages
 
-os.environ.setdefault("OMP_NUM_THREADS", "4")
-os.environ.setdefault("MKL_NUM_THREADS", "4")
-torch.set_num_threads(4)
+_torch_configured = False
+
+def _configure_torch() -> None:
+    # torch is imported on first use rather than with this module, so
+    # importing the API does not pay for it. Thread settings must be in
+    # place before that first import.
+    global _torch_configured
+    if _torch_configured:
+        return
+    threads = os.environ.setdefault("OMP_NUM_THREADS", "4")
+    os.environ.setdefault("MKL_NUM_THREADS", threads)
+    import torch
+    torch.set_num_threads(int(threads))
+    _torch_configured = True
 
 class YoloService:
-    def __init__(self, weights: str = "yolo11n.pt"):
-        self.model = YOLO(weights)
+    def __init__(self, weights: str = "yolo11n.pt", backend: str = "torch", imgsz: int = 640):
+        _configure_torch()
+        self.weights = weights
+        self.backend = backend
+        self.model = load_model(weights, backend=backend, imgsz=imgsz)
         self.class_names = self.model.names
 
-    @staticmethod
-    def _to_numpy(image_bytes: bytes) -> np.ndarray:
-        return np.array(Image.open(io.BytesIO(image_bytes)).convert("RGB"))
+    def _label_table(self) -> np.ndarray:
+        # Index array for vectorised class-id -> label lookup.
+        table = getattr(self, "_labels", None)
+        if table is None:
+            size = max(self.class_names) + 1 if self.class_names else 0
+            table = np.array([self.class_names.get(i, str(i)) for i in range(size)], dtype=object)
+            self._labels = table
+        return table
+
+    def _format(self, r, lb: Letterbox, conf, iou, imgsz) -> Dict[str, Any]:
+        meta = {"imgsz": imgsz, "conf": conf, "iou": iou}
+        if r.boxes is None or len(r.boxes) == 0:
+            return {"detections": [], "meta": meta}
+
+        boxes = np.round(unletterbox(r.boxes.xyxy.cpu().numpy(), lb).astype(np.float64), 2).tolist()
+        scores = np.round(r.boxes.conf.cpu().numpy().astype(np.float64), 4).tolist()
+        class_ids = r.boxes.cls.cpu().numpy().astype(int)
+        labels = self._label_table()[class_ids].tolist()
+        dets = [
+            {"label": l, "confidence": c, "box": b}
+            for l, c, b in zip(labels, scores, boxes)
+        ]
+        return {"detections": dets, "meta": meta}
 
     def predict(self, image_bytes: bytes, conf=0.25, iou=0.45, imgsz=640):
-        np_img = self._to_numpy(image_bytes)
-        results = self.model.predict(source=np_img, imgsz=imgsz, conf=conf, iou=iou,
-                                     device="cpu", verbose=False)
-        dets = []
-        r = results[0]
-        if r.boxes is not None:
-            for box, confv, cls in zip(r.boxes.xyxy.cpu().numpy(),
-                                       r.boxes.conf.cpu().numpy(),
-                                       r.boxes.cls.cpu().numpy().astype(int)):
-                dets.append({
-                    "label": self.class_names.get(cls, str(cls)),
-                    "confidence": float(round(confv, 4)),
-                    "box": [float(round(x, 2)) for x in box]
-                })
-        return {"detections": dets, "meta": {"imgsz": imgsz, "conf": conf, "iou": iou}}
\ No newline at end of file
+        return self.predict_batch([image_bytes], conf=conf, iou=iou, imgsz=imgsz)[0]
+
+    def predict_batch(self, images: List[bytes], conf=0.25, iou=0.45, imgsz=640) -> List[Dict[str, Any]]:
+        """
+        Run several images through the model in a single forward pass.
+        """
+        # Decoding and letterboxing happen here, at the model's resolution, so
+        # ultralytics receives inputs that already fit and skips its own resize.
+        with stages.time("decode"):
+            np_imgs, boxes = prepare_batch(images, imgsz)
+        return self.predict_prepared(np_imgs, boxes, conf=conf, iou=iou, imgsz=imgsz)
+
+    def predict_prepared(self, np_imgs: List[np.ndarray], boxes: List[Letterbox],
+                         conf=0.25, iou=0.45, imgsz=640) -> List[Dict[str, Any]]:
+        """
+        Run already decoded and letterboxed images (see prepare_batch), so
+        callers can decode the next batch while this one runs.
+        """
+        with stages.time("inference"):
+            results = self.model.predict(source=np_imgs, imgsz=imgsz, conf=conf, iou=iou,
+                                         device="cpu", verbose=False)
+        with stages.time("postprocess"):
+            return [self._format(r, lb, conf, iou, imgsz) for r, lb in zip(results, boxes)]
@@ -0,0 +1,177 @@
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from services.yolo import db
+from services.yolo.metrics import Counter, Gauge
+from services.yolo.mq import publish_confirmed
+from services.yolo.storage import write_outputs
+
+OUTBOX_PENDING = Gauge("yolo_outbox_pending", "Side effects committed but not yet delivered.")
+OUTBOX_OLDEST = Gauge("yolo_outbox_oldest_seconds", "Age of the oldest undelivered side effect.")
+OUTBOX_DELIVERED = Counter(
+    "yolo_outbox_delivered_total",
+    "Side effects delivered from the outbox, by sink.",
+    labelnames=("sink",),
+)
+OUTBOX_RETRIES = Counter(
+    "yolo_outbox_retries_total",
+    "Outbox deliveries that failed and were rescheduled, by sink.",
+    labelnames=("sink",),
+)
+
+FIRESTORE = "firestore"
+RABBITMQ = "rabbitmq"
+
+Deliver = Callable[[List[Dict[str, Any]]], None]
+
+
+def firestore_effect(doc_id: str, document: Dict[str, Any]) -> db.Statement:
+    """
+    Outbox entry that writes `document` to Firestore under `doc_id`.
+    """
+    return db.outbox_statement(f"{FIRESTORE}:{doc_id}", FIRESTORE, doc_id, document)
+
+
+def rabbitmq_effect(key: str, message: Dict[str, Any], queue_name: str = "yolo_outputs") -> db.Statement:
+    """
+    Outbox entry that publishes `message` to `queue_name`. `key` identifies
+    the message (e.g. its correlation id) so it is only queued once.
+    """
+    return db.outbox_statement(f"{RABBITMQ}:{queue_name}:{key}", RABBITMQ, queue_name, message)
+
+
+def _deliver_firestore(entries: List[Dict[str, Any]]) -> None:
+    write_outputs([(e["target"], e["payload"]) for e in entries])
+
+
+def _deliver_rabbitmq(entries: List[Dict[str, Any]]) -> None:
+    now = time.time()
+    messages = []
+    for e in entries:
+        message = e["payload"]
+        if isinstance(message.get("timings"), dict):
+            # Stamp when the message actually left, not when it was committed.
+            message["timings"]["published"] = now
+        messages.append((e["target"], message))
+    publish_confirmed(messages)
+
+
+class OutboxDispatcher:
+    """
+    Background thread that delivers committed side effects.
+
+    Due outbox entries are read in id order, grouped by sink and delivered
+    in batches of up to `batch_size`. Delivered entries are deleted; a
+    failed batch is rescheduled with exponential backoff (from
+    `base_backoff` up to `max_backoff` seconds) and retried until it
+    succeeds. Deliveries are at least once: Firestore documents are written
+    under fixed ids and messages carry their correlation id, so a repeat
+    overwrites or is recognised rather than duplicating.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 100,
+        poll_interval: float = 0.5,
+        base_backoff: float = 0.5,
+        max_backoff: float = 60.0,
+        sinks: Optional[Dict[str, Deliver]] = None,
+    ):
+        self.batch_size = max(1, int(batch_size))
+        self.poll_interval = poll_interval
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.sinks = sinks or {FIRESTORE: _deliver_firestore, RABBITMQ: _deliver_rabbitmq}
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="outbox-dispatcher", daemon=True)
+
+    @classmethod
+    def from_env(cls) -> "OutboxDispatcher":
+        return cls(
+            batch_size=int(os.getenv("YOLO_OUTBOX_BATCH", "100")),
+            poll_interval=float(os.getenv("YOLO_OUTBOX_POLL_MS", "500")) / 1000.0,
+            max_backoff=float(os.getenv("YOLO_OUTBOX_MAX_BACKOFF_S", "60")),
+        )
+
+    def start(self) -> "OutboxDispatcher":
+        self._thread.start()
+        return self
+
+    def notify(self) -> None:
+        """
+        New entries were committed; deliver them without waiting for the poll.
+        """
+        self._wake.set()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stopping = True
+        self._wake.set()
+        self._thread.join(timeout)
+
+    def drain(self) -> int:
+        """
+        Deliver every entry that is due now. Returns how many were delivered.
+        """
+        delivered = 0
+        while not self._stopping:
+            entries = db.due_outbox(self.batch_size)
+            if not entries:
+                break
+            done = self._deliver(entries)
+            delivered += done
+            if done < len(entries):
+                break  # the rest were rescheduled; leave them for their backoff
+        return delivered
+
+    def _run(self) -> None:
+        while not self._stopping:
+            self._wake.clear()
+            try:
+                self.drain()
+                pending, oldest = db.outbox_stats()
+                OUTBOX_PENDING.set(pending)
+                OUTBOX_OLDEST.set(_age(oldest))
+            except Exception as e:
+                print(f"[Outbox] Warning: dispatch failed: {e}")
+            self._wake.wait(self.poll_interval)
+
+    def _deliver(self, entries: List[Dict[str, Any]]) -> int:
+        by_sink: Dict[str, List[Dict[str, Any]]] = {}
+        for e in entries:
+            by_sink.setdefault(e["sink"], []).append(e)
+
+        delivered: List[int] = []
+        for sink, group in by_sink.items():
+            deliver = self.sinks.get(sink)
+            try:
+                if deliver is None:
+                    raise ValueError(f"unknown outbox sink {sink!r}")
+                deliver(group)
+            except Exception as e:
+                # A sink may report how many entries, from the start, got through.
+                done = getattr(e, "delivered", 0)
+                OUTBOX_DELIVERED.labels(sink=sink).inc(done)
+                delivered.extend(g["id"] for g in group[:done])
+                failed = group[done:]
+                OUTBOX_RETRIES.labels(sink=sink).inc(len(failed))
+                now = time.time()
+                db.retry_outbox([(g["id"], now + self._backoff(g["attempts"])) for g in failed], str(e))
+                print(f"[Outbox] Warning: {len(failed)} {sink} deliveries failed ({e}); will retry.")
+                continue
+            OUTBOX_DELIVERED.labels(sink=sink).inc(len(group))
+            delivered.extend(g["id"] for g in group)
+        db.ack_outbox(delivered)
+        return len(delivered)
+
+    def _backoff(self, attempts: int) -> float:
+        return min(self.base_backoff * (2 ** min(attempts, 30)), self.max_backoff)
+
+
+def _age(created_at: Optional[str]) -> float:
+    if not created_at:
+        return 0.0
+    return max(0.0, (datetime.utcnow() - datetime.fromisoformat(created_at)).total_seconds())
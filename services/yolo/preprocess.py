@@ -0,0 +1,136 @@
+import io
+import threading
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+
+import numpy as np
+from PIL import Image, ImageOps
+
+PAD_VALUE = 114
+STRIDE = 32
+
+# EXIF orientations that swap width and height.
+_TRANSPOSED = {5, 6, 7, 8}
+
+_buffers = threading.local()
+
+
+class Letterbox(NamedTuple):
+    """
+    How an image was mapped into the model input, so boxes can be mapped back.
+    """
+    scale_x: float
+    scale_y: float
+    pad_x: int
+    pad_y: int
+    width: int
+    height: int
+
+
+def decode(image_bytes: bytes, imgsz: int) -> Tuple[Image.Image, int, int]:
+    """
+    Decode an upload at roughly the resolution the model needs.
+
+    JPEGs are decoded in draft mode, which lets libjpeg downscale by 1/2, 1/4
+    or 1/8 during decoding while staying at least `imgsz` on each side. EXIF
+    orientation is applied. Returns the image together with its full-resolution
+    (oriented) width and height, which detections are reported in.
+    """
+    img = Image.open(io.BytesIO(image_bytes))
+    width, height = img.size
+    orientation = img.getexif().get(0x0112, 1)
+    if orientation in _TRANSPOSED:
+        width, height = height, width
+
+    img.draft("RGB", (imgsz, imgsz))
+    img.load()
+    if orientation != 1:
+        img = ImageOps.exif_transpose(img)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    return img, width, height
+
+
+def target_shape(width: int, height: int, imgsz: int) -> Tuple[int, int, int, int]:
+    """
+    Resized size and minimal stride-aligned canvas for an image, matching
+    ultralytics' rectangular letterbox. Returns (new_w, new_h, canvas_w, canvas_h).
+    """
+    r = imgsz / max(width, height)
+    new_w, new_h = max(1, int(round(width * r))), max(1, int(round(height * r)))
+    canvas_w = new_w + (imgsz - new_w) % STRIDE
+    canvas_h = new_h + (imgsz - new_h) % STRIDE
+    return new_w, new_h, canvas_w, canvas_h
+
+
+def _buffer(shape: Tuple[int, int], slot: int) -> np.ndarray:
+    """
+    A contiguous (h, w, 3) view over a per-thread scratch buffer for `slot`.
+    The backing storage only grows, so steady-state requests never allocate.
+    """
+    pool: Dict[int, np.ndarray] = getattr(_buffers, "pool", None)
+    if pool is None:
+        pool = _buffers.pool = {}
+    size = shape[0] * shape[1] * 3
+    flat = pool.get(slot)
+    if flat is None or flat.size < size:
+        flat = pool[slot] = np.empty(size, dtype=np.uint8)
+    return flat[:size].reshape(shape[0], shape[1], 3)
+
+
+def letterbox(img: Image.Image, width: int, height: int, imgsz: int,
+              canvas: Tuple[int, int], slot: int = 0) -> Tuple[np.ndarray, Letterbox]:
+    """
+    Resize `img` to fit `imgsz` and centre it on a padded canvas of shape
+    `canvas` (w, h), written into a reusable per-thread buffer.
+    """
+    new_w, new_h, _, _ = target_shape(width, height, imgsz)
+    if img.size != (new_w, new_h):
+        img = img.resize((new_w, new_h), Image.BILINEAR)
+
+    canvas_w, canvas_h = canvas
+    out = _buffer((canvas_h, canvas_w), slot)
+    pad_x, pad_y = (canvas_w - new_w) // 2, (canvas_h - new_h) // 2
+    out.fill(PAD_VALUE)
+    out[pad_y:pad_y + new_h, pad_x:pad_x + new_w] = np.asarray(img)
+    return out, Letterbox(new_w / width, new_h / height, pad_x, pad_y, width, height)
+
+
+def prepare_batch(images: Sequence[bytes], imgsz: int) -> Tuple[List[np.ndarray], List[Letterbox]]:
+    """
+    Decode and letterbox a batch. Images share their minimal rectangular canvas
+    when they all need the same one; otherwise every image is padded to a
+    square `imgsz` canvas so they can be stacked.
+    """
+    return letterbox_batch([decode(b, imgsz) for b in images], imgsz)
+
+
+def letterbox_batch(decoded: Sequence[Tuple[Image.Image, int, int]],
+                    imgsz: int) -> Tuple[List[np.ndarray], List[Letterbox]]:
+    """
+    Letterbox images already returned by decode(), as prepare_batch() does.
+    The arrays live in this thread's scratch buffers until its next call.
+    """
+    shapes = {target_shape(w, h, imgsz)[2:] for _, w, h in decoded}
+    canvas = shapes.pop() if len(shapes) == 1 else (imgsz, imgsz)
+
+    arrays, boxes = [], []
+    for slot, (img, w, h) in enumerate(decoded):
+        arr, lb = letterbox(img, w, h, imgsz, canvas, slot)
+        arrays.append(arr)
+        boxes.append(lb)
+    return arrays, boxes
+
+
+def unletterbox(xyxy: np.ndarray, lb: Letterbox) -> np.ndarray:
+    """
+    Map boxes from model-input coordinates back to the original image.
+    """
+    out = np.empty_like(xyxy, dtype=np.float32)
+    xs, ys = out[:, 0::2], out[:, 1::2]
+    np.subtract(xyxy[:, 0::2], lb.pad_x, out=xs)
+    np.subtract(xyxy[:, 1::2], lb.pad_y, out=ys)
+    xs /= lb.scale_x
+    ys /= lb.scale_y
+    np.clip(xs, 0, lb.width, out=xs)
+    np.clip(ys, 0, lb.height, out=ys)
+    return out
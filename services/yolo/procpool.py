@@ -0,0 +1,245 @@
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.yolo.executors import Overloaded
+from services.yolo.metrics import Counter, Gauge
+from services.yolo.timing import stages
+
+POOL_INFLIGHT = Gauge(
+    "yolo_pool_inflight_images",
+    "Images assigned to an inference worker process and not yet returned.",
+    labelnames=("worker",),
+)
+POOL_RESTARTS = Counter("yolo_pool_worker_restarts_total", "Inference worker processes restarted after dying.")
+
+
+def _worker_main(weights: str, backend: str, torch_threads: int, tasks, results, index: int) -> None:
+    # Thread settings must be in place before torch is imported.
+    os.environ["OMP_NUM_THREADS"] = str(torch_threads)
+    os.environ["MKL_NUM_THREADS"] = str(torch_threads)
+    import torch
+    from services.yolo.model import YoloService
+
+    torch.set_num_threads(torch_threads)
+    svc = YoloService(weights, backend=backend)
+    # Stage timings go back with each result, to the metrics the parent serves.
+    stages.buffer = []
+    print(f"[Pool] Worker {index} ready (pid={os.getpid()}, backend={backend}, threads={torch_threads}).")
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        task_id, shm_name, sizes, params = task
+        try:
+            shm = shared_memory.SharedMemory(name=shm_name)
+            try:
+                images, offset = [], 0
+                for size in sizes:
+                    images.append(bytes(shm.buf[offset:offset + size]))
+                    offset += size
+            finally:
+                shm.close()
+            conf, iou, imgsz = params
+            out = svc.predict_batch(images, conf=conf, iou=iou, imgsz=imgsz)
+            results.put((index, task_id, True, out, stages.drain()))
+        except Exception as e:
+            results.put((index, task_id, False, repr(e), stages.drain()))
+
+
+class _Worker:
+    def __init__(self, index: int):
+        self.index = index
+        self.process: Optional[mp.Process] = None
+        self.tasks = None
+        self.inflight: Dict[int, int] = {}
+
+    @property
+    def load(self) -> int:
+        return sum(self.inflight.values())
+
+
+class WorkerError(RuntimeError):
+    """
+    Raised when an inference worker process fails a task or dies.
+    """
+
+
+class ProcessPoolYoloService:
+    """
+    Runs YoloService in N worker processes.
+
+    Each worker loads the weights once and uses `torch_threads` intra-op
+    threads. Image bytes are handed over through a shared memory block per
+    task rather than pickled through the task queue, and each task goes to
+    the worker with the fewest images in flight.
+    """
+
+    def __init__(
+        self,
+        weights: str = "yolo11n.pt",
+        backend: str = "torch",
+        workers: Optional[int] = None,
+        torch_threads: int = 1,
+        max_inflight_per_worker: int = 2,
+        start_method: str = "spawn",
+    ):
+        self.weights = weights
+        self.backend = backend
+        self.torch_threads = max(1, int(torch_threads))
+        n = workers or max(1, (os.cpu_count() or 1) // self.torch_threads)
+        self.max_inflight_per_worker = max(1, int(max_inflight_per_worker))
+        self._ctx = mp.get_context(start_method)
+        self._results = self._ctx.Queue()
+        self._ids = itertools.count()
+        self._futures: Dict[int, Tuple[Future, shared_memory.SharedMemory, int]] = {}
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self._workers = [_Worker(i) for i in range(n)]
+        for w in self._workers:
+            self._start(w)
+            POOL_INFLIGHT.labels(worker=str(w.index)).set_function(lambda w=w: w.load)
+
+        self._collector = threading.Thread(target=self._collect, name="yolo-pool-results", daemon=True)
+        self._collector.start()
+
+    @classmethod
+    def from_env(cls, weights: str = "yolo11n.pt") -> "ProcessPoolYoloService":
+        return cls(
+            weights,
+            backend=os.getenv("YOLO_BACKEND", "torch"),
+            workers=int(os.getenv("YOLO_WORKERS", "0")) or None,
+            torch_threads=int(os.getenv("YOLO_WORKER_THREADS", "1")),
+        )
+
+    def _start(self, worker: _Worker) -> None:
+        worker.tasks = self._ctx.Queue()
+        worker.process = self._ctx.Process(
+            target=_worker_main,
+            args=(self.weights, self.backend, self.torch_threads, worker.tasks, self._results, worker.index),
+            name=f"yolo-worker-{worker.index}",
+            daemon=True,
+        )
+        worker.process.start()
+
+    def _pick_worker(self) -> Optional[_Worker]:
+        candidates = [w for w in self._workers if len(w.inflight) < self.max_inflight_per_worker]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda w: w.load)
+
+    def submit_batch(self, images: List[bytes], conf=0.25, iou=0.45, imgsz=640, block: bool = True) -> Future:
+        """
+        Send a batch of images to the least-loaded worker.
+
+        Returns a Future resolving to the list of per-image results. When every
+        worker is at capacity this waits for a free slot, or raises Overloaded
+        if `block` is False.
+        """
+        sizes = [len(b) for b in images]
+        shm = shared_memory.SharedMemory(create=True, size=max(1, sum(sizes)))
+        offset = 0
+        for b in images:
+            shm.buf[offset:offset + len(b)] = b
+            offset += len(b)
+
+        future: Future = Future()
+        with self._cond:
+            worker = self._pick_worker()
+            while worker is None and block and not self._closed:
+                self._cond.wait()
+                worker = self._pick_worker()
+            if worker is None or self._closed:
+                shm.close()
+                shm.unlink()
+                raise Overloaded("All inference workers are busy")
+            task_id = next(self._ids)
+            worker.inflight[task_id] = len(images)
+            self._futures[task_id] = (future, shm, worker.index)
+            worker.tasks.put((task_id, shm.name, sizes, (conf, iou, imgsz)))
+        return future
+
+    def submit(self, image_bytes: bytes, conf=0.25, iou=0.45, imgsz=640) -> Future:
+        batch_future = self.submit_batch([image_bytes], conf=conf, iou=iou, imgsz=imgsz, block=False)
+        future: Future = Future()
+
+        def _unwrap(f: Future) -> None:
+            if f.exception() is not None:
+                future.set_exception(f.exception())
+            else:
+                future.set_result(f.result()[0])
+
+        batch_future.add_done_callback(_unwrap)
+        return future
+
+    def predict(self, image_bytes: bytes, conf=0.25, iou=0.45, imgsz=640) -> Dict[str, Any]:
+        return self.submit_batch([image_bytes], conf=conf, iou=iou, imgsz=imgsz).result()[0]
+
+    def predict_batch(self, images: List[bytes], conf=0.25, iou=0.45, imgsz=640) -> List[Dict[str, Any]]:
+        return self.submit_batch(images, conf=conf, iou=iou, imgsz=imgsz).result()
+
+    def _finish(self, task_id: int, ok: bool, payload: Any) -> None:
+        with self._cond:
+            entry = self._futures.pop(task_id, None)
+            if entry is None:
+                return
+            future, shm, index = entry
+            self._workers[index].inflight.pop(task_id, None)
+            self._cond.notify_all()
+        shm.close()
+        shm.unlink()
+        if ok:
+            future.set_result(payload)
+        else:
+            future.set_exception(WorkerError(payload))
+
+    def _reap_dead_workers(self) -> None:
+        # inflight is shared with submit_batch and _finish, so restart under
+        # the lock and fail the lost tasks after releasing it.
+        lost = []
+        with self._cond:
+            for w in self._workers:
+                if self._closed or w.process.is_alive():
+                    continue
+                print(f"[Pool] Worker {w.index} exited with code {w.process.exitcode}; restarting.")
+                lost.extend((w.index, task_id) for task_id in w.inflight)
+                w.inflight.clear()
+                POOL_RESTARTS.inc()
+                self._start(w)
+            if lost:
+                self._cond.notify_all()
+        for index, task_id in lost:
+            self._finish(task_id, False, f"worker {index} died")
+
+    def _collect(self) -> None:
+        while not self._closed:
+            try:
+                _, task_id, ok, payload, records = self._results.get(timeout=1.0)
+            except queue.Empty:
+                pass
+            except (EOFError, OSError):
+                break
+            else:
+                stages.replay(records)
+                self._finish(task_id, ok, payload)
+            self._reap_dead_workers()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for w in self._workers:
+            w.tasks.put(None)
+        for w in self._workers:
+            w.process.join(timeout=10)
+            if w.process.is_alive():
+                w.process.terminate()
+        for task_id in list(self._futures):
+            self._finish(task_id, False, "pool closed")
@@ -0,0 +1,135 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional, Sequence
+
+from services.yolo.metrics import Counter, Gauge
+
+QUALITY_LEVEL = Gauge("yolo_quality_level", "Current quality level; 0 is full quality, higher is cheaper.")
+QUALITY_IMGSZ = Gauge("yolo_quality_imgsz", "Input size inference currently runs at.")
+QUALITY_CHANGES = Counter(
+    "yolo_quality_changes_total",
+    "Quality level changes, by direction.",
+    labelnames=("direction",),
+)
+QUALITY_REQUESTS = Counter(
+    "yolo_quality_requests_total",
+    "Requests served, by the input size they ran at.",
+    labelnames=("imgsz",),
+)
+
+
+def parse_levels(value: str) -> Sequence[int]:
+    """
+    Input sizes from a comma-separated list, largest (full quality) first.
+    """
+    sizes = {int(v) for v in value.split(",") if v.strip()}
+    return sorted(sizes, reverse=True) or [640]
+
+
+class QualityController:
+    """
+    Chooses the input size for each request from current load.
+
+    Each level is an input size, largest first. When the inference queue
+    holds more than `max_queue` requests, or recent latency (the 90th
+    percentile of the last `window` requests) exceeds `max_latency_ms`, the
+    controller steps down one level. It steps back up once both are under
+    half their limits, judged on requests served at the current size.
+    A step down waits at least `cooldown_s` after the last change and a step
+    up at least `recover_s`, so quality returns only once the pressure has
+    stayed low for a while instead of flapping back into overload. The
+    latency window restarts at each change, since latencies measured at the
+    old size say little about the new one.
+    """
+
+    def __init__(
+        self,
+        levels: Sequence[int] = (640,),
+        max_queue: int = 8,
+        max_latency_ms: float = 500.0,
+        cooldown_s: float = 1.0,
+        recover_s: float = 10.0,
+        window: int = 32,
+        depth: Optional[Callable[[], int]] = None,
+    ):
+        self.levels = sorted({int(l) for l in levels}, reverse=True) or [640]
+        self.max_queue = max(1, int(max_queue))
+        self.max_latency = max(0.0, float(max_latency_ms)) / 1000.0
+        self.cooldown = max(0.0, float(cooldown_s))
+        self.recover = max(0.0, float(recover_s))
+        self.depth = depth or (lambda: 0)
+        self.level = 0
+        self._latencies: "deque[float]" = deque(maxlen=max(1, int(window)))
+        self._changed_at = 0.0
+        self._lock = threading.Lock()
+        QUALITY_LEVEL.set(0)
+        QUALITY_IMGSZ.set(self.levels[0])
+
+    @classmethod
+    def from_env(cls, depth: Optional[Callable[[], int]] = None) -> "QualityController":
+        return cls(
+            levels=parse_levels(os.getenv("YOLO_QUALITY_LEVELS", "640")),
+            max_queue=int(os.getenv("YOLO_QUALITY_MAX_QUEUE", "8")),
+            max_latency_ms=float(os.getenv("YOLO_QUALITY_MAX_LATENCY_MS", "500")),
+            cooldown_s=float(os.getenv("YOLO_QUALITY_COOLDOWN_S", "1")),
+            recover_s=float(os.getenv("YOLO_QUALITY_RECOVER_S", "10")),
+            depth=depth,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return len(self.levels) > 1
+
+    @property
+    def imgsz(self) -> int:
+        return self.levels[self.level]
+
+    def observe(self, seconds: float) -> None:
+        """
+        Record the end-to-end inference latency of a request.
+        """
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def _recent_latency(self) -> float:
+        if not self._latencies:
+            return 0.0
+        ordered = sorted(self._latencies)
+        return ordered[int(0.9 * (len(ordered) - 1))]
+
+    def select(self) -> int:
+        """
+        Re-evaluate the load and return the input size to run the next
+        request at.
+        """
+        if not self.enabled:
+            QUALITY_REQUESTS.labels(imgsz=str(self.levels[0])).inc()
+            return self.levels[0]
+        with self._lock:
+            since = time.monotonic() - self._changed_at
+            if since >= min(self.cooldown, self.recover):
+                depth = self.depth()
+                latency = self._recent_latency()
+                if depth > self.max_queue or (self.max_latency and latency > self.max_latency):
+                    if since >= self.cooldown:
+                        self._move(1)
+                elif (since >= self.recover and self._latencies and depth <= self.max_queue // 2
+                      and (not self.max_latency or latency <= self.max_latency / 2)):
+                    self._move(-1)
+            imgsz = self.levels[self.level]
+        QUALITY_REQUESTS.labels(imgsz=str(imgsz)).inc()
+        return imgsz
+
+    def _move(self, step: int) -> None:
+        level = min(max(self.level + step, 0), len(self.levels) - 1)
+        if level == self.level:
+            return
+        self.level = level
+        self._changed_at = time.monotonic()
+        self._latencies.clear()
+        QUALITY_LEVEL.set(level)
+        QUALITY_IMGSZ.set(self.levels[level])
+        QUALITY_CHANGES.labels(direction="down" if step > 0 else "up").inc()
+        print(f"[Quality] Now serving imgsz={self.levels[level]} (level {level}).")
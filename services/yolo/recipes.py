@@ -0,0 +1,188 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import pika
+
+from services.yolo import db
+from services.yolo.executors import run_io
+from services.yolo.metrics import Histogram
+from services.yolo.mq import get_rabbitmq_url
+
+RESULT_QUEUE = os.getenv("YOLO_RECIPE_QUEUE", "recipe_results")
+
+# Timestamps (epoch seconds) a recipe collects on its way through the system,
+# and the stages measured between them. Stages span two hosts, so they are
+# only as accurate as the clocks are in sync.
+STAGES: List[Tuple[str, str, str]] = [
+    ("inference", "received", "inferred"),
+    ("queue", "published", "recipe_started"),
+    ("recipe", "recipe_started", "recipe_done"),
+    ("delivery", "recipe_done", "stored"),
+    ("total", "received", "stored"),
+]
+
+RECIPE_STAGE_SECONDS = Histogram(
+    "yolo_recipe_stage_seconds",
+    "Time spent in each stage from upload to stored recipe.",
+    labelnames=("stage",),
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+
+def stage_latencies(timings: Dict[str, float]) -> Dict[str, float]:
+    """
+    Per-stage durations for whichever stages have both timestamps.
+    """
+    out = {}
+    for stage, start, end in STAGES:
+        if start in timings and end in timings:
+            out[stage] = max(0.0, timings[end] - timings[start])
+    return out
+
+
+class RecipeWaiters:
+    """
+    Lets request handlers await a recipe that a background thread completes.
+    """
+
+    def __init__(self):
+        self._waiters: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, recipe_id: str) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            self._waiters.setdefault(recipe_id, []).append((loop, future))
+        return future
+
+    def discard(self, recipe_id: str, future: asyncio.Future) -> None:
+        with self._lock:
+            waiters = [w for w in self._waiters.get(recipe_id, []) if w[1] is not future]
+            if waiters:
+                self._waiters[recipe_id] = waiters
+            else:
+                self._waiters.pop(recipe_id, None)
+
+    def notify(self, recipe_id: str, record: Dict[str, Any]) -> None:
+        """
+        Wake everyone waiting on `recipe_id`. Safe to call from any thread.
+        """
+        with self._lock:
+            waiters = self._waiters.pop(recipe_id, [])
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve, future, record)
+
+
+def _resolve(future: asyncio.Future, record: Dict[str, Any]) -> None:
+    if not future.done():
+        future.set_result(record)
+
+
+waiters = RecipeWaiters()
+
+
+class ResultConsumer:
+    """
+    Background thread that consumes finished recipes from the result queue,
+    stores them and wakes any request waiting on them.
+    """
+
+    def __init__(self, url: Optional[str] = None, queue_name: str = RESULT_QUEUE, prefetch: int = 100):
+        self.url = url or get_rabbitmq_url()
+        self.queue_name = queue_name
+        self.prefetch = prefetch
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="recipe-results", daemon=True)
+
+    def start(self) -> "ResultConsumer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self._thread.join(timeout=5)
+
+    def _run(self) -> None:
+        backoff = 1.0
+        while not self._stopping.is_set():
+            connection = None
+            try:
+                connection = pika.BlockingConnection(pika.URLParameters(self.url))
+                channel = connection.channel()
+                channel.queue_declare(queue=self.queue_name, durable=True)
+                channel.basic_qos(prefetch_count=self.prefetch)
+                channel.basic_consume(queue=self.queue_name, on_message_callback=self._on_message)
+                print(f"[Recipes] Consuming results from '{self.queue_name}'.")
+                backoff = 1.0
+                while not self._stopping.is_set():
+                    connection.process_data_events(time_limit=1)
+            except Exception as e:
+                print(f"[Recipes] Warning: result consumer failed ({e}); retrying in {backoff:.0f}s.")
+                self._stopping.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                if connection is not None:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
+
+    def _on_message(self, ch: Any, method: Any, properties: Any, body: bytes) -> None:
+        try:
+            handle_result(json.loads(body.decode("utf-8")))
+        except Exception as e:
+            print(f"[Recipes] Warning: dropping malformed result: {e}")
+        ch.basic_ack(delivery_tag=method.delivery_tag)
+
+
+def handle_result(message: Dict[str, Any]) -> None:
+    """
+    Store a result-queue message and record how long each stage took.
+    """
+    recipe_id = message["correlation_id"]
+    timings = dict(message.get("timings") or {})
+    timings["stored"] = time.time()
+    for stage, seconds in stage_latencies(timings).items():
+        RECIPE_STAGE_SECONDS.labels(stage=stage).observe(seconds)
+
+    # Queued on the write-behind writer; waiters get the record directly.
+    db.complete_recipe(recipe_id, message["recipe"], timings)
+    waiters.notify(recipe_id, {
+        "id": recipe_id,
+        "status": "done",
+        "result": message["recipe"],
+        "timings": timings,
+    })
+
+
+async def wait_for_recipe(recipe_id: str, timeout: float, poll_interval: float = 1.0) -> Optional[Dict[str, Any]]:
+    """
+    Wait up to `timeout` seconds for a recipe to complete and return its
+    record, or the latest stored record (pending, or None if unknown) on
+    timeout. The store is re-read every `poll_interval` in case the result
+    was consumed by another API process.
+    """
+    future = waiters.register(recipe_id)
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            record = await run_io("sqlite", db.get_recipe, recipe_id)
+            if record is None or record["status"] == "done":
+                return record
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return record
+            try:
+                notified = await asyncio.wait_for(asyncio.shield(future), min(remaining, poll_interval))
+            except asyncio.TimeoutError:
+                continue
+            # Prefer the stored record, which also carries the owner.
+            stored = await run_io("sqlite", db.get_recipe, recipe_id)
+            return stored if stored is not None and stored["status"] == "done" else notified
+    finally:
+        waiters.discard(recipe_id, future)
@@ -0,0 +1,260 @@
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple, TypeVar
+
+from services.yolo.executors import Overloaded
+from services.yolo.metrics import Counter, Gauge, Histogram
+
+SCHEDULER_WAIT = Histogram(
+    "yolo_scheduler_wait_seconds",
+    "Time a request waited for an inference slot, by priority class.",
+    labelnames=("priority",),
+)
+SCHEDULER_USER_WAIT = Histogram(
+    "yolo_scheduler_user_wait_seconds",
+    "Time a request waited for an inference slot, by user. Users beyond the "
+    "first YOLO_SCHEDULER_METRIC_USERS share user=\"other\".",
+    labelnames=("user",),
+)
+SCHEDULER_QUEUED = Gauge("yolo_scheduler_queued", "Requests waiting for an inference slot.")
+SCHEDULER_ACTIVE = Gauge("yolo_scheduler_active", "Images currently admitted to inference.")
+SCHEDULER_REJECTED = Counter(
+    "yolo_scheduler_rejected_total",
+    "Requests refused by the scheduler, by reason.",
+    labelnames=("reason",),
+)
+
+DEFAULT_WEIGHTS = {"interactive": 4.0, "batch": 1.0}
+
+T = TypeVar("T")
+
+
+class RateLimited(Exception):
+    """
+    Raised when a user has used up their request allowance.
+    `retry_after` is the number of seconds until the next request is allowed.
+    """
+
+    def __init__(self, retry_after: float):
+        super().__init__("Rate limit exceeded")
+        self.retry_after = retry_after
+
+
+def parse_weights(value: str) -> Dict[str, float]:
+    """
+    Priority class weights from "interactive=4,batch=1".
+    """
+    weights = dict(DEFAULT_WEIGHTS)
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() and weight.strip():
+            weights[name.strip()] = max(0.01, float(weight))
+    return weights
+
+
+class _Entry:
+    __slots__ = ("user", "priority", "cost", "loop", "future", "enqueued_at", "dispatched", "cancelled")
+
+    def __init__(self, user: str, priority: str, cost: int):
+        self.user = user
+        self.priority = priority
+        self.cost = cost
+        self.loop = asyncio.get_running_loop()
+        self.future: asyncio.Future = self.loop.create_future()
+        self.enqueued_at = time.monotonic()
+        self.dispatched = False
+        self.cancelled = False
+
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class FairScheduler:
+    """
+    Admission control in front of the model, keyed on the authenticated user.
+
+    Each user has a token bucket of `burst` requests refilled at `rate` per
+    second (0 disables it); admit() raises RateLimited once it is empty.
+
+    At most `concurrency` images are handed to the model at once. The rest
+    wait in start-time fair queuing order: every (user, priority class) is a
+    flow whose requests are tagged with a virtual start time that advances by
+    cost / weight, and the lowest tag runs next. A user sending a flood only
+    pushes their own tags forward, so other users keep their share, and an
+    interactive flow gets `weights["interactive"]` times the share of a batch
+    flow without starving it. The queue is bounded in total (`max_queue`) and
+    per user (`max_per_user`); beyond either, run() raises Overloaded.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 16,
+        rate: float = 0.0,
+        burst: int = 20,
+        max_queue: int = 256,
+        max_per_user: int = 64,
+        weights: Optional[Dict[str, float]] = None,
+        max_users: int = 10_000,
+        metric_users: int = 100,
+    ):
+        self.concurrency = max(1, int(concurrency))
+        self.rate = max(0.0, float(rate))
+        self.burst = max(1, int(burst))
+        self.max_queue = max(1, int(max_queue))
+        self.max_per_user = max(1, int(max_per_user))
+        self.weights = dict(weights or DEFAULT_WEIGHTS)
+        self.max_users = max(1, int(max_users))
+        self.metric_users = max(0, int(metric_users))
+
+        self._lock = threading.Lock()
+        self._heap: List[Tuple[float, int, _Entry]] = []
+        self._seq = itertools.count()
+        self._vtime = 0.0
+        self._finish: Dict[Tuple[str, str], float] = {}
+        self._per_user: Dict[str, int] = {}
+        self._queued = 0
+        self._active = 0
+        # user -> (tokens, last refill)
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._metric_users: Set[str] = set()
+
+        SCHEDULER_QUEUED.set_function(lambda: self._queued)
+        SCHEDULER_ACTIVE.set_function(lambda: self._active)
+
+    @classmethod
+    def from_env(cls) -> "FairScheduler":
+        return cls(
+            concurrency=int(os.getenv("YOLO_SCHEDULER_CONCURRENCY", "16")),
+            rate=float(os.getenv("YOLO_USER_RATE", "0")),
+            burst=int(os.getenv("YOLO_USER_BURST", "20")),
+            max_queue=int(os.getenv("YOLO_SCHEDULER_MAX_QUEUE", "256")),
+            max_per_user=int(os.getenv("YOLO_SCHEDULER_MAX_PER_USER", "64")),
+            weights=parse_weights(os.getenv("YOLO_SCHEDULER_WEIGHTS", "")),
+            metric_users=int(os.getenv("YOLO_SCHEDULER_METRIC_USERS", "100")),
+        )
+
+    @property
+    def queued(self) -> int:
+        return self._queued
+
+    def admit(self, user: Optional[str]) -> None:
+        """
+        Take one request from the user's token bucket, or raise RateLimited.
+        """
+        if not self.rate:
+            return
+        user = user or "anonymous"
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(user, (float(self.burst), now))
+            tokens = min(float(self.burst), tokens + (now - updated) * self.rate)
+            if tokens < 1.0:
+                self._buckets[user] = (tokens, now)
+                SCHEDULER_REJECTED.labels(reason="rate_limited").inc()
+                raise RateLimited((1.0 - tokens) / self.rate)
+            self._buckets[user] = (tokens - 1.0, now)
+            while len(self._buckets) > self.max_users:
+                self._buckets.popitem(last=False)
+
+    async def run(self, user: Optional[str], priority: str, fn: Callable[[], Awaitable[T]], cost: int = 1) -> T:
+        """
+        Wait for this request's turn, then await fn(). `cost` is the number
+        of images it sends to the model.
+        """
+        entry = self._enqueue(user or "anonymous", priority, max(1, int(cost)))
+        try:
+            await entry.future
+        except asyncio.CancelledError:
+            self._cancel(entry)
+            raise
+        try:
+            return await fn()
+        finally:
+            self._release(entry.cost)
+
+    def _enqueue(self, user: str, priority: str, cost: int) -> _Entry:
+        entry = _Entry(user, priority, cost)
+        with self._lock:
+            if self._queued >= self.max_queue:
+                SCHEDULER_REJECTED.labels(reason="queue_full").inc()
+                raise Overloaded("Inference queue is full")
+            if self._per_user.get(user, 0) >= self.max_per_user:
+                SCHEDULER_REJECTED.labels(reason="user_queue_full").inc()
+                raise Overloaded("Too many queued requests for this user")
+
+            flow = (user, priority)
+            start = max(self._vtime, self._finish.get(flow, 0.0))
+            self._finish[flow] = start + cost / self.weights.get(priority, 1.0)
+            if len(self._finish) > self.max_users:
+                # Flows that have nothing ahead of the clock carry no history.
+                self._finish = {f: t for f, t in self._finish.items() if t > self._vtime}
+            heapq.heappush(self._heap, (start, next(self._seq), entry))
+            self._queued += 1
+            self._per_user[user] = self._per_user.get(user, 0) + 1
+            woken = self._dispatch()
+        self._wake(woken)
+        return entry
+
+    def _dispatch(self) -> List[_Entry]:
+        # Called with the lock held; returns the entries to wake.
+        woken = []
+        while self._heap:
+            start, _, entry = self._heap[0]
+            if entry.cancelled:
+                heapq.heappop(self._heap)
+                continue
+            if self._active and self._active + entry.cost > self.concurrency:
+                break
+            heapq.heappop(self._heap)
+            self._vtime = max(self._vtime, start)
+            self._unqueue(entry)
+            self._active += entry.cost
+            entry.dispatched = True
+            woken.append(entry)
+        return woken
+
+    def _unqueue(self, entry: _Entry) -> None:
+        self._queued -= 1
+        left = self._per_user[entry.user] - 1
+        if left:
+            self._per_user[entry.user] = left
+        else:
+            del self._per_user[entry.user]
+
+    def _wake(self, entries: List[_Entry]) -> None:
+        now = time.monotonic()
+        for entry in entries:
+            wait = now - entry.enqueued_at
+            SCHEDULER_WAIT.labels(priority=entry.priority).observe(wait)
+            SCHEDULER_USER_WAIT.labels(user=self._metric_user(entry.user)).observe(wait)
+            entry.loop.call_soon_threadsafe(_wake, entry.future)
+
+    def _metric_user(self, user: str) -> str:
+        if user in self._metric_users:
+            return user
+        if len(self._metric_users) < self.metric_users:
+            self._metric_users.add(user)
+            return user
+        return "other"
+
+    def _cancel(self, entry: _Entry) -> None:
+        with self._lock:
+            dispatched = entry.dispatched
+            if not dispatched:
+                entry.cancelled = True
+                self._unqueue(entry)
+        if dispatched:
+            self._release(entry.cost)
+
+    def _release(self, cost: int) -> None:
+        with self._lock:
+            self._active -= cost
+            woken = self._dispatch()
+        self._wake(woken)
@@ -1,27 +1,372 @@
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+import atexit
+import json
 import os
+import queue
+import threading
+import time
+import uuid
 
 import firebase_admin
 from firebase_admin import credentials, firestore
+from google.api_core.exceptions import NotFound
 from datetime import datetime
 
+from services.yolo.metrics import Counter, Gauge, Histogram
+from services.yolo.timing import stages
+
+# Firestore caps a batch at 500 writes.
+FIRESTORE_BATCH_LIMIT = 500
+
+FIRESTORE_BATCH_SIZE = Histogram(
+    "yolo_firestore_batch_size",
+    "Documents per Firestore batched write.",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500),
+)
+FIRESTORE_QUEUE_DEPTH = Gauge("yolo_firestore_queue_depth", "Documents waiting to be written to Firestore.")
+FIRESTORE_RETRIES = Counter("yolo_firestore_retries_total", "Failed Firestore batch writes that were retried.")
+FIRESTORE_DROPPED = Counter("yolo_firestore_dropped_total", "Documents dropped after exhausting retries.")
+
 _db: Optional[firestore.Client] = None
 
+Document = Tuple[str, Dict[str, Any]]
+
+
+def _query_docs(docs: Dict[str, Dict[str, Any]], limit: int, start_after: Optional[str],
+                fields: Optional[Sequence[str]]) -> Iterator[Dict[str, Any]]:
+    """
+    Firestore's ordering for local backends: newest first, ties by id.
+    """
+    ordered = sorted(docs.items(), key=lambda kv: (kv[1].get("created_at", ""), kv[0]), reverse=True)
+    if start_after is not None:
+        ids = [doc_id for doc_id, _ in ordered]
+        ordered = ordered[ids.index(start_after) + 1:] if start_after in ids else []
+    for doc_id, data in ordered[:limit]:
+        if fields is not None:
+            data = {f: data[f] for f in fields if f in data}
+        yield {"id": doc_id, **data}
+
+
+class FirestoreBackend:
+    """
+    Writes documents to a Firestore collection.
+    """
+
+    def __init__(self, client: Any, collection: str = "predictions"):
+        self.collection = client.collection(collection)
+        self.client = client
+
+    def new_id(self) -> str:
+        # Firestore generates auto-ids client-side; no request is made.
+        return self.collection.document().id
+
+    def write(self, docs: List[Document]) -> None:
+        batch = self.client.batch()
+        for doc_id, data in docs:
+            batch.set(self.collection.document(doc_id), data)
+        batch.commit()
+
+    def update(self, doc_id: str, updates: Dict[str, Any]) -> None:
+        try:
+            self.collection.document(doc_id).update(updates)
+        except NotFound:
+            raise KeyError(doc_id)
+
+    def delete(self, doc_id: str) -> None:
+        self.collection.document(doc_id).delete()
+
+    def query(self, limit: int, start_after: Optional[str] = None,
+              fields: Optional[Sequence[str]] = None) -> Iterator[Dict[str, Any]]:
+        q = self.collection.order_by("created_at", direction=firestore.Query.DESCENDING)
+        if fields is not None:
+            # Projection happens server-side, so unselected fields are never sent.
+            q = q.select(list(fields))
+        if start_after is not None:
+            cursor = self.collection.document(start_after).get(field_paths=["created_at"])
+            if not cursor.exists:
+                return
+            q = q.start_after(cursor)
+        for d in q.limit(limit).stream():
+            yield {"id": d.id, **(d.to_dict() or {})}
+
+
+class MemoryBackend:
+    """
+    In-process stand-in for Firestore, for tests and benchmarks.
+    """
+
+    def __init__(self):
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self.batches = 0
+
+    def new_id(self) -> str:
+        return uuid.uuid4().hex
+
+    def write(self, docs: List[Document]) -> None:
+        self.batches += 1
+        self.docs.update(docs)
+
+    def update(self, doc_id: str, updates: Dict[str, Any]) -> None:
+        self.docs[doc_id] = {**self.docs[doc_id], **updates}
+
+    def delete(self, doc_id: str) -> None:
+        self.docs.pop(doc_id, None)
+
+    def query(self, limit: int, start_after: Optional[str] = None,
+              fields: Optional[Sequence[str]] = None) -> Iterator[Dict[str, Any]]:
+        return _query_docs(dict(self.docs), limit, start_after, fields)
+
+
+class FileBackend:
+    """
+    Appends documents to an NDJSON file, for local runs without Firebase.
+    Updates append the merged document and deletes append a tombstone; the
+    last line for an id wins.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def new_id(self) -> str:
+        return uuid.uuid4().hex
+
+    def write(self, docs: List[Document]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            for doc_id, data in docs:
+                f.write(json.dumps({"id": doc_id, **data}) + "\n")
+
+    def update(self, doc_id: str, updates: Dict[str, Any]) -> None:
+        self.write([(doc_id, {**self._load()[doc_id], **updates})])
+
+    def delete(self, doc_id: str) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"id": doc_id, "_deleted": True}) + "\n")
+
+    def query(self, limit: int, start_after: Optional[str] = None,
+              fields: Optional[Sequence[str]] = None) -> Iterator[Dict[str, Any]]:
+        return _query_docs(self._load(), limit, start_after, fields)
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        docs: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    data = json.loads(line)
+                    doc_id = data.pop("id")
+                    if data.get("_deleted"):
+                        docs.pop(doc_id, None)
+                    else:
+                        docs[doc_id] = data
+        return docs
+
+
+class BatchWriter:
+    """
+    Background writer that buffers documents and writes them in batches.
+
+    submit() assigns document ids up front and returns them immediately.
+    Buffered documents are written once `max_batch` are waiting or
+    `flush_interval` seconds after the first one arrived. A failed batch is
+    retried with exponential backoff up to `max_retries` times, then dropped.
+    """
+
+    def __init__(
+        self,
+        backend: Any,
+        max_batch: int = FIRESTORE_BATCH_LIMIT,
+        flush_interval: float = 0.1,
+        max_queue: int = 10_000,
+        max_retries: int = 5,
+        max_backoff: float = 5.0,
+    ):
+        self.backend = backend
+        self.max_batch = max(1, min(int(max_batch), FIRESTORE_BATCH_LIMIT))
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.max_backoff = max_backoff
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        FIRESTORE_QUEUE_DEPTH.set_function(self._queue.qsize)
+        self._thread = threading.Thread(target=self._run, name="firestore-writer", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_env(cls, backend: Any) -> "BatchWriter":
+        return cls(
+            backend,
+            max_batch=int(os.getenv("YOLO_FIRESTORE_MAX_BATCH", str(FIRESTORE_BATCH_LIMIT))),
+            flush_interval=float(os.getenv("YOLO_FIRESTORE_FLUSH_MS", "100")) / 1000.0,
+            max_queue=int(os.getenv("YOLO_FIRESTORE_MAX_QUEUE", "10000")),
+        )
+
+    def submit(self, payloads: List[Dict[str, Any]]) -> List[str]:
+        """
+        Queue documents and return their ids. Blocks if the queue is full.
+        """
+        ids = []
+        for payload in payloads:
+            data = dict(payload)
+            data.setdefault("created_at", datetime.utcnow().isoformat())
+            doc_id = self.backend.new_id()
+            self._queue.put((doc_id, data))
+            ids.append(doc_id)
+        return ids
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """
+        Wait until everything queued so far has been written (or dropped).
+        """
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self) -> None:
+        running = True
+        while running:
+            item = self._queue.get()
+            docs: List[Document] = []
+            waiters = []
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is None:
+                    running = False
+                    break
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                    break
+                docs.append(item)
+                if len(docs) >= self.max_batch:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if docs:
+                self._write(docs)
+            for waiter in waiters:
+                waiter.set()
+
+    def _write(self, docs: List[Document]) -> None:
+        backoff = 0.1
+        for attempt in range(self.max_retries + 1):
+            try:
+                with stages.time("firestore_write"):
+                    self.backend.write(docs)
+                FIRESTORE_BATCH_SIZE.observe(len(docs))
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    FIRESTORE_DROPPED.inc(len(docs))
+                    print(f"[Firebase] Warning: dropping {len(docs)} documents after {attempt + 1} attempts: {e}")
+                    return
+                FIRESTORE_RETRIES.inc()
+                print(f"[Firebase] Warning: batch write failed ({e}); retrying in {backoff:.1f}s.")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+
+
+_writer: Optional[BatchWriter] = None
+
+
+class _ListCache:
+    """
+    Short-lived cache of list pages. Every write in this process bumps the
+    generation, which drops all pages and stops in-flight reads that started
+    before the write from being cached.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.generation = 0
+        self._entries: Dict[Any, Tuple[float, List[Dict[str, Any]]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                return None
+            return entry[1]
+
+    def put(self, key: Any, docs: List[Dict[str, Any]], generation: int) -> None:
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+            self._entries[key] = (time.monotonic() + self.ttl, docs)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+
+_list_cache = _ListCache(ttl=float(os.getenv("YOLO_FIRESTORE_LIST_TTL_S", "5")))
+
+
+def set_backend(backend: Any) -> None:
+    """
+    Route saved outputs to `backend` (anything with new_id(), write(),
+    query(), update() and delete()), replacing the current writer. Used for stand-ins in tests and benchmarks.
+    """
+    global _writer
+    close_storage()
+    _writer = BatchWriter.from_env(backend)
+
+
+def close_storage() -> None:
+    """
+    Write out buffered documents and stop the writer. Called on shutdown.
+    """
+    global _writer
+    if _writer is not None:
+        _writer.close()
+        _writer = None
+
+
+atexit.register(close_storage)
+
 
 def init_firebase() -> None:
     """
     Best-effort Firebase init.
     If credentials file is missing or invalid, just log a warning and skip.
+
+    YOLO_STORAGE_BACKEND=memory or =file (writing to YOLO_STORAGE_FILE)
+    stores outputs locally instead of in Firestore.
     """
     global _db
 
-    if _db is not None:
+    if _writer is not None:
         return
 
-    if firebase_admin._apps:
-        _db = firestore.client()
+    backend = os.getenv("YOLO_STORAGE_BACKEND", "firestore")
+    if backend == "memory":
+        set_backend(MemoryBackend())
+        return
+    if backend == "file":
+        set_backend(FileBackend(os.getenv("YOLO_STORAGE_FILE", "data/outputs.ndjson")))
         return
 
+    if _db is None:
+        _db = _connect_firestore()
+    if _db is not None:
+        set_backend(FirestoreBackend(_db))
+
+
+def _connect_firestore() -> Optional[firestore.Client]:
+    if firebase_admin._apps:
+        return firestore.client()
+
     cred_path = os.getenv(
         "FIREBASE_CREDENTIALS_PATH",
         "config/firebase-service-account.json",
@@ -29,65 +374,130 @@ def init_firebase() -> None:
 
     if not os.path.isfile(cred_path):
         print(f"[Firebase] Warning: credentials file not found at {cred_path}. Skipping Firebase init.")
-        return
+        return None
 
     try:
         cred = credentials.Certificate(cred_path)
         firebase_admin.initialize_app(cred)
-        _db = firestore.client()
         print("[Firebase] Initialised Firestore client.")
+        return firestore.client()
     except Exception as e:
         print(f"[Firebase] Warning: failed to initialise Firebase: {e}. Skipping.")
-        _db = None
+        return None
 
 
 def save_output(payload: Dict[str, Any]) -> Optional[str]:
     """
-    Save a model output document to Firebase.
-    Returns the document ID, or None if Firebase is not available.
+    Queue a model output document for writing to Firebase.
+    Returns the pre-allocated document ID, or None if Firebase is not available.
     """
-    if _db is None:
+    if _writer is None:
         print("[Firebase] save_output called but Firebase is not initialised. Skipping.")
         return None
+    doc_id = _writer.submit([payload])[0]
+    _list_cache.invalidate()
+    return doc_id
 
-    collection = _db.collection("predictions")
-    data = dict(payload)
-    data.setdefault("created_at", datetime.utcnow().isoformat())
 
-    doc_ref = collection.document()
-    doc_ref.set(data)
-    return doc_ref.id
+def save_outputs(payloads: List[Dict[str, Any]]) -> List[Optional[str]]:
+    """
+    Queue several model output documents; they are written with batched writes.
+    Returns the document IDs in order, or Nones if Firebase is not available.
+    """
+    if _writer is None:
+        print("[Firebase] save_outputs called but Firebase is not initialised. Skipping.")
+        return [None] * len(payloads)
+    ids = _writer.submit(payloads)
+    _list_cache.invalidate()
+    return ids
+
+
+def new_output_id() -> Optional[str]:
+    """
+    Allocate a document id without writing anything (for outbox entries),
+    or None if Firebase is not available.
+    """
+    return _writer.backend.new_id() if _writer is not None else None
 
 
-def list_outputs(limit: int = 50) -> List[Dict[str, Any]]:
+def write_outputs(docs: List[Document]) -> None:
+    """
+    Write documents with the given ids now, in batched writes, raising if a
+    write fails. Writing the same id again overwrites it, so a retried
+    delivery does not create a duplicate.
+    """
+    if _writer is None:
+        raise RuntimeError("Firebase is not initialised")
+    for start in range(0, len(docs), FIRESTORE_BATCH_LIMIT):
+        chunk = docs[start:start + FIRESTORE_BATCH_LIMIT]
+        with stages.time("firestore_write"):
+            _writer.backend.write(chunk)
+        FIRESTORE_BATCH_SIZE.observe(len(chunk))
+    _list_cache.invalidate()
+
+
+def _flush() -> None:
+    # Make queued documents visible before reading or changing them.
+    if _writer is not None:
+        _writer.flush()
+
+
+def iter_outputs(
+    limit: int = 50,
+    start_after: Optional[str] = None,
+    fields: Optional[Sequence[str]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the most recent model outputs from Firebase, newest first.
+
+    `start_after` is the id of the last document of the previous page.
+    `fields` limits each document to those fields (plus `id`). Pages are
+    served from a short-TTL cache that any write in this process invalidates.
+    Yields nothing if Firebase is not available.
+    """
+    if _writer is None:
+        print("[Firebase] list_outputs called but Firebase is not initialised. Returning empty list.")
+        return
+
+    key = (limit, start_after, tuple(fields) if fields is not None else None)
+    cached = _list_cache.get(key)
+    if cached is not None:
+        yield from cached
+        return
+
+    generation = _list_cache.generation
+    _flush()
+    docs = []
+    for doc in _writer.backend.query(limit, start_after, fields):
+        docs.append(doc)
+        yield doc
+    _list_cache.put(key, docs, generation)
+
+
+def list_outputs(
+    limit: int = 50,
+    start_after: Optional[str] = None,
+    fields: Optional[Sequence[str]] = None,
+) -> List[Dict[str, Any]]:
     """
     List the most recent model outputs from Firebase.
     Returns an empty list if Firebase is not available.
     """
-    if _db is None:
-        print("[Firebase] list_outputs called but Firebase is not initialised. Returning empty list.")
-        return []
-
-    collection = _db.collection("predictions")
-    docs = (
-        collection
-        .order_by("created_at", direction=firestore.Query.DESCENDING)
-        .limit(limit)
-        .stream()
-    )
-    return [{"id": d.id, **d.to_dict()} for d in docs]
+    return list(iter_outputs(limit, start_after, fields))
 
 
 def update_output(doc_id: str, updates: Dict[str, Any]) -> None:
     """
     Update a stored model output in Firebase.
+    Raises KeyError if there is no such document.
     No-op if Firebase is not available.
     """
-    if _db is None:
+    if _writer is None:
         print("[Firebase] update_output called but Firebase is not initialised. Skipping.")
         return
-
-    _db.collection("predictions").document(doc_id).update(updates)
+    _flush()
+    _writer.backend.update(doc_id, updates)
+    _list_cache.invalidate()
 
 
 def delete_output(doc_id: str) -> None:
@@ -95,8 +505,9 @@ def delete_output(doc_id: str) -> None:
     Delete a stored model output from Firebase.
     No-op if Firebase is not available.
     """
-    if _db is None:
+    if _writer is None:
         print("[Firebase] delete_output called but Firebase is not initialised. Skipping.")
         return
-
-    _db.collection("predictions").document(doc_id).delete()
\ No newline at end of file
+    _flush()
+    _writer.backend.delete(doc_id)
+    _list_cache.invalidate()
\ No newline at end of file
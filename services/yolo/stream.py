@@ -0,0 +1,194 @@
+import asyncio
+import io
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from PIL import Image
+
+from services.yolo.encoding import encode_json
+from services.yolo.executors import Overloaded
+from services.yolo.metrics import Counter, Gauge
+
+STREAM_FRAMES = Counter(
+    "yolo_stream_frames_total",
+    "Frames received on /stream, by what happened to them.",
+    labelnames=("outcome",),
+)
+STREAM_CONNECTIONS = Gauge("yolo_stream_connections", "Open /stream connections.")
+
+Infer = Callable[[bytes], Awaitable[Dict[str, Any]]]
+
+
+def thumbnail(frame: bytes, size: int = 32) -> np.ndarray:
+    """
+    Tiny greyscale version of a frame for change detection. JPEGs are
+    decoded in draft mode, which skips most of the decoding work.
+    """
+    img = Image.open(io.BytesIO(frame))
+    img.draft("L", (size * 2, size * 2))
+    img = img.convert("L").resize((size, size), Image.BILINEAR)
+    return np.asarray(img, dtype=np.int16)
+
+
+def frame_difference(a: np.ndarray, b: np.ndarray) -> float:
+    """
+    Mean absolute pixel difference between two thumbnails (0-255).
+    """
+    return float(np.abs(a - b).mean())
+
+
+class LatestFrame:
+    """
+    Single-slot mailbox between the socket reader and the analyser. A new
+    frame replaces one that has not been picked up yet, so a client sending
+    faster than inference runs costs one frame of memory, not a backlog.
+    """
+
+    def __init__(self):
+        self._frame: Optional[Tuple[int, bytes]] = None
+        self._ready = asyncio.Event()
+        self._closed = False
+
+    def put(self, index: int, frame: bytes) -> bool:
+        """
+        Offer a frame. Returns True if it replaced an unanalysed one.
+        """
+        replaced = self._frame is not None
+        self._frame = (index, frame)
+        self._ready.set()
+        return replaced
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def close(self) -> None:
+        """
+        Stop: the client has gone, so a waiting frame is discarded.
+        """
+        self._closed = True
+        self._frame = None
+        self._ready.set()
+
+    async def get(self) -> Optional[Tuple[int, bytes]]:
+        """
+        The newest frame, waiting for one if needed; None once closed.
+        """
+        while self._frame is None:
+            if self._closed:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+        frame, self._frame = self._frame, None
+        return frame
+
+
+class FrameFilter:
+    """
+    Skips frames that barely differ from the last analysed one and reports
+    whether a result's label set differs from the last one sent.
+    """
+
+    def __init__(self, threshold: float = 4.0, size: int = 32):
+        self.threshold = threshold
+        self.size = size
+        self._last: Optional[np.ndarray] = None
+        self._labels: Optional[List[str]] = None
+
+    def is_duplicate(self, frame: bytes) -> bool:
+        thumb = thumbnail(frame, self.size)
+        if self._last is not None and frame_difference(thumb, self._last) < self.threshold:
+            return True
+        self._last = thumb
+        return False
+
+    def labels_changed(self, labels: List[str]) -> bool:
+        if labels == self._labels:
+            return False
+        self._labels = labels
+        return True
+
+
+async def run_stream(
+    websocket: Any,
+    infer: Infer,
+    frame_filter: Optional[FrameFilter] = None,
+    max_frame_bytes: int = 8 << 20,
+) -> Dict[str, int]:
+    """
+    Analyse binary frames from an accepted WebSocket until the client
+    disconnects.
+
+    Only the newest frame is analysed whenever inference is free; frames
+    that arrive in between are dropped, so a slow model skips frames rather
+    than falling behind. Near-duplicates of the last analysed frame are not
+    inferred. A JSON message is sent only when the detected label set
+    changes. Returns per-connection counts.
+    """
+    frame_filter = frame_filter or FrameFilter()
+    slot = LatestFrame()
+    stats = {"received": 0, "analysed": 0, "dropped": 0, "duplicates": 0, "sent": 0}
+
+    async def send(message: Dict[str, Any]) -> None:
+        if not slot.closed:
+            await websocket.send_text(encode_json(message).decode("utf-8"))
+
+    async def receive() -> None:
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    return
+                frame = message.get("bytes")
+                if not frame:
+                    continue
+                if len(frame) > max_frame_bytes:
+                    await websocket.close(code=1009, reason="Frame too large")
+                    return
+                stats["received"] += 1
+                if slot.put(stats["received"], frame):
+                    stats["dropped"] += 1
+                    STREAM_FRAMES.labels(outcome="dropped").inc()
+        finally:
+            slot.close()
+
+    async def analyse() -> None:
+        while True:
+            item = await slot.get()
+            if item is None:
+                return
+            index, frame = item
+            try:
+                if await run_in_threadpool(frame_filter.is_duplicate, frame):
+                    stats["duplicates"] += 1
+                    STREAM_FRAMES.labels(outcome="duplicate").inc()
+                    continue
+                result = await infer(frame)
+            except Overloaded:
+                stats["dropped"] += 1
+                STREAM_FRAMES.labels(outcome="dropped").inc()
+                continue
+            except Exception as e:
+                STREAM_FRAMES.labels(outcome="error").inc()
+                await send({"frame": index, "error": str(e)})
+                continue
+            stats["analysed"] += 1
+            STREAM_FRAMES.labels(outcome="analysed").inc()
+            detections = result.get("detections", [])
+            labels = sorted({d["label"] for d in detections})
+            if frame_filter.labels_changed(labels):
+                stats["sent"] += 1
+                await send({"frame": index, "labels": labels, "detections": detections, **stats})
+
+    STREAM_CONNECTIONS.inc()
+    try:
+        reader = asyncio.ensure_future(receive())
+        try:
+            await analyse()
+        finally:
+            reader.cancel()
+            await asyncio.gather(reader, return_exceptions=True)
+    finally:
+        STREAM_CONNECTIONS.dec()
+    return stats
@@ -0,0 +1,6 @@
+from services.yolo.metrics import StageTimer
+
+# Stages of a YOLO request, from reading the upload through the background
+# SQLite, Firestore and RabbitMQ writes, reported as yolo_stage_seconds and
+# yolo_stage_errors_total.
+stages = StageTimer("yolo")
@@ -1,11 +1,36 @@
+import asyncio
+import io
+import json
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import msgpack
+import pytest
 from fastapi.testclient import TestClient
 
-from services.yolo import api
+from services.yolo import api, executors
 from services.yolo.auth import get_current_user
+from services.yolo.batching import BatchingYoloService
 from services.yolo.db import init_db
+from services.yolo.quality import QualityController
+from services.yolo.scheduler import FairScheduler
+
+@pytest.fixture(autouse=True)
+def isolated_api(monkeypatch):
+    api.result_cache.clear()
+    # Keep the shared RabbitMQ publisher out of API tests.
+    monkeypatch.setattr(api, "publish_yolo_output", lambda payload: None)
+    monkeypatch.setattr(api, "publish_yolo_outputs", lambda payloads: None)
+
 
 class DummyYoloService:
-    def predict(self, data: bytes):
+    def __init__(self):
+        self.calls = 0
+
+    def predict(self, data: bytes, conf=0.25, iou=0.45, imgsz=640):
+        self.calls += 1
         return {
             "detections": [
                 {
@@ -29,6 +54,31 @@ def test_health_endpoint_works():
     assert resp.json() == {"status": "ok"}
 
 
+def test_ready_waits_for_model_while_health_stays_up(monkeypatch):
+    gate = threading.Event()
+
+    def build():
+        gate.wait(5)
+        return DummyYoloService()
+
+    monkeypatch.setattr(api, "svc", None)
+    loader = api.ModelLoader(build, api._set_service, warmup_runs=0)
+    monkeypatch.setattr(api, "model_loader", loader.start())
+    api.app.dependency_overrides[get_current_user] = lambda: {"uid": "test-user"}
+    client = TestClient(api.app)
+
+    assert client.get("/health").status_code == 200
+    resp = client.get("/ready")
+    assert resp.status_code == 503 and resp.json() == {"status": "loading"}
+    files = {"file": ("test.jpg", b"fake image bytes", "image/jpeg")}
+    assert client.post("/predict", files=files).status_code == 503
+
+    gate.set()
+    assert loader.wait(timeout=5)
+    assert client.get("/ready").json() == {"status": "ready"}
+    api.app.dependency_overrides.clear()
+
+
 def test_protected_endpoint_requires_auth():
     client = TestClient(api.app)
     resp = client.get("/predictions")
@@ -56,4 +106,397 @@ def test_predict_with_dummy_yolo_and_fake_auth(tmp_path, monkeypatch):
     assert len(data["detections"]) == 1
     assert data["detections"][0]["label"] == "apple"
 
-    api.app.dependency_overrides.clear()
\ No newline at end of file
+    api.app.dependency_overrides.clear()
+
+class SizeRecordingService(DummyYoloService):
+    def predict(self, data: bytes, conf=0.25, iou=0.45, imgsz=640):
+        result = super().predict(data)
+        result["meta"]["imgsz"] = imgsz
+        return result
+
+
+def test_predict_runs_at_reduced_size_under_load(monkeypatch):
+    api.app.dependency_overrides[get_current_user] = lambda: {"uid": "test-user"}
+    monkeypatch.setattr(api, "svc", SizeRecordingService())
+    monkeypatch.setattr(api, "quality", QualityController(
+        levels=[640, 320], max_queue=2, cooldown_s=0, depth=lambda: 10,
+    ))
+
+    client = TestClient(api.app)
+    resp = client.post("/predict", files={"file": ("a.jpg", b"busy", "image/jpeg")})
+    api.app.dependency_overrides.clear()
+
+    assert resp.status_code == 200
+    assert resp.json()["meta"]["imgsz"] == 320
+    assert resp.json()["meta"]["quality_level"] == 1
+    assert 'yolo_quality_requests_total{imgsz="320"}' in client.get("/metrics").text
+
+
+def test_predict_rate_limits_per_user(monkeypatch):
+    api.app.dependency_overrides[get_current_user] = lambda: {"uid": "test-user"}
+    monkeypatch.setattr(api, "svc", DummyYoloService())
+    monkeypatch.setattr(api, "scheduler", FairScheduler(rate=0.01, burst=1))
+    api.result_cache.clear()
+
+    client = TestClient(api.app)
+    first = client.post("/predict", files={"file": ("a.jpg", b"one", "image/jpeg")})
+    second = client.post("/predict", files={"file": ("a.jpg", b"two", "image/jpeg")})
+    api.app.dependency_overrides.clear()
+
+    assert first.status_code == 200
+    assert second.status_code == 429
+    assert int(second.headers["Retry-After"]) >= 1
+    assert 'yolo_scheduler_user_wait_seconds_count{user="test-user"}' in client.get("/metrics").text
+
+
+class BlockingYoloService(DummyYoloService):
+    def __init__(self):
+        super().__init__()
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def predict(self, data: bytes, conf=0.25, iou=0.45, imgsz=640):
+        self.started.set()
+        self.release.wait(10)
+        return super().predict(data)
+
+
+def _post_image(client):
+    files = {"file": ("test.jpg", b"fake image bytes", "image/jpeg")}
+    return client.post("/predict", files=files)
+
+
+def test_health_is_served_while_inference_is_running():
+    api.app.dependency_overrides[get_current_user] = lambda: {"uid": "test-user"}
+    blocking = BlockingYoloService()
+    api.svc = blocking
+    init_db()
+
+    client = TestClient(api.app)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pending = pool.submit(_post_image, client)
+        assert blocking.started.wait(5)
+
+        start = time.monotonic()
+        resp = client.get("/health")
+        assert resp.status_code == 200
+        assert time.monotonic() - start < 2
+
+        blocking.release.set()
+        assert pending.result(timeout=10).status_code == 200
+
+    api.app.dependency_overrides.clear()
+
+
+def test_predict_returns_503_when_inference_queue_is_full(monkeypatch):
+    api.app.dependency_overrides[get_current_user] = lambda: {"uid": "test-user"}
+    blocking = BlockingYoloService()
+    api.svc = blocking
+    monkeypatch.setattr(executors, "inference_executor", executors.BoundedExecutor("test", 1, 1))
+
+    client = TestClient(api.app)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pending = pool.submit(_post_image, client)
+        assert blocking.started.wait(5)
+
+        resp = _post_image(client)
+        assert resp.status_code == 503
+        assert resp.headers["Retry-After"] == "1"
+
+        blocking.release.set()
+        assert pending.result(timeout=10).status_code == 200
+
+    api.app.dependency_overrides.clear()
+
+
+def test_repeated_upload_is_served_from_result_cache(monkeypatch):
+    api.app.dependency_overrides[get_current_user] = lambda: {"uid": "test-user"}
+    dummy = DummyYoloService()
+    api.svc = dummy
+    init_db()
+    writes = []
+    monkeypatch.setattr(api, "log_prediction", lambda **kw: writes.append(kw))
+
+    client = TestClient(api.app)
+    first = _post_image(client)
+    second = _post_image(client)
+
+    assert first.status_code == second.status_code == 200
+    assert dummy.calls == 1
+    assert len(writes) == 2
+    assert second.json()["cached"] is True
+    assert second.json()["detections"] == first.json()["detections"]
+
+    api.app.dependency_overrides.clear()
+
+
+def test_cache_hit_is_logged_for_the_requesting_user(monkeypatch):
+    api.svc = DummyYoloService()
+    writes = []
+    monkeypatch.setattr(api, "log_prediction", lambda **kw: writes.append(kw))
+    monkeypatch.setattr(api, "save_output", lambda payload: "doc-alice")
+    client = TestClient(api.app)
+
+    api.app.dependency_overrides[get_current_user] = lambda: {"uid": "alice"}
+    first = _post_image(client)
+    api.app.dependency_overrides[get_current_user] = lambda: {"uid": "bob"}
+    second = _post_image(client)
+    api.app.dependency_overrides.clear()
+
+    assert first.json()["firebase_id"] == "doc-alice"
+    assert second.json()["cached"] is True
+    assert "firebase_id" not in second.json()
+    assert [w["user_id"] for w in writes] == ["alice", "bob"]
+
+
+def test_predict_columnar_msgpack_response():
+    api.app.dependency_overrides[get_current_user] = lambda: {"uid": "test-user"}
+    api.svc = DummyYoloService()
+    init_db()
+
+    client = TestClient(api.app)
+    files = {"file": ("test.jpg", b"fake image bytes", "image/jpeg")}
+    resp = client.post("/predict?format=columnar", files=files, headers={"Accept": "application/msgpack"})
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/msgpack"
+    body = msgpack.unpackb(resp.content, raw=False)
+    assert body["labels"] == ["apple"]
+    assert body["boxes"] == [[0, 0, 10, 10]]
+
+    api.app.dependency_overrides.clear()
+
+
+def test_metrics_report_request_stages_by_route_template():
+    api.app.dependency_overrides[get_current_user] = lambda: {"uid": "test-user"}
+    api.svc = DummyYoloService()
+    init_db()
+
+    client = TestClient(api.app)
+    files = {"file": ("test.jpg", b"fake image bytes", "image/jpeg")}
+    assert client.post("/predict", files=files).status_code == 200
+    assert client.get("/recipes/unknown").status_code == 404
+    api.app.dependency_overrides.clear()
+
+    text = client.get("/metrics").text
+    assert 'yolo_http_requests_total{route="/predict",status="200"}' in text
+    assert 'yolo_http_requests_total{route="/recipes/{recipe_id}",status="404"}' in text
+    assert 'yolo_stage_seconds_count{stage="upload_read"}' in text
+    # Only the /metrics request itself is in flight.
+    assert "yolo_http_requests_in_flight 1" in text
+
+
+def test_predict_batch_streams_ndjson_and_writes_in_bulk(monkeypatch):
+    api.app.dependency_overrides[get_current_user] = lambda: {"uid": "test-user"}
+    api.svc = DummyYoloService()
+    logged, saved, published = [], [], []
+    monkeypatch.setattr(api, "log_predictions", lambda rows: logged.append(rows))
+    monkeypatch.setattr(api, "save_outputs", lambda payloads: saved.append(payloads) or ["doc"] * len(payloads))
+    monkeypatch.setattr(api, "publish_yolo_outputs", lambda payloads: published.append(payloads))
+
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("pantry/a.jpg", b"zipped image")
+        zf.writestr("pantry/notes.txt", b"ignored")
+
+    client = TestClient(api.app)
+    files = [
+        ("files", ("one.jpg", b"image one", "image/jpeg")),
+        ("files", ("two.png", b"image two", "image/png")),
+        ("files", ("set.zip", archive.getvalue(), "application/zip")),
+        ("files", ("doc.pdf", b"%PDF", "application/pdf")),
+    ]
+    resp = client.post("/predict/batch", files=files)
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert [line["filename"] for line in lines] == ["one.jpg", "two.png", "pantry/a.jpg", "doc.pdf"]
+    assert lines[0]["detections"][0]["label"] == "apple"
+    assert lines[0]["firebase_id"] == "doc"
+    assert "error" in lines[3]
+    assert len(logged) == 1 and len(logged[0]) == 3
+    assert len(saved) == 1 and len(saved[0]) == 3
+    assert len(published) == 1 and len(published[0]) == 3
+
+    api.app.dependency_overrides.clear()
+
+
+def test_batch_reports_storage_overload_per_item(monkeypatch):
+    api.app.dependency_overrides[get_current_user] = lambda: {"uid": "test-user"}
+    api.svc = DummyYoloService()
+    monkeypatch.setattr(api, "BATCH_CHUNK", 1)
+    monkeypatch.setattr(api, "save_outputs", lambda payloads: ["doc"] * len(payloads))
+    monkeypatch.setattr(api, "publish_yolo_outputs", lambda payloads: None)
+    monkeypatch.setattr(api, "create_recipes", lambda ids, user_id: None)
+    calls = []
+
+    def log_predictions(rows):
+        calls.append(rows)
+        if len(calls) == 1:
+            raise executors.Overloaded("Storage queue is full")
+
+    monkeypatch.setattr(api, "log_predictions", log_predictions)
+    client = TestClient(api.app)
+    files = [
+        ("files", ("one.jpg", b"image one", "image/jpeg")),
+        ("files", ("two.jpg", b"image two", "image/jpeg")),
+    ]
+    resp = client.post("/predict/batch", files=files)
+    api.app.dependency_overrides.clear()
+
+    assert resp.status_code == 200
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert lines[0] == {"filename": "one.jpg", "error": "Storage queue is full"}
+    assert lines[1]["filename"] == "two.jpg" and lines[1]["firebase_id"] == "doc"
+
+
+def test_batch_chunk_larger_than_queue_runs_each_image_once(monkeypatch):
+    calls = []
+
+    class CountingService(DummyYoloService):
+        def predict(self, data: bytes, conf=0.25, iou=0.45, imgsz=640):
+            calls.append(data)
+            time.sleep(0.01)
+            return super().predict(data)
+
+    svc = BatchingYoloService(CountingService(), max_batch_size=1, max_wait_ms=0, max_queue=2)
+    monkeypatch.setattr(api, "svc", svc)
+    monkeypatch.setattr(api, "scheduler", FairScheduler())
+
+    async def connected():
+        return False
+
+    images = [f"img{i}".encode() for i in range(4)]
+    results = asyncio.run(asyncio.wait_for(api._infer_chunk(images, "test-user", connected), 10))
+    svc.close()
+
+    assert all(not isinstance(r, Exception) for r in results)
+    assert sorted(calls) == images
+
+
+def test_batch_chunk_stops_retrying_when_client_disconnects(monkeypatch):
+    class FullService:
+        def submit_many(self, images, **kwargs):
+            raise executors.Overloaded("Inference queue is full")
+
+    monkeypatch.setattr(api, "svc", FullService())
+    monkeypatch.setattr(api, "scheduler", FairScheduler())
+
+    async def disconnected():
+        return True
+
+    assert asyncio.run(api._infer_chunk([b"a", b"b"], "test-user", disconnected)) is None
+
+
+def test_batch_chunk_larger_than_queue_is_rejected_at_startup(monkeypatch):
+    monkeypatch.setattr(api, "BATCH_CHUNK", 8)
+    monkeypatch.setenv("YOLO_BATCH_MAX_QUEUE", "4")
+    with pytest.raises(ValueError):
+        api._check_batch_settings()
+
+
+def test_predictions_next_cursor_header_and_bad_cursor(tmp_path, monkeypatch):
+    from services.yolo import db
+
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "predictions.db"))
+    api.app.dependency_overrides[get_current_user] = lambda: {"uid": "test-user"}
+    init_db()
+    for i in range(3):
+        db.log_prediction(filename=f"img{i}.jpg", label="apple", confidence=0.5, user_id="test-user")
+
+    client = TestClient(api.app)
+    first = client.get("/predictions", params={"limit": 2, "user_id": "test-user"})
+    assert [r["filename"] for r in first.json()] == ["img2.jpg", "img1.jpg"]
+    cursor = first.headers["X-Next-Cursor"]
+
+    second = client.get("/predictions", params={"limit": 2, "user_id": "test-user", "cursor": cursor})
+    assert [r["filename"] for r in second.json()] == ["img0.jpg"]
+    assert "X-Next-Cursor" not in second.headers
+
+    counts = client.get("/predictions/counts", params={"bucket": "day"}).json()
+    assert counts[0]["label"] == "apple" and counts[0]["count"] == 3
+
+    assert client.get("/predictions", params={"cursor": "not-a-cursor"}).status_code == 400
+    api.app.dependency_overrides.clear()
+    db.close_db()
+
+
+def test_recipe_long_poll_returns_result_published_by_worker(tmp_path, monkeypatch):
+    from services.yolo import db, recipes
+
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "predictions.db"))
+    published = []
+    monkeypatch.setattr(api, "publish_yolo_output", lambda message: published.append(message))
+    api.app.dependency_overrides[get_current_user] = lambda: {"uid": "test-user"}
+    api.svc = DummyYoloService()
+    init_db()
+    client = TestClient(api.app)
+
+    recipe_id = _post_image(client).json()["recipe_id"]
+    assert published[0]["correlation_id"] == recipe_id
+    assert client.get(f"/recipes/{recipe_id}").status_code == 202
+    assert client.get("/recipes/unknown").status_code == 404
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        waiting = pool.submit(client.get, f"/recipes/{recipe_id}", params={"wait": 5})
+        time.sleep(0.2)
+        timings = {**published[0]["timings"], "recipe_started": time.time(), "recipe_done": time.time()}
+        recipes.handle_result({"correlation_id": recipe_id, "recipe": {"recipe_title": "Soup"}, "timings": timings})
+        resp = waiting.result(timeout=5)
+
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["result"] == {"recipe_title": "Soup"}
+    assert {"received", "inferred", "published", "stored"} <= set(body["timings"])
+
+    api.app.dependency_overrides[get_current_user] = lambda: {"uid": "someone-else"}
+    assert client.get(f"/recipes/{recipe_id}").status_code == 404
+
+    # A result whose pending row never arrived has no owner and is private too.
+    db.complete_recipe("orphan", {"recipe_title": "Stew"}, {})
+    assert client.get("/recipes/orphan").status_code == 404
+    api.app.dependency_overrides.clear()
+    db.close_db()
+
+
+def test_firebase_prediction_update_and_delete_use_the_configured_backend():
+    from services.yolo import storage
+
+    backend = storage.MemoryBackend()
+    storage.set_backend(backend)
+    doc_id = storage.save_output({"label": "apple", "created_at": "1"})
+    api.app.dependency_overrides[get_current_user] = lambda: {"uid": "test-user"}
+    client = TestClient(api.app)
+
+    assert client.put(f"/firebase/predictions/{doc_id}", json={"label": "pear"}).status_code == 200
+    assert backend.docs[doc_id]["label"] == "pear"
+    assert client.put("/firebase/predictions/missing", json={"label": "pear"}).status_code == 404
+
+    assert client.delete(f"/firebase/predictions/{doc_id}").status_code == 200
+    assert backend.docs == {}
+    assert client.get("/firebase/predictions").text == ""
+
+    api.app.dependency_overrides.clear()
+    storage.close_storage()
+
+
+def test_firebase_predictions_stream_ndjson_pages():
+    from services.yolo import storage
+
+    storage.set_backend(storage.MemoryBackend())
+    storage.save_outputs([{"label": l, "created_at": c} for l, c in [("apple", "1"), ("banana", "2"), ("cherry", "3")]])
+    api.app.dependency_overrides[get_current_user] = lambda: {"uid": "test-user"}
+    client = TestClient(api.app)
+
+    resp = client.get("/firebase/predictions", params={"limit": 2, "fields": "label"})
+    assert resp.headers["content-type"] == "application/x-ndjson"
+    page = [json.loads(line) for line in resp.text.splitlines()]
+    assert [d["label"] for d in page] == ["cherry", "banana"]
+    assert set(page[0]) == {"id", "label"}
+
+    resp = client.get("/firebase/predictions", params={"start_after": page[-1]["id"]})
+    assert [json.loads(line)["label"] for line in resp.text.splitlines()] == ["apple"]
+
+    api.app.dependency_overrides.clear()
+    storage.close_storage()
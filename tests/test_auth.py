@@ -0,0 +1,57 @@
+import time
+
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+from services.yolo import auth
+
+
+@pytest.fixture
+def verifier():
+    calls = []
+
+    def verify(token):
+        calls.append(token)
+        if token.startswith("bad"):
+            raise ValueError("invalid signature")
+        exp = time.time() + (0.05 if token.startswith("short") else 3600)
+        return {"uid": token, "exp": exp}
+
+    auth.set_verifier(verify)
+    yield calls
+    auth.set_verifier(None)
+
+
+def _user(token):
+    return auth.get_current_user(HTTPAuthorizationCredentials(scheme="Bearer", credentials=token))
+
+
+def test_verified_tokens_are_cached_until_exp(verifier):
+    assert _user("alice")["uid"] == "alice"
+    assert _user("alice")["uid"] == "alice"
+    assert verifier == ["alice"]
+
+    _user("short-lived")
+    time.sleep(0.06)
+    _user("short-lived")
+    assert verifier == ["alice", "short-lived", "short-lived"]
+
+
+def test_failed_verification_is_not_cached(verifier):
+    for _ in range(2):
+        with pytest.raises(HTTPException) as e:
+            _user("bad-token")
+        assert e.value.status_code == 401
+    assert verifier == ["bad-token", "bad-token"]
+
+
+def test_cache_evicts_least_recently_used():
+    cache = auth.TokenCache(max_entries=2)
+    exp = time.time() + 60
+    cache.put("a", {"exp": exp})
+    cache.put("b", {"exp": exp})
+    cache.get("a")
+    cache.put("c", {"exp": exp})
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
@@ -0,0 +1,44 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from services.yolo import backends
+from services.yolo.model import YoloService
+
+
+@pytest.fixture(scope="module")
+def export_dir(tmp_path_factory):
+    path = tmp_path_factory.mktemp("exports")
+    original = backends.EXPORT_DIR
+    backends.EXPORT_DIR = str(path)
+    yield path
+    backends.EXPORT_DIR = original
+
+
+def test_export_is_cached_by_weights_hash_and_imgsz(export_dir):
+    first = backends.export_onnx("yolo11n.pt", imgsz=640)
+    mtime = os.path.getmtime(first)
+
+    assert backends.export_onnx("yolo11n.pt", imgsz=640) == first
+    assert os.path.getmtime(first) == mtime
+    assert backends.weights_digest("yolo11n.pt") in os.path.basename(first)
+    assert first.endswith("-640.onnx")
+
+
+@pytest.mark.parametrize("backend", ["onnx", "onnx-int8"])
+def test_exported_backends_keep_the_output_schema(export_dir, backend):
+    data = Path("docs/examples/apple.jpg").read_bytes()
+    reference = YoloService(backend="torch").predict(data)
+    out = YoloService(backend=backend).predict(data)
+
+    assert out.keys() == reference.keys()
+    assert out["meta"] == reference["meta"]
+    for det in out["detections"]:
+        assert set(det) == {"label", "confidence", "box"}
+        assert len(det["box"]) == 4
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        backends.load_model("yolo11n.pt", backend="tensorrt")
@@ -0,0 +1,85 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from services.yolo.batching import BatchingYoloService, QueueFull
+
+
+class RecordingService:
+    def __init__(self):
+        self.batch_sizes = []
+
+    def predict(self, data: bytes, conf=0.25, iou=0.45, imgsz=640):
+        if data == b"bad":
+            raise ValueError("cannot decode")
+        return {"detections": [{"label": data.decode()}], "meta": {"imgsz": imgsz}}
+
+    def predict_batch(self, images, conf=0.25, iou=0.45, imgsz=640):
+        self.batch_sizes.append(len(images))
+        return [self.predict(b, conf=conf, iou=iou, imgsz=imgsz) for b in images]
+
+
+def test_concurrent_requests_are_grouped_into_batches():
+    inner = RecordingService()
+    svc = BatchingYoloService(inner, max_batch_size=4, max_wait_ms=200)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        outs = list(pool.map(lambda i: svc.predict(f"img{i}".encode()), range(8)))
+    svc.close()
+
+    assert [o["detections"][0]["label"] for o in outs] == [f"img{i}" for i in range(8)]
+    assert sum(inner.batch_sizes) == 8
+    assert max(inner.batch_sizes) > 1
+    assert all(size <= 4 for size in inner.batch_sizes)
+
+
+def test_bad_image_only_fails_its_own_request():
+    inner = RecordingService()
+    svc = BatchingYoloService(inner, max_batch_size=2, max_wait_ms=200)
+
+    good = svc.submit(b"apple")
+    bad = svc.submit(b"bad")
+
+    assert good.result(timeout=5)["detections"][0]["label"] == "apple"
+    with pytest.raises(ValueError):
+        bad.result(timeout=5)
+    svc.close()
+
+
+def test_submit_raises_when_queue_is_full():
+    gate = threading.Event()
+
+    class BlockingService(RecordingService):
+        def predict(self, data, conf=0.25, iou=0.45, imgsz=640):
+            gate.wait(5)
+            return super().predict(data, conf=conf, iou=iou, imgsz=imgsz)
+
+    svc = BatchingYoloService(BlockingService(), max_batch_size=1, max_wait_ms=0, max_queue=1)
+    first = svc.submit(b"a")
+    with pytest.raises(QueueFull):
+        for _ in range(3):
+            svc.submit(b"b")
+    gate.set()
+    assert first.result(timeout=5)["detections"][0]["label"] == "a"
+    svc.close()
+
+
+def test_submit_many_queues_all_or_nothing():
+    gate = threading.Event()
+    seen = []
+
+    class BlockingService(RecordingService):
+        def predict(self, data, conf=0.25, iou=0.45, imgsz=640):
+            gate.wait(5)
+            seen.append(data)
+            return super().predict(data, conf=conf, iou=iou, imgsz=imgsz)
+
+    svc = BatchingYoloService(BlockingService(), max_batch_size=1, max_wait_ms=0, max_queue=3)
+    queued = svc.submit_many([b"a", b"b"])
+    with pytest.raises(QueueFull):
+        svc.submit_many([b"c", b"d", b"e"])
+    gate.set()
+    assert [f.result(timeout=5)["detections"][0]["label"] for f in queued] == ["a", "b"]
+    svc.close()
+    assert seen == [b"a", b"b"]
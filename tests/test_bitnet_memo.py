@@ -0,0 +1,69 @@
+import threading
+import time
+
+from services.bitnet.memo import RecipeMemo, normalize_labels, recipe_key
+
+
+def test_normalized_ingredient_sets_share_a_key():
+    a = recipe_key(normalize_labels(["Banana", "apple ", "apple"]), "v1")
+    b = recipe_key(normalize_labels(["apple", "banana"]), "v1")
+    assert a == b
+    assert a != recipe_key(normalize_labels(["apple", "banana"]), "v2")
+
+
+def test_entries_expire_and_lru_is_bounded():
+    memo = RecipeMemo(max_entries=2, ttl=0.05)
+    calls = []
+
+    def generate(name):
+        return lambda: calls.append(name) or {"title": name}
+
+    memo.get_or_generate("a", generate("a"))
+    memo.get_or_generate("a", generate("a"))
+    assert calls == ["a"]
+
+    memo.get_or_generate("b", generate("b"))
+    memo.get_or_generate("c", generate("c"))
+    memo.get_or_generate("a", generate("a"))  # evicted by c
+    assert calls == ["a", "b", "c", "a"]
+
+    time.sleep(0.06)
+    memo.get_or_generate("a", generate("a"))
+    assert calls == ["a", "b", "c", "a", "a"]
+
+
+def test_concurrent_identical_requests_generate_once():
+    memo = RecipeMemo()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def generate():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {"title": "soup"}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(memo.get_or_generate("k", generate))) for _ in range(4)]
+    threads[0].start()
+    assert started.wait(5)
+    for t in threads[1:]:
+        t.start()
+    time.sleep(0.05)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert results == [{"title": "soup"}] * 4
+
+
+def test_disk_tier_is_shared_between_replicas(tmp_path):
+    path = str(tmp_path / "memo.db")
+    RecipeMemo(disk_path=path).get_or_generate("k", lambda: {"title": "soup"})
+
+    def fail():
+        raise AssertionError("should have been served from disk")
+
+    assert RecipeMemo(disk_path=path).get_or_generate("k", fail) == {"title": "soup"}
@@ -1,4 +1,9 @@
-from services.bitnet.worker import fake_bitnet_postprocess
+import json
+import threading
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from services.bitnet.worker import MESSAGES, BatchConsumer, fake_bitnet_postprocess, stages
 
 def test_fake_bitnet_postprocess_no_detections():
     msg = {"detections": []}
@@ -22,4 +27,67 @@ def test_fake_bitnet_postprocess_with_detections():
     assert "apple (as the main ingredient)" in out["ingredients"][0]
     assert "banana" in " ".join(out["ingredients"])
     assert "steps" in out
-    assert len(out["steps"]) >= 3
\ No newline at end of file
+    assert len(out["steps"]) >= 3
+
+def test_batch_consumer_multi_acks_in_order_and_requeues_failures():
+    release_first = threading.Event()
+    settled = threading.Semaphore(0)
+
+    def process(messages):
+        if messages[0]["n"] == 1:
+            release_first.wait(5)
+        return [ValueError("boom") if m.get("fail") else {"recipe_title": "ok"} for m in messages]
+
+    def run_callback(cb):
+        cb()
+        settled.release()
+
+    connection = MagicMock()
+    connection.add_callback_threadsafe.side_effect = run_callback
+    channel = MagicMock()
+    consumer = BatchConsumer(connection, channel, batch_size=2, workers=2,
+                             process=process, on_result=lambda m, r: None)
+    before = {o: MESSAGES.labels(outcome=o).value for o in ("acked", "requeued", "rejected")}
+    generate_errors = stages.errors.labels("generate").value
+
+    bodies = [{"n": 1}, {"n": 2, "fail": True}, {"n": 3}, {"n": 4, "fail": True}]
+    for tag, body in enumerate(bodies, start=1):
+        method = SimpleNamespace(delivery_tag=tag, redelivered=(tag == 4))
+        consumer._on_message(channel, method, None, json.dumps(body).encode())
+    consumer._dispatch()
+
+    # The second batch settles first.
+    assert settled.acquire(timeout=5)
+    # Tag 3 is done, but tag 1 is still in flight, so nothing is acked yet.
+    channel.basic_ack.assert_not_called()
+    channel.basic_nack.assert_called_once_with(delivery_tag=4, requeue=False)
+
+    release_first.set()
+    consumer._pool.shutdown(wait=True)
+    channel.basic_nack.assert_any_call(delivery_tag=2, requeue=True)
+    channel.basic_ack.assert_called_once_with(delivery_tag=3, multiple=True)
+
+    after = {o: MESSAGES.labels(outcome=o).value - before[o] for o in before}
+    assert after == {"acked": 2, "requeued": 1, "rejected": 1}
+    assert stages.errors.labels("generate").value - generate_errors == 2
+
+
+def test_batch_consumer_publishes_correlated_result_before_ack():
+    connection = MagicMock()
+    connection.add_callback_threadsafe.side_effect = lambda cb: cb()
+    channel = MagicMock()
+    consumer = BatchConsumer(connection, channel, batch_size=1, workers=1,
+                             on_result=lambda m, r: None, result_queue="recipe_results")
+
+    body = {"detections": [{"label": "apple"}], "correlation_id": "abc", "timings": {"received": 1.0}}
+    consumer._on_message(channel, SimpleNamespace(delivery_tag=1, redelivered=False), None, json.dumps(body).encode())
+    consumer._dispatch()
+    consumer._pool.shutdown(wait=True)
+
+    kwargs = channel.basic_publish.call_args.kwargs
+    assert kwargs["routing_key"] == "recipe_results"
+    assert kwargs["properties"].correlation_id == "abc"
+    result = json.loads(kwargs["body"])
+    assert result["recipe"]["recipe_title"] == "Quick Apple Dish"
+    assert {"received", "recipe_started", "recipe_done"} <= set(result["timings"])
+    channel.basic_ack.assert_called_once_with(delivery_tag=1, multiple=True)
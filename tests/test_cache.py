@@ -0,0 +1,39 @@
+from services.yolo.cache import ResultCache, cache_key
+
+
+def test_cache_key_depends_on_bytes_and_settings():
+    base = cache_key(b"img", 0.25, 0.45, 640, "m")
+    assert base == cache_key(b"img", 0.25, 0.45, 640, "m")
+    assert base != cache_key(b"img2", 0.25, 0.45, 640, "m")
+    assert base != cache_key(b"img", 0.5, 0.45, 640, "m")
+    assert base != cache_key(b"img", 0.25, 0.45, 320, "m")
+    assert base != cache_key(b"img", 0.25, 0.45, 640, "other-weights")
+
+
+def test_memory_tier_evicts_least_recently_used_by_size():
+    cache = ResultCache(max_bytes=40)  # room for two entries
+    cache.put("a", {"v": "x" * 10})
+    cache.put("b", {"v": "y" * 10})
+    assert cache.get("a") is not None  # a is now most recently used
+    cache.put("c", {"v": "z" * 10})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"v": "x" * 10}
+    assert cache.get("c") == {"v": "z" * 10}
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.db")
+    ResultCache(disk_path=path).put("k", {"detections": [], "meta": {}})
+
+    restarted = ResultCache(disk_path=path)
+    assert restarted.get("k") == {"detections": [], "meta": {}}
+
+
+def test_disk_tier_is_bounded(tmp_path):
+    cache = ResultCache(max_bytes=0, disk_path=str(tmp_path / "cache.db"), disk_max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.put(key, {"key": key})
+
+    assert cache.get("a") is None
+    assert cache.get("c") == {"key": "c"}
@@ -0,0 +1,79 @@
+import json
+
+from PIL import Image
+
+from services.yolo.cli import Checkpoint, expand_inputs, run_batch
+
+
+class CountingService:
+    class_names = {47: "apple"}
+
+    def __init__(self):
+        self.batches = []
+
+    def predict_prepared(self, arrays, boxes, conf=0.25, iou=0.45, imgsz=640):
+        self.batches.append(len(arrays))
+        return [
+            {"detections": [{"label": "apple", "confidence": 0.9, "box": [0, 0, lb.width, lb.height]}],
+             "meta": {"imgsz": imgsz}}
+            for lb in boxes
+        ]
+
+
+def _write_images(folder, names):
+    folder.mkdir(parents=True, exist_ok=True)
+    for i, name in enumerate(names):
+        Image.new("RGB", (40 + i, 30), (i * 20, 80, 120)).save(folder / name)
+
+
+def test_expand_inputs_from_dirs_globs_and_manifest(tmp_path):
+    _write_images(tmp_path / "a", ["1.jpg", "2.png"])
+    _write_images(tmp_path / "b", ["3.jpg"])
+    (tmp_path / "a" / "notes.txt").write_text("not an image")
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text(f"{tmp_path / 'b' / '3.jpg'}\n")
+
+    paths = expand_inputs([str(tmp_path / "a"), str(tmp_path / "b" / "*.jpg")], str(manifest))
+
+    assert [p.rsplit("/", 2)[-2:] for p in paths] == [["a", "1.jpg"], ["a", "2.png"], ["b", "3.jpg"]]
+
+
+def test_run_batch_writes_ndjson_and_resumes_from_checkpoint(tmp_path):
+    _write_images(tmp_path / "imgs", ["1.jpg", "2.jpg", "3.jpg"])
+    (tmp_path / "imgs" / "broken.jpg").write_bytes(b"not a jpeg")
+    out_path = tmp_path / "out.ndjson"
+    svc = CountingService()
+
+    paths = expand_inputs([str(tmp_path / "imgs")])
+    with open(out_path, "ab") as out:
+        summary = run_batch(svc, paths, out, Checkpoint(str(out_path) + ".checkpoint"),
+                            batch_size=2, workers=2, prefetch=2, imgsz=64)
+    assert summary["images"] == 4 and summary["failed"] == 1
+    rows = [json.loads(line) for line in out_path.read_text().splitlines()]
+    assert sorted(r["path"].rsplit("/", 1)[-1] for r in rows) == ["1.jpg", "2.jpg", "3.jpg", "broken.jpg"]
+    assert [r for r in rows if "error" in r][0]["path"].endswith("broken.jpg")
+    # Boxes come back in each image's own pixel size.
+    assert next(r for r in rows if r["path"].endswith("2.jpg"))["detections"][0]["box"] == [0, 0, 41, 30]
+
+    # A rerun processes the new image and retries the one that failed.
+    _write_images(tmp_path / "imgs", ["1.jpg", "2.jpg", "3.jpg", "4.jpg"])
+    paths = expand_inputs([str(tmp_path / "imgs")])
+    with open(out_path, "ab") as out:
+        summary = run_batch(svc, paths, out, Checkpoint(str(out_path) + ".checkpoint"), batch_size=2, imgsz=64)
+    assert summary == {**summary, "images": 2, "failed": 1, "skipped": 3}
+    assert len(out_path.read_text().splitlines()) == 6
+
+
+def test_run_batch_columnar_writes_one_row_group_per_batch(tmp_path):
+    _write_images(tmp_path / "imgs", ["1.jpg", "2.jpg", "3.jpg"])
+    out_path = tmp_path / "out.jsonl"
+    paths = expand_inputs([str(tmp_path / "imgs")])
+    with open(out_path, "ab") as out:
+        run_batch(CountingService(), paths, out, Checkpoint(str(tmp_path / "ckpt")),
+                  fmt="columnar", batch_size=2, imgsz=64)
+
+    groups = [json.loads(line) for line in out_path.read_text().splitlines()]
+    assert [len(g["paths"]) for g in groups] == [2, 1]
+    assert groups[0]["labels"] == [["apple"], ["apple"]]
+    assert groups[1]["errors"] == [None]
+    assert groups[0]["class_ids"] == [[47], [47]]
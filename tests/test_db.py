@@ -1,4 +1,7 @@
-from services.yolo.db import init_db, log_prediction, list_predictions
+import sqlite3
+
+from services.yolo import db
+from services.yolo.db import init_db, log_prediction, log_predictions, list_predictions
 
 def test_init_db_and_log_prediction_and_list_predictions():
     init_db()
@@ -16,4 +19,96 @@ def test_init_db_and_log_prediction_and_list_predictions():
     first = preds[0]
     assert "filename" in first
     assert "label" in first
-    assert "confidence" in first
\ No newline at end of file
+    assert "confidence" in first
+
+def test_log_predictions_inserts_rows_in_bulk():
+    init_db()
+    log_predictions([
+        {"filename": "bulk_a.jpg", "label": "apple", "confidence": 0.9},
+        {"filename": "bulk_b.jpg", "label": "banana", "confidence": 0.8},
+    ])
+
+    filenames = [p["filename"] for p in list_predictions(limit=2)]
+    assert sorted(filenames) == ["bulk_a.jpg", "bulk_b.jpg"]
+
+
+def test_queued_writes_are_flushed_on_close(tmp_path, monkeypatch):
+    path = str(tmp_path / "predictions.db")
+    monkeypatch.setattr(db, "DB_PATH", path)
+    init_db()
+    for i in range(100):
+        log_prediction(filename=f"img{i}.jpg", label="apple", confidence=0.5)
+    db.close_db()
+
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0] == 100
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    conn.close()
+
+
+def test_keyset_pages_cover_every_filtered_row_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "predictions.db"))
+    init_db()
+    for i in range(7):
+        log_prediction(filename=f"b{i}.jpg", label="banana", confidence=0.5, user_id="alice")
+        log_prediction(filename=f"a{i}.jpg", label="apple", confidence=0.5, user_id="alice")
+    log_prediction(filename="bob.jpg", label="banana", confidence=0.5, user_id="bob")
+
+    seen, cursor = [], None
+    while True:
+        rows, cursor = db.query_predictions(limit=3, cursor=cursor, label="banana", user_id="alice")
+        seen.extend(r["filename"] for r in rows)
+        if cursor is None:
+            break
+
+    assert seen == [f"b{i}.jpg" for i in reversed(range(7))]
+    db.close_db()
+
+
+def test_deep_cursor_seeks_the_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "predictions.db"))
+    init_db()
+    cursor = db.encode_cursor("2024-05-01T00:00:00", 1000)
+    conn = db._get_connection()
+    for filters in ({}, {"label": "banana"}, {"user_id": "alice"}):
+        sql, params = db._page_query(50, cursor, filters.get("label"), filters.get("user_id"), None, None)
+        plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+        assert plan[0].startswith("SEARCH") and "created_at<" in plan[0], plan
+    db.close_db()
+
+
+def test_pending_recipe_fills_in_the_owner_of_an_early_result(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "predictions.db"))
+    init_db()
+    db.complete_recipe("r1", {"recipe_title": "Soup"}, {})
+    assert db.get_recipe("r1")["user_id"] is None
+
+    db.create_recipe("r1", "alice")
+    record = db.get_recipe("r1")
+    assert record["user_id"] == "alice" and record["status"] == "done"
+    db.close_db()
+
+
+def test_counts_come_from_rollup_and_existing_rows_are_backfilled(tmp_path, monkeypatch):
+    path = str(tmp_path / "predictions.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE predictions (id INTEGER PRIMARY KEY AUTOINCREMENT, filename TEXT NOT NULL, "
+        "label TEXT NOT NULL, confidence REAL NOT NULL, created_at TEXT NOT NULL)"
+    )
+    conn.execute(
+        "INSERT INTO predictions (filename, label, confidence, created_at) "
+        "VALUES ('old.jpg', 'banana', 0.9, '2024-05-01T10:15:00')"
+    )
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(db, "DB_PATH", path)
+    init_db()
+    log_prediction(filename="new.jpg", label="banana", confidence=0.9, user_id="alice")
+
+    counts = db.count_predictions(bucket="day", label="banana")
+    assert counts[0] == {"bucket": "2024-05-01", "label": "banana", "count": 1}
+    assert sum(c["count"] for c in counts) == 2
+    assert db.count_predictions(user_id="alice")[0]["count"] == 1
+    db.close_db()
@@ -0,0 +1,38 @@
+import json
+
+import msgpack
+
+from services.yolo.encoding import render, to_columnar
+
+RESULT = {
+    "detections": [
+        {"label": "apple", "confidence": 0.91, "box": [1.0, 2.0, 3.0, 4.0]},
+        {"label": "banana", "confidence": 0.5, "box": [5.0, 6.0, 7.0, 8.0]},
+    ],
+    "meta": {"imgsz": 640, "conf": 0.25, "iou": 0.45},
+    "firebase_id": "abc",
+}
+
+
+def test_to_columnar_builds_parallel_arrays():
+    out = to_columnar(RESULT, {46: "banana", 47: "apple"})
+    assert out["labels"] == ["apple", "banana"]
+    assert out["class_ids"] == [47, 46]
+    assert to_columnar(RESULT)["class_ids"] == [None, None]
+    assert out["scores"] == [0.91, 0.5]
+    assert out["boxes"] == [[1.0, 2.0, 3.0, 4.0], [5.0, 6.0, 7.0, 8.0]]
+    assert out["meta"] == RESULT["meta"]
+    assert out["firebase_id"] == "abc"
+    assert "detections" not in out
+
+
+def test_render_defaults_to_json():
+    resp = render(RESULT, "*/*")
+    assert resp.media_type == "application/json"
+    assert json.loads(resp.body) == RESULT
+
+
+def test_render_msgpack_when_accepted():
+    resp = render(RESULT, "application/msgpack")
+    assert resp.media_type == "application/msgpack"
+    assert msgpack.unpackb(resp.body, raw=False) == RESULT
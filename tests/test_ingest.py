@@ -0,0 +1,67 @@
+import io
+import tarfile
+import zipfile
+
+from services.yolo.ingest import iter_archive, iter_uploads, take
+
+
+def _tar_gz(members):
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tf:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+    buf.seek(0)
+    return buf
+
+
+def test_tar_archives_are_expanded_lazily():
+    archive = _tar_gz({"a.jpg": b"A", "b.PNG": b"B", "readme.md": b"skip"})
+    items = iter_uploads([("photos.tar.gz", "application/gzip", archive)])
+
+    assert take(items, 1) == [("a.jpg", b"A")]
+    assert take(items, 5) == [("b.PNG", b"B")]
+
+
+def test_corrupt_archive_is_reported_as_an_item():
+    items = list(iter_uploads([("broken.zip", "application/zip", io.BytesIO(b"not a zip"))]))
+    assert len(items) == 1
+    assert items[0][0] == "broken.zip"
+    assert isinstance(items[0][1], ValueError)
+
+
+def test_oversized_archive_members_are_rejected_without_reading_them():
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("bomb.jpg", b"\0" * (4 << 20))
+        zf.writestr("ok.jpg", b"fine")
+    items = list(iter_archive("set.zip", buf, max_member=1 << 20))
+
+    assert [name for name, _ in items] == ["bomb.jpg", "ok.jpg"]
+    assert isinstance(items[0][1], ValueError)
+    assert items[1][1] == b"fine"
+
+
+def test_archive_stops_after_total_limit():
+    archive = _tar_gz({f"{i}.jpg": b"x" * 100 for i in range(5)})
+    items = list(iter_archive("set.tar.gz", archive, max_member=100, max_total=250))
+
+    assert [name for name, _ in items] == ["0.jpg", "1.jpg", "2.jpg", "set.tar.gz"]
+    assert isinstance(items[-1][1], ValueError)
+
+
+def test_plain_image_parts_share_the_size_limits():
+    uploads = [
+        ("big.jpg", "image/jpeg", io.BytesIO(b"x" * 200)),
+        ("a.jpg", "image/jpeg", io.BytesIO(b"x" * 100)),
+        ("set.tar.gz", "application/gzip", _tar_gz({"b.jpg": b"y" * 100, "c.jpg": b"z" * 100})),
+        ("d.jpg", "image/jpeg", io.BytesIO(b"x" * 10)),
+    ]
+    items = list(iter_uploads(uploads, max_member=150, max_total=250))
+
+    # The image that crosses the total is still read; everything after it is not.
+    assert [name for name, _ in items] == ["big.jpg", "a.jpg", "b.jpg", "c.jpg", "d.jpg"]
+    assert isinstance(items[0][1], ValueError)
+    assert [len(d) for _, d in items[1:4]] == [100, 100, 100]
+    assert isinstance(items[4][1], ValueError)
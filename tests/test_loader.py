@@ -0,0 +1,43 @@
+import subprocess
+import sys
+
+from services.yolo.loader import ModelLoader
+
+
+class RecordingService:
+    max_batch_size = 4
+
+    def __init__(self):
+        self.batches = []
+
+    def predict_batch(self, images, conf=0.25, iou=0.45, imgsz=640):
+        self.batches.append((len(images), imgsz))
+        return [{"detections": [], "meta": {}} for _ in images]
+
+
+def test_loader_hands_over_service_then_warms_up_at_served_size():
+    svc = RecordingService()
+    loaded = []
+    loader = ModelLoader(lambda: svc, loaded.append, warmup_runs=2, imgsz=320).start()
+
+    assert loader.wait(timeout=10)
+    assert loader.state == "ready"
+    assert loaded == [svc]
+    assert svc.batches == [(4, 320), (4, 320)]
+
+
+def test_loader_reports_failure():
+    def build():
+        raise RuntimeError("weights not found")
+
+    loader = ModelLoader(build, lambda s: None).start()
+
+    assert not loader.wait(timeout=10)
+    assert loader.state == "failed"
+    assert loader.error == "weights not found"
+
+
+def test_importing_api_does_not_import_torch():
+    code = "import sys, services.yolo.api; print('torch' in sys.modules, 'ultralytics' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert out.stdout.split()[-2:] == ["False", "False"]
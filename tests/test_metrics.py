@@ -0,0 +1,51 @@
+import pytest
+
+from services.yolo.metrics import Counter, Gauge, Histogram, StageTimer, render
+
+
+def test_render_prometheus_text():
+    c = Counter("test_requests_total", "Requests seen.", labelnames=("route",))
+    c.labels(route="/predict").inc()
+    c.labels(route="/predict").inc(2)
+
+    g = Gauge("test_depth", "Queue depth.")
+    g.set_function(lambda: 3)
+
+    h = Histogram("test_latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    h.observe(0.05)
+    h.observe(0.5)
+    h.observe(5)
+
+    text = render()
+    assert "# TYPE test_requests_total counter" in text
+    assert 'test_requests_total{route="/predict"} 3' in text
+    assert "test_depth 3" in text
+    assert 'test_latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{le="1"} 2' in text
+    assert 'test_latency_seconds_bucket{le="+Inf"} 3' in text
+    assert "test_latency_seconds_count 3" in text
+
+
+def test_stage_timer_counts_failures_and_replays_buffered_records():
+    stages = StageTimer("test_pipeline")
+    with stages.time("decode"):
+        pass
+    with pytest.raises(ValueError):
+        with stages.time("decode"):
+            raise ValueError("bad image")
+    assert stages.seconds.labels("decode").count == 2
+    assert stages.errors.labels("decode").value == 1
+
+    # A worker process buffers its records for the parent to replay.
+    worker = StageTimer("test_worker")
+    worker.buffer = []
+    with worker.time("inference"):
+        pass
+    records = worker.drain()
+    assert [r[0] for r in records] == ["inference"] and worker.buffer == []
+    assert worker.seconds.labels("inference").count == 0
+
+    stages.replay(records)
+    text = render()
+    assert 'test_pipeline_stage_seconds_count{stage="inference"} 1' in text
+    assert 'test_pipeline_stage_errors_total{stage="decode"} 1' in text
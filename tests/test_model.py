@@ -1,5 +1,10 @@
 from pathlib import Path
+from types import SimpleNamespace
+
+import torch
+
 from services.yolo.model import YoloService
+from services.yolo.preprocess import Letterbox
 
 
 def test_yolo_predict_returns_expected_structure():
@@ -16,4 +21,32 @@ def test_yolo_predict_returns_expected_structure():
         first = out["detections"][0]
         assert "label" in first
         assert "confidence" in first
-        assert "box" in first
\ No newline at end of file
+        assert "box" in first
+
+class _Boxes:
+    def __init__(self, xyxy, conf, cls):
+        self.xyxy, self.conf, self.cls = torch.tensor(xyxy), torch.tensor(conf), torch.tensor(cls)
+
+    def __len__(self):
+        return len(self.conf)
+
+
+def test_format_maps_boxes_and_labels_without_per_box_loops():
+    svc = YoloService.__new__(YoloService)
+    svc.class_names = {0: "apple", 1: "banana"}
+    result = SimpleNamespace(boxes=_Boxes(
+        [[10.0, 20.0, 110.0, 220.0], [0.0, 0.0, 5.0, 5.0]],
+        [0.912345, 0.3],
+        [1.0, 0.0],
+    ))
+    lb = Letterbox(scale_x=0.5, scale_y=0.5, pad_x=0, pad_y=0, width=1000, height=1000)
+
+    out = svc._format(result, lb, 0.25, 0.45, 640)
+
+    assert out["meta"] == {"imgsz": 640, "conf": 0.25, "iou": 0.45}
+    assert out["detections"][0] == {
+        "label": "banana",
+        "confidence": 0.9123,
+        "box": [20.0, 40.0, 220.0, 440.0],
+    }
+    assert out["detections"][1]["label"] == "apple"
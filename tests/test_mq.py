@@ -1,8 +1,14 @@
 from unittest.mock import patch, MagicMock
-from services.yolo.mq import publish_yolo_output
+
+import pika
+import pytest
+
+from services.yolo.mq import ConfirmedPublisher, Publisher, PublishFailed, publish_yolo_output, close_publisher
 
 @patch("services.yolo.mq.pika.BlockingConnection")
-def test_publish_yolo_output_uses_rabbitmq(mock_connection_cls):
+def test_publish_yolo_output_uses_rabbitmq(mock_connection_cls, tmp_path, monkeypatch):
+    close_publisher()
+    monkeypatch.setenv("YOLO_MQ_SPILL_PATH", str(tmp_path / "spill.ndjson"))
     mock_connection = MagicMock()
     mock_channel = MagicMock()
     mock_connection.channel.return_value = mock_channel
@@ -10,9 +16,81 @@ def test_publish_yolo_output_uses_rabbitmq(mock_connection_cls):
 
     payload = {"detections": [], "meta": {}}
     publish_yolo_output(payload)
+    publish_yolo_output(payload)
+    close_publisher()
 
+    # One connection, declared once, in transaction mode, for both messages.
     mock_connection_cls.assert_called_once()
     mock_connection.channel.assert_called_once()
+    mock_channel.tx_select.assert_called_once()
     mock_channel.queue_declare.assert_called_once()
-    mock_channel.basic_publish.assert_called_once()
-    mock_connection.close.assert_called_once()
\ No newline at end of file
+    assert mock_channel.basic_publish.call_count == 2
+    assert 1 <= mock_channel.tx_commit.call_count <= 2
+    mock_connection.close.assert_called_once()
+
+
+def test_publisher_commits_once_per_batch_and_retries_a_failed_batch(tmp_path):
+    channel = MagicMock()
+    connection = MagicMock()
+    connection.channel.return_value = channel
+    channel.tx_commit.side_effect = [pika.exceptions.AMQPChannelError("commit failed"), None]
+
+    with patch("services.yolo.mq.pika.BlockingConnection", return_value=connection):
+        publisher = Publisher(url="amqp://localhost/", spill_path=str(tmp_path / "spill.ndjson"),
+                              flush_interval=0.2)
+        publisher.publish_many([{"i": i} for i in range(3)])
+        assert publisher.flush(timeout=5)
+        publisher.close()
+
+    # The whole batch is sent again after the failed commit.
+    bodies = [c.kwargs["body"] for c in channel.basic_publish.call_args_list]
+    assert bodies == [f'{{"i": {i}}}'.encode() for i in (0, 1, 2, 0, 1, 2)]
+    assert channel.tx_commit.call_count == 2
+
+
+def test_publisher_spills_while_broker_is_down_and_replays(tmp_path):
+    spill = tmp_path / "spill.ndjson"
+    channel = MagicMock()
+    connection = MagicMock()
+    connection.channel.return_value = channel
+    attempts = []
+
+    def connect(params):
+        attempts.append(params)
+        if len(attempts) == 1:
+            raise pika.exceptions.AMQPConnectionError("broker down")
+        return connection
+
+    with patch("services.yolo.mq.pika.BlockingConnection", side_effect=connect):
+        publisher = Publisher(url="amqp://localhost/", max_buffer=2, spill_path=str(spill), flush_interval=0)
+        for i in range(5):
+            publisher.publish({"i": i})
+        # Three messages did not fit in memory.
+        assert len(spill.read_bytes().splitlines()) == 3
+
+        assert publisher.flush(timeout=5)
+        publisher.close()
+
+    bodies = sorted(c.kwargs["body"] for c in channel.basic_publish.call_args_list)
+    assert bodies == sorted(f'{{"i": {i}}}'.encode() for i in range(5))
+    assert not spill.exists()
+
+
+def test_confirmed_publisher_reports_progress_and_keeps_no_copies():
+    channel = MagicMock()
+    connection = MagicMock()
+    connection.channel.return_value = channel
+    channel.basic_publish.side_effect = [None, pika.exceptions.NackError([]), None, None]
+
+    with patch("services.yolo.mq.pika.BlockingConnection", return_value=connection) as connect:
+        publisher = ConfirmedPublisher(url="amqp://localhost/")
+        with pytest.raises(PublishFailed) as exc:
+            publisher.publish([("q", {"i": 0}), ("q", {"i": 1}), ("q", {"i": 2})])
+        assert exc.value.delivered == 1
+
+        # The retry sends only what it is given, on a fresh channel.
+        publisher.publish([("q", {"i": 1}), ("q", {"i": 2})])
+
+    assert connect.call_count == 2
+    bodies = [c.kwargs["body"] for c in channel.basic_publish.call_args_list]
+    assert bodies == [b'{"i": 0}', b'{"i": 1}', b'{"i": 1}', b'{"i": 2}']
@@ -0,0 +1,112 @@
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+
+from services.yolo import api, db
+from services.yolo.auth import get_current_user
+from services.yolo.mq import PublishFailed
+from services.yolo.outbox import OutboxDispatcher, firestore_effect, rabbitmq_effect
+
+
+@pytest.fixture
+def outbox_db(tmp_path, monkeypatch):
+    path = str(tmp_path / "predictions.db")
+    monkeypatch.setattr(db, "DB_PATH", path)
+    db.init_db()
+    yield path
+    db.close_db()
+
+
+def test_rows_and_side_effects_commit_together(outbox_db):
+    db.commit([
+        db.recipe_statement("r1", "alice", "2024-01-01T00:00:00"),
+        db.prediction_statement("a.jpg", "apple", 0.9, "alice", "2024-01-01T00:00:00"),
+        firestore_effect("doc-1", {"label": "apple"}),
+        rabbitmq_effect("r1", {"correlation_id": "r1"}),
+        rabbitmq_effect("r1", {"correlation_id": "r1"}),
+    ])
+
+    entries = db.due_outbox(10)
+    assert [(e["sink"], e["target"]) for e in entries] == [("firestore", "doc-1"), ("rabbitmq", "yolo_outputs")]
+    assert entries[0]["payload"] == {"label": "apple"}
+    assert db.get_recipe("r1")["status"] == "pending"
+
+    # A failing transaction leaves neither the rows nor the side effects.
+    with pytest.raises(sqlite3.Error):
+        db.commit([rabbitmq_effect("r2", {"correlation_id": "r2"}), ("INSERT INTO missing VALUES (1)", ())])
+    assert len(db.due_outbox(10)) == 2
+
+
+def test_dispatcher_delivers_by_sink_and_acks(outbox_db):
+    delivered = {"firestore": [], "rabbitmq": []}
+    dispatcher = OutboxDispatcher(sinks={
+        "firestore": lambda entries: delivered["firestore"].extend(e["target"] for e in entries),
+        "rabbitmq": lambda entries: delivered["rabbitmq"].extend(e["payload"]["correlation_id"] for e in entries),
+    })
+    db.commit([firestore_effect("doc-1", {}), rabbitmq_effect("r1", {"correlation_id": "r1"})])
+
+    assert dispatcher.drain() == 2
+    assert delivered == {"firestore": ["doc-1"], "rabbitmq": ["r1"]}
+    assert db.outbox_stats()[0] == 0
+
+
+def test_failed_delivery_is_rescheduled_with_backoff(outbox_db):
+    def down(entries):
+        raise ConnectionError("broker unreachable")
+
+    dispatcher = OutboxDispatcher(base_backoff=10, sinks={"rabbitmq": down})
+    db.commit([rabbitmq_effect("r1", {"correlation_id": "r1"})])
+
+    assert dispatcher.drain() == 0
+    assert db.due_outbox(10) == []
+    conn = sqlite3.connect(outbox_db)
+    attempts, last_error = conn.execute("SELECT attempts, last_error FROM outbox").fetchone()
+    conn.close()
+    assert attempts == 1 and "unreachable" in last_error
+    assert dispatcher._backoff(1) == 20 and dispatcher._backoff(20) == dispatcher.max_backoff
+
+
+def test_partly_delivered_batch_acks_the_confirmed_entries(outbox_db):
+    def partial(entries):
+        raise PublishFailed(1, ConnectionError("channel closed"))
+
+    dispatcher = OutboxDispatcher(sinks={"rabbitmq": partial})
+    db.commit([rabbitmq_effect(f"r{i}", {"correlation_id": f"r{i}"}) for i in range(3)])
+
+    assert dispatcher.drain() == 1
+    conn = sqlite3.connect(outbox_db)
+    remaining = conn.execute("SELECT key, attempts FROM outbox ORDER BY id").fetchall()
+    conn.close()
+    assert remaining == [("rabbitmq:yolo_outputs:r1", 1), ("rabbitmq:yolo_outputs:r2", 1)]
+
+
+def test_predict_commits_outbox_entries_instead_of_writing_directly(outbox_db, monkeypatch):
+    direct = []
+    monkeypatch.setattr(api, "OUTBOX", True)
+    monkeypatch.setattr(api, "svc", type("Svc", (), {"predict": lambda self, data, **kw: {
+        "detections": [{"label": "apple", "confidence": 0.9, "box": [0, 0, 1, 1]}],
+    }})())
+    monkeypatch.setattr(api, "new_output_id", lambda: "doc-1")
+    for name in ("save_output", "publish_yolo_output", "log_prediction", "create_recipe"):
+        monkeypatch.setattr(api, name, lambda *args, name=name, **kwargs: direct.append(name))
+    api.result_cache.clear()
+    client = TestClient(api.app)
+
+    api.app.dependency_overrides[get_current_user] = lambda: {"uid": "alice"}
+    first = client.post("/predict", files={"file": ("a.jpg", b"outbox", "image/jpeg")})
+    api.app.dependency_overrides[get_current_user] = lambda: {"uid": "bob"}
+    cached = client.post("/predict", files={"file": ("a.jpg", b"outbox", "image/jpeg")})
+    api.app.dependency_overrides.clear()
+
+    assert first.status_code == cached.status_code == 200
+    assert direct == []
+    assert first.json()["firebase_id"] == "doc-1"
+    assert cached.json()["cached"] is True
+
+    # One Firestore document, and one message per request.
+    entries = db.due_outbox(10)
+    assert [e["sink"] for e in entries] == ["firestore", "rabbitmq", "rabbitmq"]
+    assert [e["payload"]["correlation_id"] for e in entries[1:]] == [first.json()["recipe_id"], cached.json()["recipe_id"]]
+    assert db.get_recipe(cached.json()["recipe_id"])["status"] == "pending"
+    assert [p["user_id"] for p in db.list_predictions(limit=10)] == ["bob", "alice"]
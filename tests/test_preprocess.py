@@ -0,0 +1,49 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+from services.yolo.preprocess import PAD_VALUE, decode, prepare_batch, target_shape, unletterbox
+
+
+def _jpeg(width, height, orientation=None):
+    img = Image.new("RGB", (width, height), (200, 30, 30))
+    buf = io.BytesIO()
+    exif = Image.Exif()
+    if orientation is not None:
+        exif[0x0112] = orientation
+    img.save(buf, format="JPEG", exif=exif)
+    return buf.getvalue()
+
+
+def test_large_jpeg_is_decoded_at_reduced_scale():
+    img, width, height = decode(_jpeg(4000, 3000), 640)
+    assert (width, height) == (4000, 3000)
+    assert img.size[0] < 4000
+    assert min(img.size) >= 640 * 3000 // 4000
+
+
+def test_exif_rotation_is_applied():
+    img, width, height = decode(_jpeg(1200, 800, orientation=6), 640)
+    assert (width, height) == (800, 1200)
+    assert img.size[0] < img.size[1]
+
+
+def test_letterbox_pads_to_stride_and_round_trips_boxes():
+    arrays, boxes = prepare_batch([_jpeg(1200, 900)], 640)
+    arr, lb = arrays[0], boxes[0]
+    assert arr.shape == (480, 640, 3)
+    assert target_shape(1200, 900, 640) == (640, 480, 640, 480)
+
+    original = np.array([[120.0, 90.0, 600.0, 450.0]], dtype=np.float32)
+    model_space = np.empty_like(original)
+    model_space[:, 0::2] = original[:, 0::2] * lb.scale_x + lb.pad_x
+    model_space[:, 1::2] = original[:, 1::2] * lb.scale_y + lb.pad_y
+    assert np.allclose(unletterbox(model_space, lb), original, atol=1e-3)
+
+
+def test_mixed_shapes_share_a_square_canvas():
+    arrays, _ = prepare_batch([_jpeg(1200, 900), _jpeg(600, 1000)], 640)
+    assert [a.shape for a in arrays] == [(640, 640, 3), (640, 640, 3)]
+    # the narrow portrait image is padded left and right
+    assert (arrays[1][:, 0] == PAD_VALUE).all()
@@ -0,0 +1,51 @@
+from pathlib import Path
+
+import pytest
+
+from services.yolo.procpool import ProcessPoolYoloService, WorkerError
+
+
+@pytest.fixture(scope="module")
+def pool():
+    p = ProcessPoolYoloService(workers=2, torch_threads=1)
+    yield p
+    p.close()
+
+
+def test_pool_predict_matches_in_process_schema(pool):
+    out = pool.predict(Path("docs/examples/apple.jpg").read_bytes())
+    assert isinstance(out["detections"], list)
+    assert out["meta"] == {"imgsz": 640, "conf": 0.25, "iou": 0.45}
+
+
+def test_pool_routes_to_least_loaded_worker(pool):
+    busy, idle = pool._workers
+    busy.inflight[-1] = 3
+    try:
+        assert pool._pick_worker() is idle
+    finally:
+        del busy.inflight[-1]
+
+
+def test_pool_reports_undecodable_images(pool):
+    with pytest.raises(WorkerError):
+        pool.predict(b"not an image")
+
+
+def test_dead_worker_fails_its_tasks_and_is_restarted(pool):
+    from concurrent.futures import Future
+    from multiprocessing import shared_memory
+
+    worker = pool._workers[0]
+    future = Future()
+    with pool._cond:
+        pool._futures[-2] = (future, shared_memory.SharedMemory(create=True, size=1), worker.index)
+        worker.inflight[-2] = 1
+    worker.process.kill()
+    worker.process.join(5)
+
+    pool._reap_dead_workers()
+
+    with pytest.raises(WorkerError):
+        future.result(timeout=5)
+    assert worker.inflight == {} and worker.process.is_alive()
@@ -0,0 +1,53 @@
+from services.yolo.quality import QualityController, parse_levels
+
+
+def test_parse_levels_orders_largest_first():
+    assert parse_levels("320, 640,480") == [640, 480, 320]
+    assert parse_levels("") == [640]
+
+
+def test_single_level_never_changes():
+    q = QualityController(levels=[640], max_queue=1, depth=lambda: 100)
+    assert not q.enabled
+    assert q.select() == 640
+
+
+def test_steps_down_on_queue_depth_and_back_up_when_it_drains():
+    depth = [0]
+    q = QualityController(levels=[640, 480, 320], max_queue=4, cooldown_s=0, recover_s=0, depth=lambda: depth[0])
+
+    assert q.select() == 640
+    depth[0] = 10
+    assert q.select() == 480
+    assert q.select() == 320
+    assert q.select() == 320
+
+    depth[0] = 1
+    # No request has completed at 320 yet, so there is nothing to judge by.
+    assert q.select() == 320
+    q.observe(0.01)
+    assert q.select() == 480
+
+
+def test_steps_down_on_latency():
+    q = QualityController(levels=[640, 320], max_latency_ms=100, cooldown_s=0)
+    for _ in range(10):
+        q.observe(0.5)
+    assert q.select() == 320
+    assert q.level == 1
+
+
+def test_cooldown_holds_the_level():
+    depth = [10]
+    q = QualityController(levels=[640, 480, 320], max_queue=4, cooldown_s=60, recover_s=60, depth=lambda: depth[0])
+    assert q.select() == 480
+    assert q.select() == 480
+
+
+def test_recovery_waits_longer_than_degrading():
+    depth = [10]
+    q = QualityController(levels=[640, 320], max_queue=4, cooldown_s=0, recover_s=60, depth=lambda: depth[0])
+    assert q.select() == 320
+    depth[0] = 0
+    q.observe(0.01)
+    assert q.select() == 320
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from services.yolo.executors import Overloaded
+from services.yolo.scheduler import FairScheduler, RateLimited, parse_weights
+
+
+def run_order(scheduler, requests):
+    """
+    Submit (user, priority) requests while the only slot is busy, then
+    release it; return the order the requests ran in.
+    """
+    order = []
+
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def hold():
+            await gate.wait()
+
+        async def record(name):
+            order.append(name)
+
+        first = asyncio.ensure_future(scheduler.run("warmup", "interactive", hold))
+        await asyncio.sleep(0)
+        tasks = []
+        for user, priority in requests:
+            tasks.append(asyncio.ensure_future(
+                scheduler.run(user, priority, lambda n=(user, priority): record(n))
+            ))
+            await asyncio.sleep(0)
+        gate.set()
+        await asyncio.gather(first, *tasks)
+
+    asyncio.run(scenario())
+    return order
+
+
+def test_light_user_is_not_stuck_behind_heavy_backlog():
+    scheduler = FairScheduler(concurrency=1)
+    order = run_order(scheduler, [("heavy", "interactive")] * 5 + [("light", "interactive")])
+    assert order.index(("light", "interactive")) <= 1
+
+
+def test_interactive_gets_a_larger_share_than_batch_without_starving_it():
+    scheduler = FairScheduler(concurrency=1, weights={"interactive": 2, "batch": 1})
+    order = run_order(scheduler, [("a", "batch")] * 4 + [("b", "interactive")] * 8)
+    first_six = order[:6]
+    assert first_six.count(("b", "interactive")) == 4
+    assert first_six.count(("a", "batch")) == 2
+
+
+def test_token_bucket_limits_each_user_separately():
+    scheduler = FairScheduler(rate=1.0, burst=2)
+    scheduler.admit("u1")
+    scheduler.admit("u1")
+    with pytest.raises(RateLimited) as exc:
+        scheduler.admit("u1")
+    assert 0 < exc.value.retry_after <= 1.0
+    scheduler.admit("u2")
+
+
+def test_queue_is_bounded_per_user_and_cancelled_waiters_leave_it():
+    scheduler = FairScheduler(concurrency=1, max_per_user=2)
+
+    async def scenario():
+        gate = asyncio.Event()
+        running = asyncio.ensure_future(scheduler.run("u", "interactive", gate.wait))
+        await asyncio.sleep(0)
+        waiting = [asyncio.ensure_future(scheduler.run("u", "interactive", gate.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+        assert scheduler.queued == 2
+        with pytest.raises(Overloaded):
+            await scheduler.run("u", "interactive", gate.wait)
+
+        waiting[0].cancel()
+        await asyncio.sleep(0)
+        assert scheduler.queued == 1
+        gate.set()
+        await asyncio.gather(running, waiting[1])
+        assert scheduler.queued == 0
+
+    asyncio.run(scenario())
+
+
+def test_parse_weights_keeps_defaults():
+    assert parse_weights("batch=0.5") == {"interactive": 4.0, "batch": 0.5}
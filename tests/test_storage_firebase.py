@@ -2,6 +2,7 @@ from services.yolo import storage
 
 def test_save_output_returns_none_when_firebase_not_initialised():
     storage._db = None  # force uninitialised
+    storage.close_storage()
     doc_id = storage.save_output({"label": "apple"})
     assert doc_id is None
 
@@ -13,9 +14,75 @@ def test_list_outputs_returns_empty_when_firebase_not_initialised():
 
 def test_update_output_is_noop_when_firebase_not_initialised():
     storage._db = None
+    storage.close_storage()
     storage.update_output("some-id", {"label": "changed"})
 
 
 def test_delete_output_is_noop_when_firebase_not_initialised():
     storage._db = None
-    storage.delete_output("some-id")
\ No newline at end of file
+    storage.close_storage()
+    storage.delete_output("some-id")
+
+
+def test_save_outputs_returns_ids_immediately_and_writes_in_batches(monkeypatch):
+    monkeypatch.setenv("YOLO_FIRESTORE_FLUSH_MS", "1000")
+    backend = storage.MemoryBackend()
+    storage.set_backend(backend)
+    try:
+        first = storage.save_output({"label": "apple"})
+        rest = storage.save_outputs([{"label": "banana"}, {"label": "cherry"}])
+        storage._writer.flush()
+    finally:
+        storage.close_storage()
+
+    assert set(backend.docs) == {first, *rest}
+    assert backend.docs[rest[1]]["label"] == "cherry"
+    assert "created_at" in backend.docs[first]
+    assert backend.batches == 1
+
+
+def test_failed_batches_are_retried():
+    class FlakyBackend(storage.MemoryBackend):
+        def write(self, docs):
+            if self.batches == 0:
+                self.batches += 1
+                raise RuntimeError("unavailable")
+            super().write(docs)
+
+    backend = FlakyBackend()
+    writer = storage.BatchWriter(backend, flush_interval=0.01)
+    ids = writer.submit([{"label": "apple"}])
+    writer.close()
+    assert list(backend.docs) == ids
+
+
+def test_list_outputs_pages_projects_and_invalidates_cache():
+    backend = storage.MemoryBackend()
+    storage.set_backend(backend)
+    try:
+        storage.save_outputs([
+            {"label": f"item{i}", "raw_result": {"detections": []}, "created_at": f"2024-01-0{i + 1}"}
+            for i in range(5)
+        ])
+        first = storage.list_outputs(limit=2, fields=["label"])
+        assert first == [{"id": first[0]["id"], "label": "item4"}, {"id": first[1]["id"], "label": "item3"}]
+        rest = storage.list_outputs(limit=10, start_after=first[-1]["id"], fields=["label"])
+        assert [d["label"] for d in rest] == ["item2", "item1", "item0"]
+
+        # A repeat read is served from the cache...
+        backend.docs.clear()
+        assert storage.list_outputs(limit=2, fields=["label"]) == first
+        # ...until this process writes.
+        storage.save_output({"label": "new", "created_at": "2024-02-01"})
+        assert [d["label"] for d in storage.list_outputs(limit=2, fields=["label"])] == ["new"]
+    finally:
+        storage.close_storage()
+
+
+def test_file_backend_applies_updates_and_deletes(tmp_path):
+    backend = storage.FileBackend(str(tmp_path / "outputs.ndjson"))
+    backend.write([("a", {"label": "apple", "created_at": "1"}), ("b", {"label": "banana", "created_at": "2"})])
+    backend.update("a", {"label": "pear"})
+    backend.delete("b")
+
+    assert list(backend.query(10)) == [{"id": "a", "label": "pear", "created_at": "1"}]
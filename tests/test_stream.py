@@ -0,0 +1,126 @@
+import asyncio
+import io
+import json
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+from starlette.websockets import WebSocketDisconnect
+
+from services.yolo import api
+from services.yolo.auth import get_websocket_user
+from services.yolo.stream import FrameFilter, LatestFrame, run_stream
+
+
+def frame(value: int, size: int = 64) -> bytes:
+    out = io.BytesIO()
+    Image.fromarray(np.full((size, size, 3), value, dtype=np.uint8)).save(out, "PNG")
+    return out.getvalue()
+
+
+class FakeSocket:
+    """
+    Accepted WebSocket that delivers the given frames, then disconnects.
+    """
+
+    def __init__(self, frames, interval=0.0):
+        self.frames = list(frames)
+        self.interval = interval
+        self.sent = []
+
+    async def receive(self):
+        if not self.frames:
+            await asyncio.sleep(0.05)
+            return {"type": "websocket.disconnect", "code": 1000}
+        await asyncio.sleep(self.interval)
+        return {"type": "websocket.receive", "bytes": self.frames.pop(0)}
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+    async def close(self, code=1000, reason=None):
+        self.closed = code
+
+
+def test_latest_frame_keeps_only_the_newest():
+    async def scenario():
+        slot = LatestFrame()
+        assert not slot.put(1, b"a")
+        assert slot.put(2, b"b")
+        assert await slot.get() == (2, b"b")
+        slot.put(3, b"c")
+        slot.close()
+        assert await slot.get() is None
+
+    asyncio.run(scenario())
+
+
+def test_frame_filter_skips_near_duplicates_and_repeated_labels():
+    f = FrameFilter(threshold=4.0)
+    assert not f.is_duplicate(frame(100))
+    assert f.is_duplicate(frame(102))
+    assert not f.is_duplicate(frame(200))
+
+    assert f.labels_changed(["apple"])
+    assert not f.labels_changed(["apple"])
+    assert f.labels_changed([])
+
+
+def test_slow_inference_drops_frames_instead_of_queueing():
+    async def infer(data):
+        await asyncio.sleep(0.05)
+        return {"detections": [{"label": "apple"}]}
+
+    # 20 distinct frames arriving every 5 ms against a 50 ms model.
+    socket = FakeSocket([frame(i * 10) for i in range(20)], interval=0.005)
+    stats = asyncio.run(run_stream(socket, infer, FrameFilter(threshold=1.0)))
+
+    assert stats["received"] == 20
+    assert stats["analysed"] < 10
+    assert stats["analysed"] + stats["dropped"] + stats["duplicates"] == 20
+    # The label set never changes, so only the first result is sent.
+    assert len(socket.sent) == 1
+    assert socket.sent[0]["labels"] == ["apple"]
+
+
+def test_oversized_frame_closes_the_connection():
+    async def infer(data):
+        return {"detections": []}
+
+    socket = FakeSocket([b"x" * 100])
+    stats = asyncio.run(run_stream(socket, infer, max_frame_bytes=10))
+
+    assert socket.closed == 1009
+    assert stats["received"] == 0
+
+
+class LabelService:
+    def predict(self, data: bytes, conf=0.25, iou=0.45, imgsz=640):
+        value = np.asarray(Image.open(io.BytesIO(data)))[0, 0, 0]
+        label = "apple" if value < 128 else "banana"
+        return {"detections": [{"label": label, "confidence": 0.9, "box": [0, 0, 1, 1]}], "meta": {}}
+
+
+def test_stream_endpoint_sends_label_changes(monkeypatch):
+    monkeypatch.setattr(api, "svc", LabelService())
+    api.app.dependency_overrides[get_websocket_user] = lambda: {"uid": "test-user"}
+    try:
+        with TestClient(api.app).websocket_connect("/stream") as ws:
+            ws.send_bytes(frame(10))
+            first = ws.receive_json()
+            ws.send_bytes(frame(250))
+            second = ws.receive_json()
+    finally:
+        api.app.dependency_overrides.clear()
+
+    assert first["labels"] == ["apple"]
+    assert second["labels"] == ["banana"]
+    assert second["frame"] == 2
+
+
+def test_stream_endpoint_requires_token():
+    with pytest.raises(WebSocketDisconnect) as exc:
+        with TestClient(api.app).websocket_connect("/stream") as ws:
+            ws.receive_text()
+    assert exc.value.code == 1008